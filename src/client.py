@@ -371,14 +371,14 @@ def usage(
     adv_usage["search"] = _("[-HIaflpr] [-o attribute ...] [-s repo_uri] query")
 
     adv_usage["verify"] = _(
-        "[-Hqv] [-p path]... [--parsable version]\n"
+        "[-Hqv] [-p path]... [--parsable version] [--full]\n"
         "            [--unpackaged] [--unpackaged-only] [pkg_fmri_pattern ...]"
     )
     adv_usage["fix"] = _(
         "[-nvq]\n"
         + beopts
         + "            [--accept] [--licenses] [--parsable version] [--unpackaged]\n"
-        "            [pkg_fmri_pattern ...]"
+        "            [--full] [pkg_fmri_pattern ...]"
     )
     adv_usage["revert"] = _(
         "[-nv]\n"
@@ -3538,6 +3538,7 @@ def verify(
     unpackaged,
     unpackaged_only,
     verify_paths,
+    verify_full,
 ):
     """Determine if installed packages match manifests."""
 
@@ -3554,6 +3555,7 @@ def verify(
         display_plan_cb=display_plan_cb,
         logger=logger,
         verify_paths=verify_paths,
+        verify_full=verify_full,
     )
 
     # Print error messages.
@@ -3646,6 +3648,7 @@ def fix(
     show_licenses,
     verbose,
     unpackaged,
+    verify_full,
 ):
     """Fix packaging errors found in the image."""
 
@@ -3668,6 +3671,7 @@ def fix(
         unpackaged,
         display_plan_cb=display_plan_cb,
         logger=logger,
+        verify_full=verify_full,
     )
 
     # Print error messages.
@@ -7339,7 +7343,8 @@ opts_mapping = {
     "info_remote":            ("r", ""),
     "display_license":        ("", "license"),
     "publisher_a":            ("a", ""),
-    "verify_paths":           ("p", "")
+    "verify_paths":           ("p", ""),
+    "verify_full":            ("", "full"),
 }
 
 #
@@ -7628,6 +7633,12 @@ def main_func():
     # code the value here, at least for now.
     socket.setdefaulttimeout(30)  # in secs
 
+    # The parent image's content caches are only passed on to the
+    # "pkg remote" process operating on a linked child image; no other
+    # subcommand, nor any process it starts, should read from them.
+    if subcommand != "remote":
+        os.environ.pop(PARENT_CACHEDIRS_ENV, None)
+
     cmds_no_image = {
         "version": print_version,
         "image-create": image_create,
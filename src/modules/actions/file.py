@@ -443,7 +443,18 @@ class FileAction(generic.Action):
                 elf_hash_val,
                 elf_hash_func,
             ) = digest.get_preferred_hash(self, hash_type=pkg.digest.HASH_GELF)
-            if elf_hash_attr and haveelf and not is_mtpt:
+            hash_attr, hash_val, hash_func = digest.get_preferred_hash(self)
+
+            # A file whose state matches that recorded when its
+            # content was last found to be correct need not be
+            # hashed again.
+            verify_cache = args.get("verify_cache")
+            unchanged = (
+                verify_cache is not None
+                and not is_mtpt
+                and verify_cache.verified(path, lstat, hash_val)
+            )
+            if elf_hash_attr and haveelf and not is_mtpt and not unchanged:
                 #
                 # It's possible for the elf module to
                 # throw while computing the hash,
@@ -490,9 +501,21 @@ class FileAction(generic.Action):
             # Always check on the file hash because the ELF hash
             # check only checks on the ELF parts and does not
             # check for some other file integrity issues.
-            if not is_mtpt:
-                hash_attr, hash_val, hash_func = digest.get_preferred_hash(self)
-                sha_hash, data = misc.get_data_digest(path, hash_func=hash_func)
+            if not is_mtpt and not unchanged:
+                digest_pool = args.get("digest_pool")
+                if digest_pool is not None:
+                    sha_hash, data = digest_pool.get_data_digest(
+                        path, hash_func, lstat
+                    )
+                else:
+                    sha_hash, data = misc.get_data_digest(
+                        path, hash_func=hash_func
+                    )
+                if verify_cache is not None:
+                    if sha_hash == hash_val:
+                        verify_cache.add(path, lstat, hash_val)
+                    else:
+                        verify_cache.discard(path)
                 if sha_hash != hash_val:
                     # Prefer the ELF content hash error message.
                     if preserve is not None:
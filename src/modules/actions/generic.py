@@ -699,6 +699,10 @@ class Action(object, metaclass=NSG):
             try:
                 os.mkdir(p, fs.st_mode)
             except OSError as e:
+                if e.errno == errno.EEXIST and os.path.isdir(p):
+                    # Created concurrently on behalf of another
+                    # action being installed.
+                    continue
                 if e.errno != errno.ENOTDIR:
                     raise
                 err_txt = _(
@@ -32,8 +32,11 @@ import datetime
 import errno
 import fnmatch
 import hashlib
+import mmap
 import os
 import stat
+import struct
+import tempfile
 import threading
 import types
 
@@ -193,6 +196,236 @@ class _JSONWriter(object):
         return "JSONWriter to memory"
 
 
+class _CatalogPartIndex(object):
+    """Private helper class providing read-only, memory-mapped access to
+    the entries of a catalog part, which allows the entries for a single
+    package stem to be retrieved without loading the whole part.
+
+    The index doesn't duplicate the part's content; it only records
+    where each stem's version entries are in the part file.  The file
+    begins with a version line and a line of JSON describing the catalog
+    part file it was generated from along with the part's features and
+    publishers.  This is followed by the number of records, a table of
+    fixed-width records sorted by publisher and stem, and the keys.  Each
+    record holds the offset and length of its "pub\\0stem" key and of the
+    JSON-encoded entries in the part file."""
+
+    SUFFIX = ".idx"
+    VERSION = b"pkg5-catalog-index 2"
+
+    __COUNT = struct.Struct("<Q")
+    __RECORD = struct.Struct("<QIQI")
+
+    def __init__(self, source):
+        """Open the index for the catalog part file 'source'.  Raises
+        EnvironmentError if it does not exist and ValueError if it is
+        invalid or does not match the current content of 'source'."""
+
+        self.__map = None
+        self.__part_map = None
+        self.__fobj = open(source + self.SUFFIX, "rb")
+        try:
+            if self.__fobj.readline().rstrip() != self.VERSION:
+                raise ValueError(source)
+            hdr = json.loads(self.__fobj.readline())
+            with open(source, "rb") as pf:
+                if hdr.get("source") != self.__source_info(
+                    os.fstat(pf.fileno())
+                ):
+                    raise ValueError(source)
+                self.__part_map = mmap.mmap(
+                    pf.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            self.features = hdr["features"]
+            self.publishers = hdr["publishers"]
+            self.__map = mmap.mmap(
+                self.__fobj.fileno(), 0, access=mmap.ACCESS_READ
+            )
+            hdr_len = self.__fobj.tell()
+            (self.__count,) = self.__COUNT.unpack_from(self.__map, hdr_len)
+        except (KeyError, TypeError, struct.error):
+            self.close()
+            raise ValueError(source)
+        except:
+            self.close()
+            raise
+
+        self.__source = source
+        self.__rec_base = hdr_len + self.__COUNT.size
+        self.__str_base = self.__rec_base + self.__count * self.__RECORD.size
+        if self.__str_base > len(self.__map):
+            self.close()
+            raise ValueError(source)
+
+    @staticmethod
+    def __source_info(st):
+        """Returns the information used to determine whether an index
+        still describes the catalog part file with stat result 'st'."""
+
+        return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+    def close(self):
+        """Release the mappings and the underlying file."""
+
+        for m in (self.__map, self.__part_map):
+            if m is not None:
+                m.close()
+        self.__map = self.__part_map = None
+        self.__fobj.close()
+
+    def get(self, pub, stem):
+        """Returns the list of version entries for the package 'stem'
+        from publisher 'pub', or None if there are none.  Raises
+        ValueError if the entries can't be read from the part file."""
+
+        target = "{0}\0{1}".format(pub, stem).encode("utf-8")
+        rsize = self.__RECORD.size
+        lo, hi = 0, self.__count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            koff, klen, doff, dlen = self.__RECORD.unpack_from(
+                self.__map, self.__rec_base + mid * rsize
+            )
+            koff += self.__str_base
+            cand = self.__map[koff : koff + klen]
+            if cand < target:
+                lo = mid + 1
+            elif cand > target:
+                hi = mid
+            else:
+                # The entries should be a list following the stem's
+                # name; anything else means the part has changed in
+                # a way the index can't detect.
+                data = self.__part_map[doff : doff + dlen]
+                if (
+                    len(data) != dlen
+                    or self.__part_map[doff - 1 : doff] != b":"
+                    or data[:1] != b"["
+                    or data[-1:] != b"]"
+                ):
+                    raise ValueError(self.__source)
+                entries = json.loads(data)
+                if not isinstance(entries, list):
+                    raise ValueError(self.__source)
+                return entries
+        return None
+
+    @classmethod
+    def write(cls, source, data, features, sign=True):
+        """Write an index for the catalog part file 'source', which has
+        just been saved from its loaded content 'data' with the list of
+        'features'; 'sign' indicates whether the part was signed, and
+        so written with sorted keys.  As the index is only an
+        optimization, failures due to the permissions or type of
+        filesystem are ignored, and if the entries can't be found in
+        the part file, no index is written."""
+
+        # Encode the entries the same way _JSONWriter does, so that
+        # they can be found in the part file.
+        kw = {"sort_keys": sign}
+        if FEATURE_UTF8 not in features:
+            kw["ensure_ascii"] = True
+
+        def order(d):
+            return sorted(d) if sign else list(d)
+
+        pubs = [pub for pub in order(data) if not pub.startswith("_")]
+
+        try:
+            with open(source, "rb") as pf:
+                st = os.fstat(pf.fileno())
+                pmap = mmap.mmap(pf.fileno(), 0, access=mmap.ACCESS_READ)
+        except EnvironmentError as e:
+            if e.errno in (errno.EACCES, errno.EPERM, errno.EROFS):
+                return
+            raise
+
+        # The stems are written in the same order as they are searched
+        # for, so each search continues from the end of the last.
+        records = []
+        try:
+            pos = 0
+            for pub in pubs:
+                for stem in order(data[pub]):
+                    key = json.dumps(stem, **kw).encode("utf-8") + b":"
+                    entries = json.dumps(data[pub][stem], **kw).encode("utf-8")
+                    off = pmap.find(key + entries, pos)
+                    if off < 0:
+                        records = None
+                        break
+                    pos = off + len(key) + len(entries)
+                    records.append(
+                        (
+                            "{0}\0{1}".format(pub, stem).encode("utf-8"),
+                            off + len(key),
+                            len(entries),
+                        )
+                    )
+                if records is None:
+                    break
+        finally:
+            pmap.close()
+
+        if records is None:
+            # Not written as expected; don't leave a stale index.
+            try:
+                portable.remove(source + cls.SUFFIX)
+            except EnvironmentError:
+                pass
+            return
+        records.sort()
+
+        try:
+            fd, tmp = tempfile.mkstemp(
+                dir=os.path.dirname(source),
+                prefix=os.path.basename(source) + ".",
+            )
+        except EnvironmentError as e:
+            if e.errno in (errno.EACCES, errno.EPERM, errno.EROFS):
+                return
+            raise
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                hdr = {
+                    "features": features,
+                    "publishers": pubs,
+                    "source": cls.__source_info(st),
+                }
+                f.write(cls.VERSION + b"\n")
+                f.write(json.dumps(hdr).encode("utf-8") + b"\n")
+                f.write(cls.__COUNT.pack(len(records)))
+                soff = 0
+                for key, doff, dlen in records:
+                    f.write(cls.__RECORD.pack(soff, len(key), doff, dlen))
+                    soff += len(key)
+                f.write(b"".join(key for key, doff, dlen in records))
+            os.chmod(tmp, misc.PKG_FILE_MODE)
+            portable.rename(tmp, source + cls.SUFFIX)
+        except EnvironmentError as e:
+            try:
+                portable.remove(tmp)
+            except EnvironmentError:
+                pass
+            if e.errno not in (errno.EACCES, errno.EPERM, errno.EROFS):
+                raise
+
+    @classmethod
+    def remove(cls, source):
+        """Remove the index for the catalog part file 'source', if any."""
+
+        try:
+            portable.remove(source + cls.SUFFIX)
+        except EnvironmentError as e:
+            if e.errno == errno.ENOENT:
+                return
+            if e.errno == errno.EACCES:
+                raise api_errors.PermissionsException(e.filename)
+            if e.errno == errno.EROFS:
+                raise api_errors.ReadOnlyFileSystemException(e.filename)
+            raise
+
+
 class CatalogPartBase(object):
     """A CatalogPartBase object is an abstract class containing core
     functionality shared between CatalogPart and CatalogAttrs."""
@@ -203,6 +436,7 @@ class CatalogPartBase(object):
     __meta_root = None
     last_modified = None
     loaded = False
+    modified = False
     name = None
     sign = True
     signatures = None
@@ -224,6 +458,7 @@ class CatalogPartBase(object):
             # Operations shouldn't attempt to load the part data
             # unless meta_root is defined and the data exists.
             self.loaded = True
+            self.modified = True
             self.last_modified = datetime.datetime.now(datetime.UTC)
         else:
             self.last_modified = self.__last_modified()
@@ -341,6 +576,7 @@ class CatalogPartBase(object):
 
         # Update in-memory copy to reflect stored data.
         self.signatures = f.signatures()
+        self.modified = False
 
         # Ensure the permissions on the new file are correct.
         try:
@@ -376,17 +612,85 @@ class CatalogPart(CatalogPartBase):
     FMRIs available from a package repository."""
 
     __data = None
+    __index = None
+    __lazy = None
     ordered = None
 
     def __init__(self, name, meta_root=None, ordered=True, sign=True):
         """Initializes a CatalogPart object."""
 
         self.__data = {}
+        self.__index = None
+        self.__index_checked = False
+        self.__lazy = {}
         self.ordered = ordered
         if not name.startswith("catalog."):
             raise UnrecognizedCatalogPart(name)
         CatalogPartBase.__init__(self, name, meta_root=meta_root, sign=sign)
 
+    def __get_index(self):
+        """Returns the binary index for the catalog part, or None if it
+        has already been loaded or has no valid index."""
+
+        if self.loaded:
+            return None
+        if not self.__index_checked:
+            self.__index_checked = True
+            try:
+                self.__index = _CatalogPartIndex(self.pathname)
+            except (EnvironmentError, ValueError):
+                # Missing or stale; it will be regenerated when the
+                # part is next saved.
+                self.__index = None
+            else:
+                self.features = self.__index.features
+        return self.__index
+
+    def __drop_index(self):
+        """Discard the binary index and any entries retrieved using
+        it."""
+
+        if self.__index is not None:
+            self.__index.close()
+        self.__index = None
+        self.__index_checked = False
+        self.__lazy = {}
+
+    def __stem_publishers(self, pubs=EmptyI):
+        """Returns the publisher prefixes in the catalog part for use
+        by __stem_entries(), restricted to those in 'pubs'."""
+
+        index = self.__get_index()
+        if index is None:
+            return list(self.publishers(pubs=pubs))
+        return [p for p in index.publishers if not pubs or p in pubs]
+
+    def __stem_entries(self, pub, stem):
+        """Returns the list of version entries for the package 'stem'
+        from publisher 'pub', or None.  If the catalog part has not
+        been loaded, only the entries for 'stem' are retrieved from its
+        binary index if possible."""
+
+        index = self.__get_index()
+        if index is not None:
+            key = (pub, stem)
+            try:
+                return self.__lazy[key]
+            except KeyError:
+                pass
+            try:
+                ver_list = self.__lazy[key] = index.get(pub, stem)
+                return ver_list
+            except ValueError:
+                # The part no longer matches its index.
+                self.__drop_index()
+
+        self.load()
+        pkg_list = self.__data.get(pub)
+        if not pkg_list:
+            return None
+        return pkg_list.get(stem)
+
     def __iter_entries(self, last=False, ordered=False, pubs=EmptyI):
         """Private generator function to iterate over catalog entries.
 
@@ -486,6 +790,7 @@ class CatalogPart(CatalogPartBase):
         if not op_time:
             op_time = datetime.datetime.now(datetime.UTC)
         self.last_modified = op_time
+        self.modified = True
         self.signatures = {}
         return entry
 
@@ -494,6 +799,9 @@ class CatalogPart(CatalogPartBase):
         discards all content."""
 
         self.__data = {}
+        self.__drop_index()
+        if self.pathname:
+            _CatalogPartIndex.remove(self.pathname)
         return CatalogPartBase.destroy(self)
 
     def entries(self, cb=None, last=False, ordered=False, pubs=EmptyI):
@@ -543,12 +851,10 @@ class CatalogPart(CatalogPartBase):
         'pubs' is an optional list of publisher prefixes to restrict
         the results to."""
 
-        self.load()
-
         versions = {}
         entries = {}
-        for pub in self.publishers(pubs=pubs):
-            ver_list = self.__data[pub].get(name, ())
+        for pub in self.__stem_publishers(pubs=pubs):
+            ver_list = self.__stem_entries(pub, name) or ()
             for entry in ver_list:
                 sver = entry["version"]
                 pfmri = fmri.PkgFmri(name=name, publisher=pub, version=sver)
@@ -608,12 +914,10 @@ class CatalogPart(CatalogPartBase):
         'pubs' is an optional list of publisher prefixes to restrict
         the results to."""
 
-        self.load()
-
         versions = {}
         entries = {}
-        for pub in self.publishers(pubs=pubs):
-            ver_list = self.__data[pub].get(name, None)
+        for pub in self.__stem_publishers(pubs=pubs):
+            ver_list = self.__stem_entries(pub, name)
             if not ver_list:
                 continue
 
@@ -636,20 +940,21 @@ class CatalogPart(CatalogPartBase):
         if pfmri and not pfmri.publisher:
             raise api_errors.AnarchicalCatalogFMRI(str(pfmri))
 
-        # Since this is a hot path, this function checks for loaded
-        # status before attempting to call the load function.
-        if not self.loaded:
-            self.load()
-
         if pfmri:
             pub, stem, ver = pfmri.tuple()
             ver = str(ver)
 
-        pkg_list = self.__data.get(pub, None)
-        if not pkg_list:
-            return
+        # Since this is a hot path, this function checks for loaded
+        # status before attempting to use the index or to load the
+        # part.
+        if self.loaded:
+            pkg_list = self.__data.get(pub, None)
+            if not pkg_list:
+                return
+            ver_list = pkg_list.get(stem, ())
+        else:
+            ver_list = self.__stem_entries(pub, stem) or ()
 
-        ver_list = pkg_list.get(stem, ())
         for entry in ver_list:
             if entry["version"] == ver:
                 return entry
@@ -694,6 +999,7 @@ class CatalogPart(CatalogPartBase):
         if self.loaded:
             # Already loaded, or only in-memory.
             return
+        self.__drop_index()
         self.__data = CatalogPartBase.load(self)
 
     def names(self, pubs=EmptyI):
@@ -796,6 +1102,7 @@ class CatalogPart(CatalogPartBase):
         if not op_time:
             op_time = datetime.datetime.now(datetime.UTC)
         self.last_modified = op_time
+        self.modified = True
         self.signatures = {}
 
     def save(self):
@@ -812,6 +1119,11 @@ class CatalogPart(CatalogPartBase):
         if len(self.features):
             self.__data["_FEATURE"] = self.features
         CatalogPartBase.save(self, self.__data)
+        # Allow later consumers of the part to look up individual
+        # packages without loading all of it.
+        _CatalogPartIndex.write(
+            self.pathname, self.__data, self.features, sign=self.sign
+        )
 
     def sort(self, pfmris=None, pubs=None):
         """Re-sorts the contents of the CatalogPart such that version
@@ -1004,6 +1316,7 @@ class CatalogUpdate(CatalogPartBase):
         # at the exact same time as the catalog, the last_modified
         # time of the update log must match the operation time.
         self.last_modified = op_time
+        self.modified = True
         self.signatures = {}
 
     def load(self):
@@ -1826,9 +2139,10 @@ class Catalog(object):
             attrs.updates[name] = {"last-modified": op_time}
 
         for name, part in self.__parts.items():
-            # Signature data for each part needs to be cleared,
-            # and will only be available again after save().
-            attrs.parts[name] = {"last-modified": part.last_modified}
+            # Signature data for each modified part needs to be
+            # cleared, and will only be available again after save().
+            if part.modified:
+                attrs.parts[name] = {"last-modified": part.last_modified}
 
     @staticmethod
     def __parse_fmri_patterns(patterns):
@@ -1894,13 +2208,15 @@ class Catalog(object):
                 error = e
             yield (pat, error, npat, matcher)
 
-    def __save(self, fmt="utf8"):
+    def __save(self, fmt="utf8", modified_only=False):
         """Private save function.  Caller is responsible for locking
         the catalog."""
 
         attrs = self._attrs
         if self.log_updates:
             for name, ulog in self.__updates.items():
+                if modified_only and not ulog.modified:
+                    continue
                 ulog.load()
                 ulog.set_feature(FEATURE_UTF8, fmt == "utf8")
                 ulog.save()
@@ -1917,6 +2233,9 @@ class Catalog(object):
         # updating their related information in catalog.attrs
         # as they are saved.
         for name, part in self.__parts.items():
+            if modified_only and not part.modified:
+                continue
+
             # Must save first so that signature data is
             # current.
 
@@ -2121,17 +2440,13 @@ class Catalog(object):
             pubs=pubs,
         )
 
-    def add_package(self, pfmri, manifest=None, metadata=None):
-        """Add a package and its related metadata to the catalog and
-        its parts as needed.
-
-        'manifest' is an optional Manifest object that will be used
-        to retrieve the metadata related to the package.
-
-        'metadata' is an optional dict of additional metadata to store
-        with the package's BASE record."""
-
-        assert not self.read_only
+    @staticmethod
+    def get_manifest_entries(manifest):
+        """Returns a dict of the catalog entries for the package whose
+        Manifest is 'manifest', keyed by the name of the catalog part
+        each entry belongs to.  The result can be passed to
+        add_package() instead of the manifest; this allows it to be
+        generated elsewhere, such as in another process."""
 
         def group_actions(actions):
             dep_acts = {"C": []}
@@ -2183,6 +2498,52 @@ class Catalog(object):
                 "summary": sum_acts,
             }
 
+        entries = {}
+        entry = {}
+        for k, v in manifest.signatures.items():
+            entry["signature-{0}".format(k)] = v
+        entries[Catalog.__BASE_PART] = entry
+
+        # Only dependency and set actions are currently used by the
+        # remaining catalog parts.
+        actions = []
+        for atype in "depend", "set":
+            actions += manifest.gen_actions_by_type(atype)
+
+        gacts = group_actions(actions)
+        for ctype in gacts:
+            for locale in gacts[ctype]:
+                acts = gacts[ctype][locale]
+                if not acts:
+                    # Catalog entries only added if actions are
+                    # present for this ctype.
+                    continue
+                entries["catalog.{0}.{1}".format(ctype, locale)] = {
+                    "actions": acts
+                }
+        return entries
+
+    def add_package(
+        self, pfmri, manifest=None, metadata=None, manifest_entries=None
+    ):
+        """Add a package and its related metadata to the catalog and
+        its parts as needed.
+
+        'manifest' is an optional Manifest object that will be used
+        to retrieve the metadata related to the package.
+
+        'metadata' is an optional dict of additional metadata to store
+        with the package's BASE record.
+
+        'manifest_entries' is an optional dict of catalog entries, as
+        returned by get_manifest_entries(), to use instead of
+        retrieving them from 'manifest'."""
+
+        assert not self.read_only
+
+        if manifest_entries is None and manifest:
+            manifest_entries = self.get_manifest_entries(manifest)
+
         self.__lock_catalog()
         try:
             entries = {}
@@ -2196,42 +2557,22 @@ class Catalog(object):
             entry = {}
             if metadata:
                 entry["metadata"] = metadata
-            if manifest:
-                for k, v in manifest.signatures.items():
-                    entry["signature-{0}".format(k)] = v
+            if manifest_entries:
+                entry.update(manifest_entries[self.__BASE_PART])
             part = self.get_part(self.__BASE_PART)
             entries[part.name] = part.add(
                 pfmri, metadata=entry, op_time=op_time
             )
 
-            if manifest:
-                # Without a manifest, only the base catalog data
-                # can be populated.
-
-                # Only dependency and set actions are currently
-                # used by the remaining catalog parts.
-                actions = []
-                for atype in "depend", "set":
-                    actions += manifest.gen_actions_by_type(atype)
-
-                gacts = group_actions(actions)
-                for ctype in gacts:
-                    for locale in gacts[ctype]:
-                        acts = gacts[ctype][locale]
-                        if not acts:
-                            # Catalog entries only
-                            # added if actions are
-                            # present for this
-                            # ctype.
-                            continue
-
-                        part = self.get_part(
-                            "catalog" ".{0}.{1}".format(ctype, locale)
-                        )
-                        entry = {"actions": acts}
-                        entries[part.name] = part.add(
-                            pfmri, metadata=entry, op_time=op_time
-                        )
+            # Without a manifest, only the base catalog data can be
+            # populated.
+            for name, entry in (manifest_entries or {}).items():
+                if name == self.__BASE_PART:
+                    continue
+                part = self.get_part(name)
+                entries[part.name] = part.add(
+                    pfmri, metadata=entry, op_time=op_time
+                )
 
             self.__log_update(
                 pfmri, CatalogUpdate.ADD, op_time, entries=entries
@@ -2286,7 +2627,11 @@ class Catalog(object):
         """Apply any CatalogUpdates available to the catalog based on
         the list returned by get_updates_needed.  The caller must
         retrieve all of the resources indicated by get_updates_needed
-        and place them in the directory indicated by 'path'."""
+        and place them in the directory indicated by 'path'.
+
+        Returns a set containing the names of the packages whose
+        entries were changed, or None if one or more catalog parts
+        were replaced in their entirety."""
 
         if not self.meta_root:
             raise api_errors.CatalogUpdateRequirements()
@@ -2296,6 +2641,10 @@ class Catalog(object):
         # updates.
         old_parts = self._attrs.parts
 
+        # The names of the packages changed by incremental updates.
+        changed = set()
+        replaced = False
+
         def apply_incremental(name):
             # Load the CatalogUpdate from the path specified.
             # (Which is why __get_update is not used.)
@@ -2321,6 +2670,7 @@ class Catalog(object):
                         part.remove(pfmri, op_time=op_time)
                     else:
                         raise api_errors.UnknownUpdateType(op_type)
+                    changed.add(pfmri.pkg_name)
 
         def apply_full(name):
             src = os.path.join(path, name)
@@ -2335,7 +2685,7 @@ class Catalog(object):
             updates = self.get_updates_needed(path)
             if updates is None:
                 # Nothing has changed, so nothing to do.
-                return
+                return changed
 
             for name in updates:
                 if name.startswith("update."):
@@ -2344,6 +2694,7 @@ class Catalog(object):
                 else:
                     # The provided update is a full update.
                     apply_full(name)
+                    replaced = True
 
             # Next, verify that all of the updated parts have a
             # signature that matches the new catalog.attrs file.
@@ -2372,6 +2723,9 @@ class Catalog(object):
 
             self._attrs = CatalogAttrs(meta_root=self.meta_root)
             self.__set_perms()
+            if replaced:
+                return None
+            return changed
         finally:
             self.batch_mode = old_batch_mode
             self.__unlock_catalog()
@@ -3742,12 +4096,18 @@ class Catalog(object):
         finally:
             self.__unlock_catalog()
 
-    def save(self, fmt="utf8"):
-        """Finalize current state and save to file if possible."""
+    def save(self, fmt="utf8", modified_only=False):
+        """Finalize current state and save to file if possible.
+
+        'modified_only' is an optional boolean value indicating that
+        only the catalog attributes and the parts and update logs
+        that have been modified since they were loaded should be
+        written; the caller is responsible for ensuring that the
+        unmodified files are present in the catalog's meta_root."""
 
         self.__lock_catalog()
         try:
-            self.__save(fmt)
+            self.__save(fmt, modified_only=modified_only)
         finally:
             self.__unlock_catalog()
 
@@ -3920,6 +4280,7 @@ class Catalog(object):
         attrs.last_modified = op_time
         attrs.parts[base.name] = {"last-modified": op_time}
         base.last_modified = op_time
+        base.modified = True
 
     def validate(self, require_signatures=False):
         """Verifies whether the signatures for the contents of the
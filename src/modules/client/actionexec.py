@@ -0,0 +1,197 @@
+#!/usr/bin/python3
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright 2024 OmniOS Community Edition (OmniOSce) Association.
+#
+
+import collections
+import os
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pkg.actions
+
+# Actions which only affect their own path and may therefore be executed
+# concurrently with one another.  All other actions (directories, users,
+# groups, drivers, ...) are executed serially and act as barriers.
+PARALLEL_ACTIONS = frozenset(("file", "hardlink", "link"))
+
+# The number of actions per worker that are submitted at once; all of
+# them complete before any following action is started.
+BATCH_PER_JOB = 64
+
+
+class _DependencyFailed(Exception):
+    """Raised in place of executing an action when an action it depends
+    on failed; the failure of the dependency is what is reported."""
+
+    pass
+
+
+class ActionExecutor(object):
+    """Executes the install or update actions of an image plan using a
+    pool of worker threads.
+
+    Actions are executed in plan order, except that consecutive file,
+    hardlink and link actions are executed concurrently.  An action
+    still waits for any earlier action delivering the same path, one of
+    its parent directories or something beneath it, and a hardlink for
+    the action delivering its target, so the result is the same as that
+    of executing them serially."""
+
+    def __init__(self, jobs):
+        """'jobs' is the number of worker threads to use; if it is
+        one, all actions are executed serially."""
+
+        self.__jobs = jobs
+        self.__executor = None
+        if jobs > 1:
+            self.__executor = ThreadPoolExecutor(max_workers=jobs)
+
+    @staticmethod
+    def __parallel(ap):
+        """Returns whether the _ActionPlan 'ap' may be executed
+        concurrently with its neighbours."""
+
+        act = ap.dst
+        if act.name not in PARALLEL_ACTIONS:
+            return False
+        # A file whose payload wasn't retrieved during preparation may
+        # have to be retrieved by the (single-threaded) transport while
+        # it is installed.
+        return act.name != "file" or bool(act.data)
+
+    def execute(self, actions, execute, progress):
+        """Execute the _ActionPlan objects in 'actions' by calling
+        'execute'(pkgplan, src, dest) for each one, and 'progress'()
+        once each has completed.  Returns the list of _ActionPlan
+        objects whose execution raised ActionRetry, in plan order.
+
+        If an action fails, no further actions are started and the
+        first exception in plan order is raised once those that are
+        already running have completed."""
+
+        retries = []
+        batch = []
+        for ap in actions:
+            if self.__executor is not None and self.__parallel(ap):
+                batch.append(ap)
+                if len(batch) >= self.__jobs * BATCH_PER_JOB:
+                    retries.extend(
+                        self.__execute_batch(batch, execute, progress)
+                    )
+                    batch = []
+                continue
+
+            if batch:
+                retries.extend(self.__execute_batch(batch, execute, progress))
+                batch = []
+            try:
+                execute(*ap)
+                progress()
+            except pkg.actions.ActionRetry:
+                retries.append(ap)
+
+        if batch:
+            retries.extend(self.__execute_batch(batch, execute, progress))
+        return retries
+
+    @staticmethod
+    def __run(deps, execute, ap):
+        """Worker thread entry point; wait for the actions 'ap' depends
+        on, then execute it."""
+
+        if deps:
+            wait(deps)
+            for f in deps:
+                # Failures of dependencies are reported by the
+                # caller.  An action to be retried later doesn't
+                # prevent those that follow it from being executed,
+                # just as when executing serially.
+                if f.cancelled() or not isinstance(
+                    f.exception(), (type(None), pkg.actions.ActionRetry)
+                ):
+                    raise _DependencyFailed()
+        execute(*ap)
+
+    def __execute_batch(self, batch, execute, progress):
+        """Execute the _ActionPlan objects in 'batch' concurrently."""
+
+        # Each action is submitted after the actions it depends on, so
+        # (as the pool is FIFO) a dependency has always been started by
+        # the time an action waits for it.
+        paths = {}
+        beneath = collections.defaultdict(list)
+        futures = []
+        for ap in batch:
+            act = ap.dst
+            path = os.path.normpath(act.attrs["path"]).lstrip(os.path.sep)
+
+            deps = list(beneath.get(path, ()))
+            if path in paths:
+                deps.append(paths[path])
+            parent = os.path.dirname(path)
+            parents = []
+            while parent:
+                if parent in paths:
+                    deps.append(paths[parent])
+                parents.append(parent)
+                parent = os.path.dirname(parent)
+            if act.name == "hardlink":
+                # The target, or any of its parent directories, may
+                # be delivered by an earlier action in the batch.
+                target = os.path.normpath(act.get_target_path()).lstrip(
+                    os.path.sep
+                )
+                while target:
+                    if target in paths:
+                        deps.append(paths[target])
+                    target = os.path.dirname(target)
+
+            future = self.__executor.submit(self.__run, deps, execute, ap)
+            futures.append(future)
+            paths[path] = future
+            for parent in parents:
+                beneath[parent].append(future)
+
+        retries = []
+        try:
+            for ap, future in zip(batch, futures):
+                try:
+                    future.result()
+                    progress()
+                except pkg.actions.ActionRetry:
+                    retries.append(ap)
+        except:
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            raise
+        return retries
+
+    def close(self):
+        """Stop the worker threads."""
+
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=True)
+            self.__executor = None
@@ -2817,6 +2817,7 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
         unpackaged=False,
         unpackaged_only=False,
         verify_paths=misc.EmptyI,
+        verify_full=False,
     ):
         """This is a generator function that yields a PlanDescription
         object.
@@ -2826,7 +2827,10 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
         and then execute_plan().  After execution of a plan, or to
         abandon a plan, reset() should be called.
 
-        For parameters, refer to the 'gen_plan_install'
+        'verify_full' indicates that the content of every file should
+        be verified, even if it is unchanged since it was last verified.
+
+        For all other parameters, refer to the 'gen_plan_install'
         function for an explanation of their usage and effects."""
 
         op = API_OP_VERIFY
@@ -2840,6 +2844,7 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
             unpackaged=unpackaged,
             unpackaged_only=unpackaged_only,
             verify_paths=verify_paths,
+            verify_full=verify_full,
         )
 
     def gen_plan_fix(
@@ -2852,6 +2857,7 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
         new_be=None,
         noexecute=True,
         unpackaged=False,
+        verify_full=False,
     ):
         """This is a generator function that yields a PlanDescription
         object.
@@ -2861,7 +2867,10 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
         and then execute_plan().  After execution of a plan, or to
         abandon a plan, reset() should be called.
 
-        For parameters, refer to the 'gen_plan_install'
+        'verify_full' indicates that the content of every file should
+        be verified, even if it is unchanged since it was last verified.
+
+        For all other parameters, refer to the 'gen_plan_install'
         function for an explanation of their usage and effects."""
 
         op = API_OP_FIX
@@ -2877,6 +2886,7 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
             _refresh_catalogs=False,
             _update_index=False,
             unpackaged=unpackaged,
+            verify_full=verify_full,
         )
 
     def attach_linked_child(
@@ -3179,29 +3189,6 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
 
         utc_now = datetime.datetime.now(datetime.UTC).strftime("%Y%m%dT%H%M%SZ")
         for time_val in times:
-            # Ranges are 19 chars of timestamp, a '-', and
-            # another timestamp.
-            if len(time_val) > 20 or time_val.startswith("now-"):
-                if time_val.startswith("now-"):
-                    start = utc_now
-                    finish = self.__utc_format(time_val[4:], utc_now)
-                else:
-                    start = self.__utc_format(time_val[:19], utc_now)
-                    finish = self.__utc_format(time_val[20:], utc_now)
-                if start > finish:
-                    raise apx.HistoryRequestException(
-                        _(
-                            "Start time must be older than finish time: {0}"
-                        ).format(time_val)
-                    )
-                files = self.__get_history_range(start, finish)
-            else:
-                # There can be multiple entries per timestamp.
-                prefix = self.__utc_format(time_val, utc_now)
-                files = glob.glob(
-                    os.path.join(self._img.history.path, "{0}*".format(prefix))
-                )
-
             try:
                 files = self.__get_history_paths(time_val, utc_now)
                 entries.update(files)
@@ -3235,19 +3222,26 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
         except apx.ApiException as e:
             uuid_be_dic = {}
 
-        for entry in entries:
-            # Yield each history entry object as it is loaded.
-            try:
-                yield history.History(
-                    root_dir=self._img.history.root_dir,
-                    filename=entry,
-                    uuid_be_dic=uuid_be_dic,
-                )
-            except apx.HistoryLoadException as e:
-                if e.parse_failure:
-                    # Ignore corrupt entries.
-                    continue
-                raise
+        # Entries are loaded from the history index when possible to
+        # avoid parsing their XML files.
+        index = history.HistoryIndex(self._img.history.index_path)
+        try:
+            for entry in entries:
+                # Yield each history entry object as it is loaded.
+                try:
+                    yield history.History(
+                        root_dir=self._img.history.root_dir,
+                        filename=entry,
+                        uuid_be_dic=uuid_be_dic,
+                        index=index,
+                    )
+                except apx.HistoryLoadException as e:
+                    if e.parse_failure:
+                        # Ignore corrupt entries.
+                        continue
+                    raise
+        finally:
+            index.close()
 
     def get_linked_name(self):
         """If the current image is a child image, this function
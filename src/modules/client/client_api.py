@@ -3084,6 +3084,7 @@ def _verify(
     verify_paths,
     display_plan_cb=None,
     logger=None,
+    verify_full=False,
 ):
     """Determine if installed packages match manifests."""
 
@@ -3113,6 +3114,7 @@ def _verify(
         _verify_paths=verify_paths,
         display_plan_cb=display_plan_cb,
         logger=logger,
+        verify_full=verify_full,
     )
 
 
@@ -3135,6 +3137,7 @@ def _fix(
     unpackaged,
     display_plan_cb=None,
     logger=None,
+    verify_full=False,
 ):
     """Fix packaging errors found in the image."""
 
@@ -3157,6 +3160,7 @@ def _fix(
         _unpackaged=unpackaged,
         display_plan_cb=display_plan_cb,
         logger=logger,
+        verify_full=verify_full,
     )
 
 
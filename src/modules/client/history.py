@@ -36,6 +36,7 @@ import pkg
 import pkg.client.api_errors as apx
 import pkg.client.bootenv as bootenv
 import pkg.fmri as fmri
+import pkg.json as json
 import pkg.misc as misc
 import pkg.portable as portable
 
@@ -105,6 +106,136 @@ error_results = {
 }
 
 
+# The names of the files in the history index directory which contain a copy
+# of each history entry in a form that can be loaded without parsing its XML
+# file, and the offset of each copy by XML file name.
+HISTORY_INDEX_LOG = "entries"
+HISTORY_INDEX = "index"
+
+
+class HistoryIndex(object):
+    """A HistoryIndex object provides access to an append-only log of the
+    contents of history entries and an index of the entries in the log by
+    the name of their XML file.  The XML files remain the authoritative
+    copy of history information; entries that can't be found in the log
+    (such as those written by older clients) must be loaded from their
+    XML files instead.
+    """
+
+    def __init__(self, path):
+        """'path' is the pathname of the directory containing the
+        log and index files."""
+
+        self.path = path
+        self.__offsets = None
+        self.__log_fh = None
+
+    def close(self):
+        """Closes any files opened to retrieve entries."""
+
+        if self.__log_fh:
+            self.__log_fh.close()
+            self.__log_fh = None
+
+    def __load_index(self):
+        """Returns a dictionary of the offset and length of each entry
+        in the log, and the size and modification time of the XML file
+        it was read from, indexed by the name of its XML file."""
+
+        offsets = {}
+        try:
+            with open(os.path.join(self.path, HISTORY_INDEX), "r") as f:
+                for line in f:
+                    try:
+                        name, off, length, size, mtime = line.split()
+                        offsets[name] = (
+                            int(off),
+                            int(length),
+                            int(size),
+                            int(mtime),
+                        )
+                    except ValueError:
+                        # Ignore incompletely written entries.
+                        continue
+        except EnvironmentError:
+            # The index is only an optimization, so any entries
+            # it can't provide are loaded from their XML files.
+            pass
+        return offsets
+
+    def get(self, pathname):
+        """Returns the contents of the history entry for the XML file
+        'pathname' as stored by add(), or None if the entry is not in
+        the log or the file has changed since it was stored."""
+
+        if self.__offsets is None:
+            self.__offsets = self.__load_index()
+        filename = os.path.basename(pathname)
+        try:
+            off, length, size, mtime = self.__offsets[filename]
+            st = os.stat(pathname)
+        except (KeyError, EnvironmentError):
+            return None
+        if st.st_size != size or st.st_mtime_ns != mtime:
+            return None
+
+        try:
+            if not self.__log_fh:
+                self.__log_fh = open(
+                    os.path.join(self.path, HISTORY_INDEX_LOG), "rb"
+                )
+            self.__log_fh.seek(off)
+            name, record = json.loads(
+                self.__log_fh.read(length).decode("utf-8")
+            )
+        except (EnvironmentError, ValueError, TypeError):
+            return None
+        if name != filename:
+            return None
+        return record
+
+    def add(self, pathname, record):
+        """Appends the contents of the history entry for the XML file
+        'pathname' to the log and indexes it.  'record' must be a JSON
+        serializable object.  Raises EnvironmentError if the entry
+        can't be stored."""
+
+        filename = os.path.basename(pathname)
+        st = os.stat(pathname)
+        if not os.path.exists(self.path):
+            os.mkdir(self.path, misc.PKG_DIR_MODE)
+
+        data = (json.dumps([filename, record]) + "\n").encode("utf-8")
+        # Appended writes are used so that the position of each entry
+        # is determined atomically even if several processes store
+        # entries at the same time.
+        fd = os.open(
+            os.path.join(self.path, HISTORY_INDEX_LOG),
+            os.O_CREAT | os.O_APPEND | os.O_WRONLY,
+            misc.PKG_FILE_MODE,
+        )
+        try:
+            os.write(fd, data)
+            off = os.lseek(fd, 0, os.SEEK_CUR) - len(data)
+        finally:
+            os.close(fd)
+
+        entry = (off, len(data), st.st_size, st.st_mtime_ns)
+        line = "{0} {1:d} {2:d} {3:d} {4:d}\n".format(filename, *entry)
+        fd = os.open(
+            os.path.join(self.path, HISTORY_INDEX),
+            os.O_CREAT | os.O_APPEND | os.O_WRONLY,
+            misc.PKG_FILE_MODE,
+        )
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+        if self.__offsets is not None:
+            self.__offsets[filename] = entry
+
+
 class _HistoryOperation(object):
     """A _HistoryOperation object is a representation of data about an
     operation that a pkg(7) client has performed.  This class is private
@@ -420,7 +551,9 @@ class History(object):
             # Discard it now that it is no longer needed.
             del ops[-1]
 
-    def __init__(self, root_dir=".", filename=None, uuid_be_dic=None):
+    def __init__(
+        self, root_dir=".", filename=None, uuid_be_dic=None, index=None
+    ):
         """'root_dir' should be the path of the directory where the
         history directory can be found (or created if it doesn't
         exist).  'filename' should be the name of an XML file
@@ -429,6 +562,9 @@ class History(object):
         information, as produced by
         pkg.client.bootenv.BootEnv.get_uuid_be_dic(), otherwise that
         method is called each time a History object is created.
+        'index', if supplied, should be a HistoryIndex object for
+        this history; it is used to load the information instead of
+        the XML file when possible.
         """
         # Since this is a read-only attribute normally, we have to
         # bypass our setattr override by calling object.
@@ -440,7 +576,7 @@ class History(object):
 
         self.root_dir = root_dir
         if filename:
-            self.__load(filename, uuid_be_dic=uuid_be_dic)
+            self.__load(filename, uuid_be_dic=uuid_be_dic, index=index)
 
     def __str__(self):
         ops = self.__operations
@@ -453,6 +589,13 @@ class History(object):
         """
         return os.path.join(self.root_dir, "history")
 
+    @property
+    def index_path(self):
+        """The directory where the index of the history files will be
+        written to or read from.
+        """
+        return os.path.join(self.root_dir, "history-index")
+
     @property
     def pathname(self):
         """Returns the pathname that the history information was read
@@ -496,19 +639,18 @@ class History(object):
         object.__setattr__(self, "client_args", [])
         self.__operations = []
 
-    def __load_client_data(self, node):
-        """Internal function to load the client data from the given XML
-        'node' object.
+    @staticmethod
+    def __client_record(node):
+        """Internal function to return the client data from the given
+        XML 'node' object as a dictionary.
         """
-        self.client_name = node.getAttribute("name")
-        self.client_version = node.getAttribute("version")
+        ca = []
         try:
             args = node.getElementsByTagName("args")[0]
         except IndexError:
             # There might not be any.
             pass
         else:
-            ca = object.__getattribute__(self, "client_args")
             for cnode in args.getElementsByTagName("arg"):
                 try:
                     ca.append(cnode.childNodes[0].wholeText)
@@ -516,19 +658,73 @@ class History(object):
                     # There may be no childNodes, or
                     # wholeText may not be defined.
                     pass
+        return {
+            "name": node.getAttribute("name"),
+            "version": node.getAttribute("version"),
+            "args": ca,
+        }
+
+    def __load_client_data(self, data):
+        """Internal function to load the client data from the given
+        dictionary as returned by __client_record.
+        """
+        self.client_name = data["name"]
+        self.client_version = data["version"]
+        ca = object.__getattribute__(self, "client_args")
+        ca.extend(data["args"])
 
     @staticmethod
-    def __load_operation_data(node, uuid_be_dic):
+    def __operation_record(node):
+        """Internal function to return the operation data from the
+        given XML 'node' object as a dictionary.
+        """
+        data = {}
+        for attr in (
+            "name",
+            "start_time",
+            "end_time",
+            "username",
+            "userid",
+            "result",
+        ):
+            data[attr] = node.getAttribute(attr)
+        for attr in ("be_uuid", "new_be_uuid", "be", "new_be", "release-notes"):
+            if node.hasAttribute(attr):
+                data[attr] = node.getAttribute(attr)
+
+        def get_node_values(parent_name, child_name=None):
+            try:
+                parent = node.getElementsByTagName(parent_name)[0]
+                if child_name:
+                    cnodes = parent.getElementsByTagName(child_name)
+                    return [cnode.childNodes[0].wholeText for cnode in cnodes]
+                return parent.childNodes[0].wholeText
+            except (AttributeError, IndexError):
+                # Assume no values are present for the node.
+                pass
+            if child_name:
+                return []
+            return
+
+        data["start_state"] = get_node_values("start_state")
+        data["end_state"] = get_node_values("end_state")
+        data["errors"] = get_node_values("errors", child_name="error")
+
+        return data
+
+    @staticmethod
+    def __load_operation_data(data, uuid_be_dic):
         """Internal function to load the operation data from the given
-        XML 'node' object and return a _HistoryOperation object.
+        dictionary as returned by __operation_record and return a
+        _HistoryOperation object.
         """
         op = _HistoryOperation()
-        op.name = node.getAttribute("name")
-        op.start_time = node.getAttribute("start_time")
-        op.end_time = node.getAttribute("end_time")
-        op.username = node.getAttribute("username")
-        op.userid = node.getAttribute("userid")
-        op.result = node.getAttribute("result").split(", ")
+        op.name = data["name"]
+        op.start_time = data["start_time"]
+        op.end_time = data["end_time"]
+        op.username = data["username"]
+        op.userid = data["userid"]
+        op.result = data["result"].split(", ")
 
         if len(op.result) == 1:
             op.result.append("None")
@@ -538,71 +734,84 @@ class History(object):
         if op.result[0] == "Nothing to do":
             op.result = RESULT_NOTHING_TO_DO
 
-        if node.hasAttribute("be_uuid"):
-            op.be_uuid = node.getAttribute("be_uuid")
-        if node.hasAttribute("new_be_uuid"):
-            op.new_be_uuid = node.getAttribute("new_be_uuid")
-        if node.hasAttribute("be"):
-            op.be = node.getAttribute("be")
+        if "be_uuid" in data:
+            op.be_uuid = data["be_uuid"]
+        if "new_be_uuid" in data:
+            op.new_be_uuid = data["new_be_uuid"]
+        if "be" in data:
+            op.be = data["be"]
             if op.be_uuid:
                 op.current_be = uuid_be_dic.get(op.be_uuid, op.be)
-        if node.hasAttribute("new_be"):
-            op.new_be = node.getAttribute("new_be")
+        if "new_be" in data:
+            op.new_be = data["new_be"]
             if op.new_be_uuid:
                 op.current_new_be = uuid_be_dic.get(op.new_be_uuid, op.new_be)
-        if node.hasAttribute("release-notes"):
-            op.release_notes = node.getAttribute("release-notes")
+        if "release-notes" in data:
+            op.release_notes = data["release-notes"]
 
-        def get_node_values(parent_name, child_name=None):
-            try:
-                parent = node.getElementsByTagName(parent_name)[0]
-                if child_name:
-                    cnodes = parent.getElementsByTagName(child_name)
-                    return [cnode.childNodes[0].wholeText for cnode in cnodes]
-                return parent.childNodes[0].wholeText
-            except (AttributeError, IndexError):
-                # Assume no values are present for the node.
-                pass
-            if child_name:
-                return []
-            return
-
-        op.start_state = get_node_values("start_state")
-        op.end_state = get_node_values("end_state")
-        op.errors.extend(get_node_values("errors", child_name="error"))
+        op.start_state = data["start_state"]
+        op.end_state = data["end_state"]
+        op.errors.extend(data["errors"])
 
         return op
 
-    def __load(self, filename, uuid_be_dic=None):
+    @classmethod
+    def __record(cls, root):
+        """Internal function to return the contents of the given XML
+        'root' object as a list of (type, dictionary) pairs suitable
+        for storage in a HistoryIndex.
+        """
+        record = []
+        for cnode in root.childNodes:
+            if cnode.nodeName == "client":
+                record.append(("client", cls.__client_record(cnode)))
+            elif cnode.nodeName == "operation":
+                record.append(("operation", cls.__operation_record(cnode)))
+        return record
+
+    def __load(self, filename, uuid_be_dic=None, index=None):
         """Loads the history from a file located in self.path/history/
         {filename}.  The file should contain a serialized history
-        object in XML format.
+        object in XML format.  If 'index' is provided, the history is
+        loaded from it instead if it contains the file's contents.
         """
 
         # Ensure all previous information is discarded.
         self.clear()
 
         try:
-            if not uuid_be_dic:
+            if uuid_be_dic is None:
                 uuid_be_dic = bootenv.BootEnv.get_uuid_be_dic()
         except apx.ApiException as e:
             uuid_be_dic = {}
 
         try:
             pathname = os.path.join(self.path, filename)
-            d = xmini.parse(pathname)
-            root = d.documentElement
-            for cnode in root.childNodes:
-                if cnode.nodeName == "client":
-                    self.__load_client_data(cnode)
-                elif cnode.nodeName == "operation":
+            record = None
+            if index:
+                record = index.get(pathname)
+            if record is None:
+                d = xmini.parse(pathname)
+                record = self.__record(d.documentElement)
+                if index:
+                    try:
+                        index.add(pathname, record)
+                    except EnvironmentError:
+                        # Storing the entry is only an
+                        # optimization for later loads.
+                        pass
+
+            for ntype, data in record:
+                if ntype == "client":
+                    self.__load_client_data(data)
+                elif ntype == "operation":
                     # Operations load differently due to
                     # the stack.
                     self.__operations.append(
                         {
                             "pathname": pathname,
                             "operation": self.__load_operation_data(
-                                cnode, uuid_be_dic
+                                data, uuid_be_dic
                             ),
                         }
                     )
@@ -748,7 +957,7 @@ class History(object):
                 )
                 d.writexml(f, encoding=sys.getdefaultencoding())
                 f.close()
-                return
+                break
             except EnvironmentError as e:
                 if e.errno == errno.EEXIST:
                     name, ext = os.path.splitext(os.path.basename(pathname))
@@ -772,6 +981,25 @@ class History(object):
                 raise
             except Exception as e:
                 raise apx.HistoryStoreException(e)
+        else:
+            # No file could be written.
+            return
+
+        # Add the entry to the index so that it can be loaded without
+        # parsing the XML file.  The entry is read back from the XML
+        # text so that it is exactly what loading the file would
+        # produce.
+        try:
+            d = xmini.parseString(d.toxml(encoding=sys.getdefaultencoding()))
+            HistoryIndex(self.index_path).add(
+                pathname, self.__record(d.documentElement)
+            )
+        except KeyboardInterrupt:
+            raise
+        except Exception:
+            # The XML file is the authoritative copy of the entry,
+            # so failure to index it isn't critical.
+            pass
 
     def purge(self, be_name=None, be_uuid=None):
         """Removes all history information by deleting the directory
@@ -782,6 +1010,12 @@ class History(object):
         self.operation_be = be_name
         self.operation_be_uuid = be_uuid
 
+        try:
+            shutil.rmtree(self.index_path)
+        except EnvironmentError:
+            # Any index will be ignored without the history files.
+            pass
+
         try:
             shutil.rmtree(self.path)
         except KeyboardInterrupt:
@@ -32,10 +32,13 @@ import copy
 import datetime
 import errno
 import hashlib
+import heapq
+import mmap
 import os
 import platform
 import shutil
 import stat
+import struct
 import sys
 import tempfile
 import time
@@ -59,6 +62,7 @@ import pkg.client.progress as progress
 import pkg.client.publisher as publisher
 import pkg.client.sigpolicy as sigpolicy
 import pkg.client.transport.transport as transport
+import pkg.client.verifypool as verifypool
 import pkg.config as cfg
 import pkg.file_layout.layout as fl
 import pkg.fmri
@@ -89,6 +93,120 @@ img_root_prefix = "var/pkg"
 IMG_PUB_DIR = "publisher"
 
 
+class ActionOffsetIndex(object):
+    """A read-only, memory-mapped index that maps (action name, key
+    attribute value) tuples to the (offset, count) of the matching actions
+    in the actions.stripped file created by Image._create_fast_lookups().
+
+    The file begins with a version line and a timestamp line matching the
+    stripped actions file, followed by the number of records, a table of
+    fixed-width records sorted by action name and key, and the names and
+    keys themselves.  Each record holds the offset and length of its
+    "name\0key" string and the offset and count of its actions, which
+    allows get() to binary search the mapped file instead of loading
+    every entry into memory."""
+
+    FILE_NAME = "actions.index"
+    VERSION = "VERSION 1"
+
+    __COUNT = struct.Struct("<Q")
+    __RECORD = struct.Struct("<QIQI")
+
+    def __init__(self, path):
+        self.__map = None
+        self.__fobj = open(path, "rb")
+        try:
+            version = misc.force_str(self.__fobj.readline()).rstrip()
+            self.timestamp = misc.force_str(self.__fobj.readline()).rstrip()
+            if version != self.VERSION:
+                raise ValueError(version)
+            self.__map = mmap.mmap(
+                self.__fobj.fileno(), 0, access=mmap.ACCESS_READ
+            )
+            hdr_len = self.__fobj.tell()
+            (self.__count,) = self.__COUNT.unpack_from(self.__map, hdr_len)
+        except:
+            self.close()
+            raise
+
+        self.__rec_base = hdr_len + self.__COUNT.size
+        self.__str_base = self.__rec_base + self.__count * self.__RECORD.size
+        if self.__str_base > len(self.__map):
+            self.close()
+            raise ValueError(path)
+
+    def __len__(self):
+        return self.__count
+
+    def close(self):
+        """Release the mapping and the underlying file."""
+
+        if self.__map is not None:
+            self.__map.close()
+            self.__map = None
+        self.__fobj.close()
+
+    def get(self, key, default=None):
+        """Return the (offset, count) tuple for the (action name, key
+        attribute value) tuple 'key', or 'default' if it isn't in the
+        index."""
+
+        name, kval = key
+        target = "{0}\0{1}".format(name, kval).encode("utf-8")
+        rsize = self.__RECORD.size
+        lo, hi = 0, self.__count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            soff, slen, aoff, cnt = self.__RECORD.unpack_from(
+                self.__map, self.__rec_base + mid * rsize
+            )
+            soff += self.__str_base
+            cand = self.__map[soff : soff + slen]
+            if cand < target:
+                lo = mid + 1
+            elif cand > target:
+                hi = mid
+            else:
+                return aoff, cnt
+        return default
+
+    def items(self):
+        """Generate the ((action name, key attribute value), (offset,
+        count)) tuples in the index in sorted order."""
+
+        rsize = self.__RECORD.size
+        for i in range(self.__count):
+            soff, slen, aoff, cnt = self.__RECORD.unpack_from(
+                self.__map, self.__rec_base + i * rsize
+            )
+            soff += self.__str_base
+            name, kval = misc.force_str(self.__map[soff : soff + slen]).split(
+                "\0", 1
+            )
+            yield (name, kval), (aoff, cnt)
+
+    @classmethod
+    def write(cls, f, actdict, timestamp):
+        """Write an index of the dictionary 'actdict', which maps (action
+        name, key attribute value) tuples to (offset, count) tuples, to
+        the binary file object 'f'."""
+
+        # Code point ordering of the tuples matches the byte ordering
+        # of their UTF-8 encoded "name\0key" strings.
+        keys = sorted(actdict)
+        f.write("{0}\n{1}\n".format(cls.VERSION, timestamp).encode("utf-8"))
+        f.write(cls.__COUNT.pack(len(keys)))
+        strs = []
+        soff = 0
+        for name, kval in keys:
+            b = "{0}\0{1}".format(name, kval).encode("utf-8")
+            aoff, cnt = actdict[(name, kval)]
+            f.write(cls.__RECORD.pack(soff, len(b), aoff, cnt))
+            strs.append(b)
+            soff += len(b)
+        f.write(b"".join(strs))
+
+
 class Image(object):
     """An Image object is a directory tree containing the laid-down contents
     of a self-consistent graph of Packages.
@@ -123,6 +241,15 @@ class Image(object):
 
     __STATE_UPDATING_FILE = "state_updating"
 
+    # Files comprising the fast lookups database; see
+    # _create_fast_lookups().
+    __FAST_LOOKUP_FILES = (
+        "actions.stripped",
+        "actions.offsets",
+        "keys.conflicting",
+        "actions.index",
+    )
+
     def __init__(
         self,
         root,
@@ -995,6 +1122,18 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
                 self.__user_cache_dir, "incoming-{0:d}".format(os.getpid())
             )
 
+        # If this is a linked child image being operated on by its
+        # parent, content already retrieved by the parent can be read
+        # from the parent's caches instead of being retrieved again.
+        for cdir in os.environ.get(pkgdefs.PARENT_CACHEDIRS_ENV, "").split(
+            os.pathsep
+        ):
+            if not cdir:
+                continue
+            cdir = os.path.normpath(cdir)
+            if cdir not in self.__read_cache_dirs:
+                self.__read_cache_dirs.append(cdir)
+
         if self.version < 4:
             self.__action_cache_dir = self.temporary_dir()
         else:
@@ -2373,9 +2512,12 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
          verify.
 
         'kwargs' is a dict of additional keyword arguments to be passed
-        to each action verification routine."""
+        to each action verification routine.  If it contains a
+        'digest_pool' (a pkg.client.verifypool.DigestPool), the content
+        hashes of the package's files are obtained from it."""
 
         path_only = bool(verifypaths or overlaypaths)
+        digest_pool = kwargs.pop("digest_pool", None)
         # pkg verify only looks at actions that have not been dehydrated.
         excludes = self.list_excludes()
         vardrate_excludes = [self.cfg.variants.allow_action]
@@ -2425,7 +2567,12 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
         if not path_only:
             progresstracker.plan_add_progress(progresstracker.PLAN_PKG_VERIFY)
 
-        manf = self.get_manifest(fmri, ignore_excludes=True)
+        manf = None
+        if digest_pool is not None:
+            manf = digest_pool.start_package(fmri)
+            kwargs["digest_pool"] = digest_pool
+        if manf is None:
+            manf = self.get_manifest(fmri, ignore_excludes=True)
         sigs = list(
             manf.gen_actions_by_type("signature", excludes=self.list_excludes())
         )
@@ -3157,9 +3304,14 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
                 raise apx.ReadOnlyFileSystemException(e.filename)
             raise
 
-    def __rebuild_image_catalogs(self, progtrack=None):
+    def __rebuild_image_catalogs(self, progtrack=None, stems=None):
         """Rebuilds the image catalogs based on the available publisher
-        catalogs."""
+        catalogs.
+
+        'stems' is an optional set containing the names of the packages
+        whose publisher catalog entries have changed since the image
+        catalogs were last rebuilt.  If provided, only the entries for
+        those packages are rebuilt; all others are retained as-is."""
 
         if self.version < 3:
             raise apx.ImageFormatUpdateNeeded(self.root)
@@ -3207,6 +3359,26 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
             if os.path.isfile(fp):
                 portable.copyfile(fp, os.path.join(tmp_state_root, p))
 
+        cat_names = (self.IMG_CATALOG_KNOWN, self.IMG_CATALOG_INSTALLED)
+        if stems is not None and not all(
+            os.path.isdir(os.path.join(self._statedir, name))
+            for name in cat_names
+        ):
+            # Nothing to start from.
+            stems = None
+
+        if stems is not None:
+            # Only the entries for the changed packages need to be
+            # rebuilt, so start with a copy of the current catalogs.
+            try:
+                for name in cat_names:
+                    shutil.copytree(
+                        os.path.join(self._statedir, name),
+                        os.path.join(tmp_state_root, name),
+                    )
+            except EnvironmentError as e:
+                raise apx._convert_error(e)
+
         kcat = pkg.catalog.Catalog(
             batch_mode=True,
             meta_root=os.path.join(tmp_state_root, self.IMG_CATALOG_KNOWN),
@@ -3229,7 +3401,17 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
         # by usage of the SAT solver.
         newest = {}
         for pfx, cat in [(None, old_icat)] + pub_cats:
-            for f in cat.fmris(last=True, pubs=pfx and [pfx] or EmptyI):
+            pubs = pfx and [pfx] or EmptyI
+            if stems is None:
+                fmris = cat.fmris(last=True, pubs=pubs)
+            else:
+                fmris = (
+                    f
+                    for stem in stems
+                    for ver, vfmris in cat.fmris_by_version(stem, pubs=pubs)
+                    for f in vfmris
+                )
+            for f in fmris:
                 nver, snver = newest.get(f.pkg_name, (None, None))
                 if f.version > nver:
                     newest[f.pkg_name] = (f.version, str(f.version))
@@ -3270,6 +3452,14 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
             sign=False,
         )
 
+        if stems is not None:
+            # Discard the entries that are about to be rebuilt.
+            for cat in kcat, icat:
+                for stem in stems:
+                    for ver, fmris in list(cat.fmris_by_version(stem)):
+                        for f in fmris:
+                            cat.remove_package(f)
+
         excludes = self.list_excludes()
 
         frozen_pkgs = dict(
@@ -3291,7 +3481,19 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
             cat_ver = cat.version
             dp = cat.get_part("catalog.dependency.C", must_exist=True)
 
-            for t, sentry in spart.tuple_entries(pubs=[pfx]):
+            if stems is None:
+                sentries = spart.tuple_entries(pubs=[pfx])
+            else:
+                sentries = (
+                    ((f.publisher, f.pkg_name, sentry["version"]), sentry)
+                    for stem in stems
+                    for ver, entries in spart.entries_by_version(
+                        stem, pubs=[pfx]
+                    )
+                    for f, sentry in entries
+                )
+
+            for t, sentry in sentries:
                 pub, stem, ver = t
 
                 installed = False
@@ -3442,6 +3644,10 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
             for t, entry in ipart.tuple_entries():
                 pub, stem, ver = t
 
+                if stems is not None and stem not in stems:
+                    # Entry was retained.
+                    continue
+
                 if (
                     pub not in inst_stems
                     or stem not in inst_stems[pub]
@@ -3593,6 +3799,12 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
         total = 0
         succeeded = set()
         updated = self.__start_state_update()
+
+        # The names of the packages whose publisher catalog entries
+        # have changed, or None if the image catalogs must be rebuilt
+        # in their entirety (e.g. because a previous update was
+        # interrupted).
+        stems = None if updated else set()
         for pub in pubs_to_refresh:
             total += 1
             progtrack.refresh_start_pub(pub)
@@ -3604,6 +3816,10 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
                 )
                 if changed:
                     updated = True
+                    if pub.changed_stems is None:
+                        stems = None
+                    elif stems is not None:
+                        stems.update(pub.changed_stems)
 
                 if not ignore_unreachable and e:
                     failed.append((pub, e))
@@ -3611,11 +3827,15 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
 
             except apx.PermissionsException as e:
                 failed.append((pub, e))
+                # The publisher's catalog may have been partially
+                # updated.
+                stems = None
                 # No point in continuing since no data can
                 # be written.
                 break
             except apx.ApiException as e:
                 failed.append((pub, e))
+                stems = None
                 continue
             finally:
                 progtrack.refresh_end_pub(pub)
@@ -3624,7 +3844,7 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
         progtrack.refresh_done()
 
         if updated:
-            self.__rebuild_image_catalogs(progtrack=progtrack)
+            self.__rebuild_image_catalogs(progtrack=progtrack, stems=stems)
             # Ensure any configuration or metadata changes made
             # during refresh are reflected in on-disk state.
             self.save_config()
@@ -3790,15 +4010,7 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
         if not progtrack:
             progtrack = progress.NullProgressTracker()
 
-        self.__actdict = None
-        self.__actdict_timestamp = None
-        stripped_path = os.path.join(
-            self.__action_cache_dir, "actions.stripped"
-        )
-        offsets_path = os.path.join(self.__action_cache_dir, "actions.offsets")
-        conflicting_keys_path = os.path.join(
-            self.__action_cache_dir, "keys.conflicting"
-        )
+        self.__set_actdict(None, None)
 
         excludes = self.list_excludes()
         heap = []
@@ -3921,66 +4133,387 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
             raise
 
         progtrack.job_add_progress(progtrack.JOB_FAST_LOOKUP)
+        self.__install_fast_lookups(sp, op, bp, actdict, timestamp)
+        progtrack.job_add_progress(progtrack.JOB_FAST_LOOKUP)
+        progtrack.job_done(progtrack.JOB_FAST_LOOKUP)
+        return actdict, timestamp
+
+    def __install_fast_lookups(self, sp, op, bp, actdict, timestamp):
+        """Rename the temporary stripped actions, offsets, and
+        conflicting keys files at 'sp', 'op', and 'bp' into their final
+        place, along with a binary index of 'actdict' (see
+        ActionOffsetIndex).  If we have any problems, do our best to
+        remove them, and we'll try to recreate them on the read-side."""
+
+        try:
+            ip = self.__write_action_index(actdict, timestamp)
+        except (EnvironmentError, UnicodeError):
+            # The binary index is an optimisation; the offsets file
+            # is used if it isn't available.
+            ip = None
+
+        tmp_paths = [
+            (sp, "actions.stripped"),
+            (op, "actions.offsets"),
+            (bp, "keys.conflicting"),
+        ]
+        if ip:
+            tmp_paths.append((ip, ActionOffsetIndex.FILE_NAME))
+        else:
+            try:
+                portable.remove(
+                    os.path.join(
+                        self.__action_cache_dir, ActionOffsetIndex.FILE_NAME
+                    )
+                )
+            except EnvironmentError:
+                pass
+
+        def install():
+            for tp, fname in tmp_paths:
+                portable.rename(
+                    tp, os.path.join(self.__action_cache_dir, fname)
+                )
 
-        # Finally, rename the temporary files into their final place.
-        # If we have any problems, do our best to remove them, and we'll
-        # try to recreate them on the read-side.
         try:
             if not os.path.exists(self.__action_cache_dir):
                 os.makedirs(self.__action_cache_dir)
-            portable.rename(sp, stripped_path)
-            portable.rename(op, offsets_path)
-            portable.rename(bp, conflicting_keys_path)
+            install()
         except EnvironmentError as err:
             if err.errno == errno.EACCES or err.errno == errno.EROFS:
                 self.__action_cache_dir = self.temporary_dir()
-                stripped_path = os.path.join(
-                    self.__action_cache_dir, "actions.stripped"
-                )
-                offsets_path = os.path.join(
-                    self.__action_cache_dir, "actions.offsets"
-                )
-                conflicting_keys_path = os.path.join(
-                    self.__action_cache_dir, "keys.conflicting"
-                )
-                portable.rename(sp, stripped_path)
-                portable.rename(op, offsets_path)
-                portable.rename(bp, conflicting_keys_path)
+                install()
             else:
-                try:
-                    os.unlink(stripped_path)
-                    os.unlink(offsets_path)
-                    os.unlink(conflicting_keys_path)
-                except:
-                    pass
+                for tp, fname in tmp_paths:
+                    try:
+                        os.unlink(os.path.join(self.__action_cache_dir, fname))
+                    except:
+                        pass
                 raise err
 
+    def __write_action_index(self, actdict, timestamp):
+        """Write the binary index of 'actdict' described by
+        ActionOffsetIndex to a temporary file and return its path."""
+
+        fd, ip = self.temporary_file(close=False)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                ActionOffsetIndex.write(f, actdict, timestamp)
+            os.chmod(ip, misc.PKG_FILE_MODE)
+        except BaseException:
+            try:
+                os.unlink(ip)
+            except:
+                pass
+            raise
+        return ip
+
+    def _update_fast_lookups(self, pkg_plans, progtrack=None):
+        """Incrementally update the on-disk database described in
+        _create_fast_lookups() by applying the changes made by the
+        executed 'pkg_plans': the actions of each origin package are
+        dropped, and the actions of each destination package are merged
+        in.  Only the keys touched by those actions are re-checked for
+        conflicts.
+
+        This relies on the previous database having been preserved by
+        _remove_fast_lookups(preserve=True) before the image was
+        modified; if it is missing or invalid, the database is rebuilt
+        from scratch instead.  Returns the same tuple as
+        _create_fast_lookups()."""
+
+        if not progtrack:
+            progtrack = progress.NullProgressTracker()
+
+        prev = dict(
+            (fname, os.path.join(self.__action_cache_dir, fname + ".prev"))
+            for fname in self.__FAST_LOOKUP_FILES
+        )
+
+        try:
+            of = open(prev["actions.offsets"], "r")
+            sf = open(prev["actions.stripped"], "rb")
+            bf = open(prev["keys.conflicting"], "r")
+        except EnvironmentError as e:
+            if e.errno != errno.ENOENT:
+                raise apx._convert_error(e)
+            self.__discard_prev_fast_lookups()
+            return self._create_fast_lookups(progtrack=progtrack)
+
+        try:
+            res = self.__merge_fast_lookups(pkg_plans, of, sf, bf, progtrack)
+        finally:
+            of.close()
+            sf.close()
+            bf.close()
+            self.__discard_prev_fast_lookups()
+
+        if res is None:
+            # The preserved database couldn't be used.
+            return self._create_fast_lookups(progtrack=progtrack)
+        return res
+
+    def __merge_fast_lookups(self, pkg_plans, of, sf, bf, progtrack):
+        """Private helper for _update_fast_lookups() that merges the
+        preserved database in the files 'of', 'sf', and 'bf' with the
+        changes made by 'pkg_plans'.  Returns None if the preserved
+        database is invalid."""
+
+        oversion = of.readline().rstrip()
+        otimestamp = of.readline().rstrip()
+        sversion = misc.force_str(sf.readline()).rstrip()
+        stimestamp = misc.force_str(sf.readline()).rstrip()
+        if (
+            oversion != "VERSION 2"
+            or sversion != "VERSION 1"
+            or stimestamp != otimestamp
+            or bf.readline().rstrip() != "VERSION 1"
+        ):
+            return None
+        old_bad_keys = set(l.rstrip() for l in bf)
+
+        self.__set_actdict(None, None)
+        excludes = self.list_excludes()
+
+        progtrack.job_start(progtrack.JOB_FAST_LOOKUP)
+
+        # Using strings instead of PkgFmri objects allows for much
+        # faster comparisons.
+        removed = set()
+        added = []
+        for pp in pkg_plans:
+            if pp.origin_fmri:
+                removed.add(str(pp.origin_fmri))
+            if pp.destination_fmri:
+                added.append(pp.destination_fmri)
+
+        # The keys touched by this change; all actions with these keys
+        # must be re-checked for conflicts.
+        touched = set()
+        new = []
+        for pfmri in added:
+            progtrack.job_add_progress(progtrack.JOB_FAST_LOOKUP)
+            m = self.get_manifest(pfmri, ignore_excludes=True)
+            for act in m.gen_actions(excludes=excludes):
+                if not act.globally_identical:
+                    continue
+                act.strip()
+                key = act.attrs[act.key_attr]
+                touched.add(key)
+                new.append((act.name, key, f"{pfmri} {act}\n"))
+        new.sort(key=lambda t: (t[0], t[1]))
+
+        ostart = of.tell()
+
+        def gen_groups():
+            """Yield the (name, key, lines) tuples of the preserved
+            database."""
+
+            of.seek(ostart)
+            for line in of:
+                name, offset, cnt, key = line.rstrip().split(None, 3)
+                sf.seek(int(offset))
+                yield name, key, [
+                    misc.force_str(sf.readline()) for i in range(int(cnt))
+                ]
+
+        # Since conflicts can exist between actions of different types
+        # in the same namespace, all keys of the actions being removed
+        # have to be known before the merge begins.
+        for name, key, lines in gen_groups():
+            if key in touched:
+                continue
+            for sf_line in lines:
+                if sf_line.split(None, 1)[0] in removed:
+                    touched.add(key)
+                    break
+
+        def gen_old():
+            """Yield the (name, key, line) tuples of the preserved
+            database, skipping those delivered by the packages being
+            removed."""
+
+            for name, key, lines in gen_groups():
+                for sf_line in lines:
+                    if key in touched and sf_line.split(None, 1)[0] in removed:
+                        continue
+                    yield name, key, sf_line
+
+        try:
+            actdict = {}
+            nsd = {}
+            sf_new, sp = self.temporary_file(close=False)
+            of_new, op = self.temporary_file(close=False)
+            bf_new, bp = self.temporary_file(close=False)
+
+            sf_new = os.fdopen(sf_new, "w")
+            of_new = os.fdopen(of_new, "w")
+            bf_new = os.fdopen(bf_new, "w")
+
+            timestamp = int(time.time())
+            sf_new.write("VERSION 1\n{0}\n".format(timestamp))
+            of_new.write("VERSION 2\n{0}\n".format(timestamp))
+            bf_new.write("VERSION 1\n")
+
+            # Both streams are ordered by action name and key, and the
+            # only requirement of the stripped actions file is that the
+            # actions for a given name and key are contiguous.
+            cnt = 0
+            last_name, last_key, last_offset = None, None, sf_new.tell()
+            offset = last_offset
+            for name, key, sf_line in heapq.merge(
+                gen_old(), new, key=lambda t: (t[0], t[1])
+            ):
+                if name != last_name or key != last_key:
+                    if last_name is not None:
+                        of_new.write(
+                            "{0} {1} {2} {3}\n".format(
+                                last_name, last_offset, cnt, last_key
+                            )
+                        )
+                        actdict[(last_name, last_key)] = last_offset, cnt
+                    last_name, last_key, last_offset = name, key, offset
+                    cnt = 0
+                cnt += 1
+                sf_new.write(sf_line)
+                offset += len(sf_line.encode("utf-8"))
+
+                if key in touched:
+                    fmristr, actstr = sf_line.rstrip().split(None, 1)
+                    act = pkg.actions.fromstr(actstr)
+                    nsd.setdefault(act.namespace_group, {}).setdefault(
+                        key, []
+                    ).append((act, pkg.fmri.PkgFmri(fmristr)))
+            if last_name is not None:
+                of_new.write(
+                    "{0} {1} {2} {3}\n".format(
+                        last_name, last_offset, cnt, last_key
+                    )
+                )
+                actdict[(last_name, last_key)] = last_offset, cnt
+
+            progtrack.job_add_progress(progtrack.JOB_FAST_LOOKUP)
+
+            bad_keys = old_bad_keys - touched
+            bad_keys |= imageplan.ImagePlan._check_actions(nsd)
+            for k in sorted(bad_keys):
+                bf_new.write("{0}\n".format(k))
+
+            sf_new.close()
+            of_new.close()
+            bf_new.close()
+            os.chmod(sp, misc.PKG_FILE_MODE)
+            os.chmod(op, misc.PKG_FILE_MODE)
+            os.chmod(bp, misc.PKG_FILE_MODE)
+        except BaseException:
+            try:
+                os.unlink(sp)
+                os.unlink(op)
+                os.unlink(bp)
+            except:
+                pass
+            raise
+
+        progtrack.job_add_progress(progtrack.JOB_FAST_LOOKUP)
+        self.__install_fast_lookups(sp, op, bp, actdict, timestamp)
         progtrack.job_add_progress(progtrack.JOB_FAST_LOOKUP)
         progtrack.job_done(progtrack.JOB_FAST_LOOKUP)
         return actdict, timestamp
 
-    def _remove_fast_lookups(self):
+    def __discard_prev_fast_lookups(self):
+        """Remove any copy of the fast lookups database preserved by
+        _remove_fast_lookups()."""
+
+        for fname in self.__FAST_LOOKUP_FILES:
+            try:
+                portable.remove(
+                    os.path.join(self.__action_cache_dir, fname + ".prev")
+                )
+            except EnvironmentError as e:
+                if e.errno == errno.ENOENT:
+                    continue
+                raise apx._convert_error(e)
+
+    def _remove_fast_lookups(self, preserve=False):
         """Remove on-disk database created by _create_fast_lookups.
         Should be called before updating image state to prevent the
         client from seeing stale state if _create_fast_lookups is
-        interrupted."""
+        interrupted.
 
-        for fname in (
-            "actions.stripped",
-            "actions.offsets",
-            "keys.conflicting",
-        ):
+        If 'preserve' is True, the database is set aside instead so that
+        it can later be updated incrementally by _update_fast_lookups()."""
+
+        self.__discard_prev_fast_lookups()
+        for fname in self.__FAST_LOOKUP_FILES:
+            path = os.path.join(self.__action_cache_dir, fname)
             try:
-                portable.remove(os.path.join(self.__action_cache_dir, fname))
+                if preserve:
+                    portable.rename(path, path + ".prev")
+                else:
+                    portable.remove(path)
             except EnvironmentError as e:
                 if e.errno == errno.ENOENT:
                     continue
                 raise apx._convert_error(e)
 
+    def __load_action_index(self):
+        """Return an ActionOffsetIndex for the binary index written by
+        _create_fast_lookups(), or None if it doesn't exist or doesn't
+        match the stripped actions file."""
+
+        try:
+            index = ActionOffsetIndex(
+                os.path.join(
+                    self.__action_cache_dir, ActionOffsetIndex.FILE_NAME
+                )
+            )
+        except (EnvironmentError, ValueError, struct.error):
+            return None
+
+        try:
+            sversion, stimestamp = self._get_stripped_actions_file(
+                internal=True
+            )
+        except EnvironmentError:
+            index.close()
+            return None
+
+        if sversion != "VERSION 1" or stimestamp != index.timestamp:
+            index.close()
+            return None
+
+        if (
+            isinstance(self.__actdict, ActionOffsetIndex)
+            and self.__actdict.timestamp == index.timestamp
+        ):
+            # Already loaded.
+            index.close()
+            return self.__actdict
+        return index
+
+    def __set_actdict(self, actdict, timestamp):
+        """Cache the mapping 'actdict' returned by _load_actdict(),
+        closing the previously cached index if it is being replaced."""
+
+        if (
+            isinstance(self.__actdict, ActionOffsetIndex)
+            and self.__actdict is not actdict
+        ):
+            self.__actdict.close()
+        self.__actdict = actdict
+        self.__actdict_timestamp = timestamp
+
     def _load_actdict(self, progtrack):
-        """Read the file of offsets created in _create_fast_lookups()
-        and return the dictionary mapping action name and key value to
-        offset."""
+        """Return a mapping of action name and key value to the offset
+        and count of the matching actions in the stripped actions file
+        created in _create_fast_lookups().  If possible, this is an
+        ActionOffsetIndex which only reads the entries actually looked
+        up; otherwise, the file of offsets is read into a dictionary."""
+
+        index = self.__load_action_index()
+        if index is not None:
+            self.__set_actdict(index, index.timestamp)
+            return index
 
         try:
             of = open(
@@ -3991,8 +4524,7 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
                 raise
             actdict, otimestamp = self._create_fast_lookups()
             assert actdict is not None
-            self.__actdict = actdict
-            self.__actdict_timestamp = otimestamp
+            self.__set_actdict(actdict, otimestamp)
             return actdict
 
         # Make sure the files are paired, and try to create them if not.
@@ -4017,8 +4549,7 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
             of.close()
             actdict, otimestamp = self._create_fast_lookups()
             assert actdict is not None
-            self.__actdict = actdict
-            self.__actdict_timestamp = otimestamp
+            self.__set_actdict(actdict, otimestamp)
             return actdict
 
         # At this point, the original actions.offsets file existed, no
@@ -4041,8 +4572,7 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
                 progtrack.plan_add_progress(progtrack.PLAN_ACTION_CONFLICT)
 
         of.close()
-        self.__actdict = actdict
-        self.__actdict_timestamp = otimestamp
+        self.__set_actdict(actdict, otimestamp)
         return actdict
 
     def _get_stripped_actions_file(self, internal=False):
@@ -4176,12 +4706,27 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
         downloaded content.  This may take a while for a large
         directory hierarchy.  Don't clean up caches if the
         user overrode the underlying setting using PKG_CACHEDIR or
-        PKG_CACHEROOT."""
+        PKG_CACHEROOT.
 
+        If the content cache is not flushed and the image's
+        content-cache-size property is set, the least recently used
+        files are instead removed until the cache fits within that
+        many bytes."""
+
+        limit = 0
         if not force and not self.cfg.get_policy(
             imageconfig.FLUSH_CONTENT_CACHE
         ):
-            return
+            try:
+                limit = int(
+                    self.cfg.get_property(
+                        "property", imageconfig.CONTENT_CACHE_SIZE
+                    )
+                )
+            except (cfg.PropertyConfigError, ValueError):
+                limit = 0
+            if limit <= 0:
+                return
 
         cdirs = []
         for path, readonly, pub, layout in self.get_cachedirs():
@@ -4201,11 +4746,52 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
 
         # 'Updating package cache'
         progtrack.job_start(progtrack.JOB_PKG_CACHE, goal=len(cdirs))
-        for path in cdirs:
-            shutil.rmtree(path, True)
-            progtrack.job_add_progress(progtrack.JOB_PKG_CACHE)
+        if limit:
+            self.__prune_cached_content(cdirs, limit, progtrack)
+        else:
+            for path in cdirs:
+                shutil.rmtree(path, True)
+                progtrack.job_add_progress(progtrack.JOB_PKG_CACHE)
         progtrack.job_done(progtrack.JOB_PKG_CACHE)
 
+    @staticmethod
+    def __prune_cached_content(cdirs, limit, progtrack):
+        """Remove the least recently used files found in the cache
+        directories listed in 'cdirs' until their combined size is no
+        more than 'limit' bytes.  A file's last use is the later of its
+        access and modification times; the transport updates both
+        whenever cached content is reused."""
+
+        total = 0
+        entries = []
+        for cdir in cdirs:
+            for dirpath, dirnames, filenames in os.walk(cdir):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.lstat(path)
+                    except EnvironmentError:
+                        continue
+                    total += st.st_size
+                    entries.append(
+                        (max(st.st_atime, st.st_mtime), st.st_size, path)
+                    )
+            progtrack.job_add_progress(progtrack.JOB_PKG_CACHE)
+
+        if total <= limit:
+            return
+
+        # Evict the oldest entries first.
+        entries.sort()
+        for used, size, path in entries:
+            if total <= limit:
+                break
+            try:
+                portable.remove(path)
+            except EnvironmentError:
+                continue
+            total -= size
+
     def salvage(self, path, full_path=False):
         """Called when unexpected file or directory is found during
         package operations; returns the path of the salvage
@@ -4294,6 +4880,16 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
         for file_name in os.listdir(source_path):
             misc.move(os.path.join(source_path, file_name), full_dest_path)
 
+    def get_verify_cache(self, full=False):
+        """Returns a pkg.client.verifypool.VerifyCache of the installed
+        files whose content was found to be correct by a previous
+        verification.  If 'full' is True, its entries are ignored so
+        that the content of every file is verified again."""
+
+        return verifypool.VerifyCache(
+            os.path.join(self.__action_cache_dir, "verify.cache"), full=full
+        )
+
     def temporary_dir(self):
         """Create a temp directory under the image directory for various
         purposes.  If the process is unable to create a directory in the
@@ -4999,6 +5595,7 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
         unpackaged=False,
         unpackaged_only=False,
         verify_paths=EmptyI,
+        verify_full=False,
     ):
         """Create an image plan to fix the image. Note: verify shares
         the same routine."""
@@ -5013,6 +5610,7 @@ in the environment or by setting simulate_cmdpath in DebugValues."""
             unpackaged=unpackaged,
             unpackaged_only=unpackaged_only,
             verify_paths=verify_paths,
+            verify_full=verify_full,
         )
         progtrack.plan_all_done()
 
@@ -60,8 +60,10 @@ from pkg.client.transport.exception import TransportFailures
 BE_POLICY = "be-policy"
 TEMP_BE_ACTIVATION = "temp-be-activation"
 CONTENT_UPDATE_POLICY = "content-update-policy"
+CONTENT_CACHE_SIZE = "content-cache-size"
 FLUSH_CONTENT_CACHE = "flush-content-cache-on-success"
 MIRROR_DISCOVERY = "mirror-discovery"
+TRANSPORT_HTTP2 = "transport-http2"
 SEND_UUID = "send-uuid"
 USE_SYSTEM_REPO = "use-system-repo"
 CHECK_CERTIFICATE_REVOCATION = "check-certificate-revocation"
@@ -70,6 +72,8 @@ EXCLUDE_POLICY = "exclude-policy"
 KEY_FILES = "key-files"
 DEFAULT_RECURSE = "default-recurse"
 DEFAULT_CONCURRENCY = "recursion-concurrency"
+VERIFY_CONCURRENCY = "verify-concurrency"
+INSTALL_CONCURRENCY = "install-concurrency"
 AUTO_BE_NAME = "auto-be-name"
 
 default_policies = {
@@ -78,6 +82,7 @@ default_policies = {
     CONTENT_UPDATE_POLICY: "default",
     FLUSH_CONTENT_CACHE: True,
     MIRROR_DISCOVERY: False,
+    TRANSPORT_HTTP2: False,
     SEND_UUID: True,
     SIGNATURE_POLICY: sigpolicy.DEFAULT_POLICY,
     USE_SYSTEM_REPO: False,
@@ -95,9 +100,12 @@ CA_PATH = "ca-path"
 # Default CA_PATH is /etc/ssl/certs
 default_properties = {
     CA_PATH: os.path.join(os.path.sep, "etc", "ssl", "certs"),
+    CONTENT_CACHE_SIZE: 0,
     # Path default is intentionally relative for this case.
     "trust-anchor-directory": os.path.join("etc", "ssl", "pkg"),
     DEFAULT_CONCURRENCY: 1,
+    VERIFY_CONCURRENCY: 0,
+    INSTALL_CONCURRENCY: 1,
     AUTO_BE_NAME: "omnios-r%r",
 }
 
@@ -226,10 +234,19 @@ class ImageConfig(cfg.FileConfig):
                         FLUSH_CONTENT_CACHE,
                         default=default_policies[FLUSH_CONTENT_CACHE],
                     ),
+                    cfg.PropInt(
+                        CONTENT_CACHE_SIZE,
+                        minimum=0,
+                        default=default_properties[CONTENT_CACHE_SIZE],
+                    ),
                     cfg.PropBool(
                         MIRROR_DISCOVERY,
                         default=default_policies[MIRROR_DISCOVERY],
                     ),
+                    cfg.PropBool(
+                        TRANSPORT_HTTP2,
+                        default=default_policies[TRANSPORT_HTTP2],
+                    ),
                     cfg.PropBool(
                         SEND_UUID, default=default_policies[SEND_UUID]
                     ),
@@ -266,6 +283,16 @@ class ImageConfig(cfg.FileConfig):
                         minimum=0,
                         default=default_properties[DEFAULT_CONCURRENCY],
                     ),
+                    cfg.PropInt(
+                        VERIFY_CONCURRENCY,
+                        minimum=0,
+                        default=default_properties[VERIFY_CONCURRENCY],
+                    ),
+                    cfg.PropInt(
+                        INSTALL_CONCURRENCY,
+                        minimum=0,
+                        default=default_properties[INSTALL_CONCURRENCY],
+                    ),
                     cfg.Property(
                         AUTO_BE_NAME,
                         default=default_properties[AUTO_BE_NAME],
@@ -52,6 +52,7 @@ logger = global_settings.logger
 import pkg.actions
 import pkg.actions.driver as driver
 import pkg.catalog
+import pkg.client.actionexec as actionexec
 import pkg.client.api_errors as api_errors
 import pkg.client.bootenv as bootenv
 import pkg.client.indexer as indexer
@@ -61,6 +62,7 @@ import pkg.client.pkgdefs as pkgdefs
 import pkg.client.pkgplan as pkgplan
 import pkg.client.plandesc as plandesc
 import pkg.client.imageconfig as imageconfig
+import pkg.client.verifypool as verifypool
 import pkg.digest as digest
 import pkg.fmri
 import pkg.manifest as manifest
@@ -169,6 +171,7 @@ class ImagePlan(object):
         self.__match_inst = {}  # dict of fmri -> pattern
         self.__match_rm = {}  # dict of fmri -> pattern
         self.__match_update = {}  # dict of fmri -> pattern
+        self.__verify_cache = None  # verifypool.VerifyCache for plan_fix
 
         self.__pkg_actuators = set()
         self._retrieved = set()
@@ -2258,6 +2261,59 @@ class ImagePlan(object):
     ):
         """Verify FRMIs."""
 
+        path_only = bool(verifypaths or overlaypaths)
+        digest_pool = None
+        if not path_only:
+            jobs = misc.get_worker_count(
+                self.image.cfg.get_property(
+                    "property", imageconfig.VERIFY_CONCURRENCY
+                )
+            )
+            if jobs > 1:
+                excludes = self.image.list_excludes()
+                dehydrate = self.image.cfg.get_property(
+                    "property", "dehydrated"
+                )
+                if dehydrate:
+                    excludes.append(
+                        self.image.get_dehydrated_exclude_func(dehydrate)
+                    )
+                digest_pool = verifypool.DigestPool(
+                    self.image,
+                    proposed_fmris,
+                    jobs,
+                    excludes=excludes,
+                    verbose=True,
+                    verify_cache=self.__verify_cache,
+                )
+
+        try:
+            self.__verify_fmris_impl(
+                repairs,
+                args,
+                proposed_fmris,
+                pt,
+                verifypaths,
+                overlaypaths,
+                digest_pool,
+            )
+        finally:
+            if digest_pool is not None:
+                digest_pool.close()
+
+    def __verify_fmris_impl(
+        self,
+        repairs,
+        args,
+        proposed_fmris,
+        pt,
+        verifypaths,
+        overlaypaths,
+        digest_pool,
+    ):
+        """Verify FMRIs, obtaining the content hashes of their files
+        from 'digest_pool' if it is not None."""
+
         path_only = bool(verifypaths or overlaypaths)
         overlay_entries = {}
         def_pkgs = {}  # deferred packages
@@ -2283,6 +2339,8 @@ class ImagePlan(object):
                 overlaypaths=overlaypaths,
                 verbose=True,
                 forever=True,
+                digest_pool=digest_pool,
+                verify_cache=self.__verify_cache,
             ):
                 if not path_only and overlay:
                     path = act.attrs.get("path")
@@ -2398,14 +2456,20 @@ class ImagePlan(object):
         unpackaged=False,
         unpackaged_only=False,
         verify_paths=misc.EmptyI,
+        verify_full=False,
     ):
-        """Determine the changes needed to fix the image."""
+        """Determine the changes needed to fix the image.
+
+        'verify_full' indicates that the content of every file should
+        be hashed, even if the verify cache shows it to be unchanged
+        since it was last verified."""
 
         self.__plan_op()
         self.__evaluate_excludes()
 
         pt = self.__progtrack
         pt.plan_all_start()
+        self.__verify_cache = self.image.get_verify_cache(full=verify_full)
 
         if args:
             proposed_dict, self.__match_rm = self.__match_user_fmris(
@@ -2482,6 +2546,11 @@ class ImagePlan(object):
                 )
 
         pt.plan_done(pt.PLAN_PKG_VERIFY)
+        # Entries for files that are no longer installed are dropped
+        # whenever the whole image has been verified.
+        self.__verify_cache.save(prune=not args and not verify_paths)
+        self.__verify_cache = None
+
         # If no repairs, finish the plan.
         if not repairs:
             self.__finish_plan(plandesc.EVALUATED_PKGS)
@@ -5810,11 +5879,18 @@ image (there are configured exclusions):"""
         # image before the current operation is performed is desired.
         empty_image = self.__is_image_empty()
 
+        # The fast lookups database can only be updated incrementally
+        # if the set of excluded actions isn't changing.
+        incr_lookups = not empty_image and (
+            self.pd._new_variants is None and self.pd._new_facets is None
+        )
+
         if not empty_image:
             # Before proceeding, remove fast lookups database so
             # that if _create_fast_lookups is interrupted later the
-            # client isn't left with invalid state.
-            self.image._remove_fast_lookups()
+            # client isn't left with invalid state.  If it can be
+            # updated incrementally, it is set aside instead.
+            self.image._remove_fast_lookups(preserve=incr_lookups)
 
         if not self.image.is_liveroot():
             # Check if the child is a running zone. If so run the
@@ -5839,6 +5915,13 @@ image (there are configured exclusions):"""
         # List of tuples of (src, dest) used to track each pkgplan so
         # that it can be discarded after execution.
         executed_pp = []
+        executor = actionexec.ActionExecutor(
+            misc.get_worker_count(
+                self.image.cfg.get_property(
+                    "property", imageconfig.INSTALL_CONCURRENCY
+                )
+            )
+        )
         try:
             try:
                 pt.actions_set_goal(
@@ -5871,14 +5954,13 @@ image (there are configured exclusions):"""
                 self.pd.removal_actions = []
 
                 # execute installs; if action throws a retry
-                # exception try it again afterwards.
-                retries = []
-                for p, src, dest in self.pd.install_actions:
-                    try:
-                        p.execute_install(src, dest)
-                        pt.actions_add_progress(pt.ACTION_INSTALL)
-                    except pkg.actions.ActionRetry:
-                        retries.append((p, src, dest))
+                # exception try it again afterwards.  Independent
+                # file and link actions may be executed concurrently.
+                retries = executor.execute(
+                    self.pd.install_actions,
+                    lambda p, src, dest: p.execute_install(src, dest),
+                    lambda: pt.actions_add_progress(pt.ACTION_INSTALL),
+                )
                 for p, src, dest in retries:
                     p.execute_retry(src, dest)
                     pt.actions_add_progress(pt.ACTION_INSTALL)
@@ -5896,13 +5978,11 @@ image (there are configured exclusions):"""
                 # the retryable exception).
                 # An example is a user action that depends
                 # upon a file existing (ie ftpusers).
-                retries = []
-                for p, src, dest in self.pd.update_actions:
-                    try:
-                        p.execute_update(src, dest)
-                        pt.actions_add_progress(pt.ACTION_UPDATE)
-                    except pkg.actions.ActionRetry:
-                        retries.append((p, src, dest))
+                retries = executor.execute(
+                    self.pd.update_actions,
+                    lambda p, src, dest: p.execute_update(src, dest),
+                    lambda: pt.actions_add_progress(pt.ACTION_UPDATE),
+                )
 
                 for p, src, dest in retries:
                     p.execute_retry(src, dest)
@@ -5997,8 +6077,15 @@ image (there are configured exclusions):"""
 
         else:
             self.pd._actuators.exec_post_actuators(self.image)
+        finally:
+            executor.close()
 
-        self.image._create_fast_lookups(progtrack=self.__progtrack)
+        if incr_lookups:
+            self.image._update_fast_lookups(
+                self.pd.pkg_plans, progtrack=self.__progtrack
+            )
+        else:
+            self.image._create_fast_lookups(progtrack=self.__progtrack)
         self.__save_release_notes()
 
         # success
@@ -3422,6 +3422,12 @@ class LinkedImageChild(object):
 
         self.__child_op = _pkg_op
 
+        # Let the child reuse content that has already been retrieved
+        # into our caches rather than retrieving it again.
+        self.__pkg_remote.set_cache_dirs(
+            cdir for cdir, readonly, pub, layout in self.__img.get_cachedirs()
+        )
+
         if _pkg_op == pkgdefs.PKG_OP_AUDIT_LINKED:
             self.__child_setup_audit(_pmd, **kwargs)
         elif _pkg_op == pkgdefs.PKG_OP_DETACH:
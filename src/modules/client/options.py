@@ -102,6 +102,7 @@ UPDATE_INDEX          = "update_index"
 UNPACKAGED            = "unpackaged"
 UNPACKAGED_ONLY       = "unpackaged_only"
 VERIFY_PATHS          = "verify_paths"
+VERIFY_FULL           = "verify_full"
 VERBOSE               = "verbose"
 SYNC_ACT              = "sync_act"
 ACT_TIMEOUT           = "act_timeout"
@@ -1282,6 +1283,10 @@ opts_table_publishers = [
 opts_table_unpackaged = [
     (UNPACKAGED,       False, [], {"type": "boolean"}),
 ]
+
+opts_table_verify_full = [
+    (VERIFY_FULL,      False, [], {"type": "boolean"}),
+]
 #
 # Options for pkg(1) subcommands.  Built by combining the option tables above,
 # with some optional subcommand unique options defined below.
@@ -1461,6 +1466,7 @@ opts_fix = \
     opts_table_no_headers + \
     opts_table_parsable + \
     opts_table_unpackaged + \
+    opts_table_verify_full + \
     []
 
 opts_verify = \
@@ -1469,6 +1475,7 @@ opts_verify = \
     opts_table_no_headers + \
     opts_table_parsable + \
     opts_table_unpackaged + \
+    opts_table_verify_full + \
     [
     opts_table_cb_nqv,
     opts_table_cb_unpackaged,
@@ -162,6 +162,13 @@ api_stage_values = frozenset(
     ]
 )
 
+# Environment variable used to pass the content cache directories of a
+# parent image to the "pkg remote" process operating on a linked child
+# image, so that the child can reuse content the parent has already
+# retrieved.  The value is a list of directories separated by os.pathsep.
+# It is private to that process; pkg(1) ignores it for any other subcommand.
+PARENT_CACHEDIRS_ENV = "PKG_PARENT_CACHEDIRS"
+
 #
 # Please note that the values of these PKG_STATE constants should not
 # be changed as it would invalidate existing catalog data stored in the
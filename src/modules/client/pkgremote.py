@@ -74,6 +74,7 @@ class PkgRemote(object):
         self.__rpc_server_fstdout = None
         self.__rpc_server_fstderr = None
         self.__rpc_server_prog_pipe_fobj = None
+        self.__rpc_server_cache_dirs = []
 
         # initialize RPC client process state
         self.__rpc_client = None
@@ -129,6 +130,14 @@ class PkgRemote(object):
             "--progfd={0}".format(server_prog_pipe_fobj.fileno()),
         ]
 
+        # let the server read content from any additional caches
+        env = None
+        if self.__rpc_server_cache_dirs:
+            env = os.environ.copy()
+            env[pkgdefs.PARENT_CACHEDIRS_ENV] = os.pathsep.join(
+                self.__rpc_server_cache_dirs
+            )
+
         self.__debug_msg("RPC server cmd: {0}".format(" ".join(pkg_cmd)))
 
         # create temporary files to log standard output and error from
@@ -151,6 +160,7 @@ class PkgRemote(object):
                 stdout=fstdout,
                 stderr=fstderr,
                 pass_fds=(server_cmd_pipe, server_prog_pipe_fobj.fileno()),
+                env=env,
             )
 
         except OSError as e:
@@ -428,6 +438,16 @@ class PkgRemote(object):
         # drain the progress pipe
         self.__rpc_client_prog_pipe_drain()
 
+    def set_cache_dirs(self, cache_dirs):
+        """Public interface to specify additional content cache
+        directories that remote packaging operations may read content
+        from.
+
+        'cache_dirs' is a list of the absolute paths of the cache
+        directories.  Remote operations treat these as read-only."""
+
+        self.__rpc_server_cache_dirs = list(cache_dirs)
+
     def setup(self, img_path, pkg_op, **kwargs):
         """Public interface to setup a remote packaging operation.
 
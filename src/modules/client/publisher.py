@@ -1388,6 +1388,7 @@ class Publisher(object):
     # found near the end of the class definition.
     _catalog = None
     __alias = None
+    __changed_stems = None
     __client_uuid = None
     __client_uuid_time = None
     __disabled = False
@@ -1975,6 +1976,14 @@ pkg unset-publisher {0}
             or self.revoked_ca_certs
         )
 
+    @property
+    def changed_stems(self):
+        """A set containing the names of the packages whose catalog
+        entries were changed by the last refresh, or None if they are
+        not known (e.g. because a full catalog was retrieved)."""
+
+        return self.__changed_stems
+
     @property
     def needs_refresh(self):
         """A boolean value indicating whether the publisher's
@@ -2284,6 +2293,9 @@ pkg unset-publisher {0}
         indicates that catalog data was actually retrieved to determine
         if there were any updates."""
 
+        # Changes made by converting a v0 catalog aren't tracked.
+        self.__changed_stems = None
+
         if full_refresh:
             immediate = True
 
@@ -2449,8 +2461,13 @@ pkg unset-publisher {0}
         # move the files to the appropriate location.
         validate = False
         if not full_refresh and v1_cat.exists:
-            v1_cat.apply_updates(tempdir)
+            stems = v1_cat.apply_updates(tempdir)
+            if stems is None or self.__changed_stems is None:
+                self.__changed_stems = None
+            else:
+                self.__changed_stems.update(stems)
         else:
+            self.__changed_stems = None
             if v1_cat.exists:
                 # This is a full refresh.  Destroy
                 # the existing catalog.
@@ -2561,6 +2578,7 @@ pkg unset-publisher {0}
         if full_refresh:
             immediate = True
 
+        self.__changed_stems = set()
         for origin, opath in self.__gen_origin_paths():
             misc.makedirs(opath)
             cat = pkg.catalog.Catalog(meta_root=opath, read_only=True)
@@ -2613,6 +2631,7 @@ pkg unset-publisher {0}
         # composite of the catalogs from all origins.
         if self.__rebuild_catalog():
             any_changed = True
+            self.__changed_stems = None
 
         errors = None
         if failed:
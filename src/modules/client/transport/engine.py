@@ -47,13 +47,39 @@ import pkg.client.transport.exception as tx
 import pkg.client.transport.fileobj as fileobj
 import pkg.misc as misc
 
-from collections import deque
+from collections import Counter, deque
 from pkg.client import global_settings
 from pkg.client.debugvalues import DebugValues
 
 pipelined_protocols = ()
 response_protocols = ("ftp", "http", "https")
 
+# When requests are multiplexed over HTTP/2 connections, the number of
+# requests that may be in flight for each connection the engine allows.
+http2_streams_per_conn = 8
+
+# HTTP/2 stream weights for priority and normal requests.
+http2_priority_weight = 256
+http2_default_weight = 16
+
+
+def http2_supported():
+    """Returns a boolean indicating whether the libcurl in use is able
+    to negotiate HTTP/2 and multiplex requests."""
+
+    features = pycurl.version_info()[4]
+    if not features & getattr(pycurl, "VERSION_HTTP2", 0):
+        return False
+    return all(
+        hasattr(pycurl, opt)
+        for opt in (
+            "CURL_HTTP_VERSION_2TLS",
+            "M_MAX_TOTAL_CONNECTIONS",
+            "PIPE_MULTIPLEX",
+            "PIPEWAIT",
+        )
+    )
+
 
 class TransportEngine(object):
     """This is an abstract class.  It shouldn't implement any
@@ -64,16 +90,31 @@ class TransportEngine(object):
 class CurlTransportEngine(TransportEngine):
     """Concrete class of TransportEngine for libcurl transport."""
 
-    def __init__(self, transport, max_conn=20):
+    def __init__(self, transport, max_conn=20, http2=False):
+        """'max_conn' is the maximum number of connections the engine
+        will open.
+
+        'http2' indicates that HTTP/2 should be negotiated for https
+        requests, if supported, so that requests to the same origin
+        can be multiplexed over a single connection."""
+
         # Backpointer to transport object
         self.__xport = transport
         # Curl handles
         self.__mhandle = pycurl.CurlMulti()
         self.__chandles = []
         self.__active_handles = 0
+        self.__http2 = http2 and http2_supported()
         self.__max_handles = max_conn
-        # Request queue
+        if self.__http2:
+            # Each handle is a stream rather than a connection.
+            self.__max_handles = max_conn * http2_streams_per_conn
+        # Request queues; requests in the priority queue are started
+        # before any others.
         self.__req_q = deque()
+        self.__prio_q = deque()
+        # Maximum number of requests in progress at once, by repourl.
+        self.__origin_limits = {}
         # List of failures
         self.__failures = []
         # List of URLs successfully transferred
@@ -89,7 +130,15 @@ class CurlTransportEngine(TransportEngine):
         self.__last_stall_check = 0
 
         # Set options on multi-handle
-        self.__mhandle.setopt(pycurl.M_PIPELINING, 0)
+        if self.__http2:
+            # Requests for the same origin are multiplexed over
+            # the same connection when possible, so the number of
+            # connections has to be limited separately from the
+            # number of requests.
+            self.__mhandle.setopt(pycurl.M_PIPELINING, pycurl.PIPE_MULTIPLEX)
+            self.__mhandle.setopt(pycurl.M_MAX_TOTAL_CONNECTIONS, max_conn)
+        else:
+            self.__mhandle.setopt(pycurl.M_PIPELINING, 0)
 
         # initialize easy handles
         for i in range(self.__max_handles):
@@ -109,6 +158,13 @@ class CurlTransportEngine(TransportEngine):
         # copy handles into handle freelist
         self.__freehandles = self.__chandles[:]
 
+    @property
+    def max_requests(self):
+        """The maximum number of requests that the engine will have in
+        progress at once."""
+
+        return self.__max_handles
+
     def __call_perform(self):
         """An internal method that invokes the multi-handle's
         perform method."""
@@ -136,6 +192,7 @@ class CurlTransportEngine(TransportEngine):
         failonerror=True,
         proxy=None,
         runtime_proxy=None,
+        priority=False,
     ):
         """Add a URL to the transport engine.  Caller must supply
         either a filepath where the file should be downloaded,
@@ -149,7 +206,10 @@ class CurlTransportEngine(TransportEngine):
         stored as part of the transport stats accounting.
 
         'runtime_proxy' is the actual proxy value that is used by pycurl
-        to retrieve this resource."""
+        to retrieve this resource.
+
+        'priority' indicates that the request should be started before
+        any queued requests without priority, such as file payloads."""
 
         t = TransportRequest(
             url,
@@ -165,9 +225,19 @@ class CurlTransportEngine(TransportEngine):
             failonerror=failonerror,
             proxy=proxy,
             runtime_proxy=runtime_proxy,
+            priority=priority,
         )
 
-        self.__req_q.appendleft(t)
+        self.__queue_request(t)
+
+    def __queue_request(self, treq):
+        """Queue the TransportRequest 'treq' to be started once a
+        handle is available."""
+
+        if treq.priority:
+            self.__prio_q.appendleft(treq)
+        else:
+            self.__req_q.appendleft(treq)
 
     def __check_for_stalls(self):
         """In some situations, libcurl can get itself
@@ -602,9 +672,10 @@ class CurlTransportEngine(TransportEngine):
             proxy=proxy,
             runtime_proxy=runtime_proxy,
             system=system,
+            priority=True,
         )
 
-        self.__req_q.appendleft(t)
+        self.__queue_request(t)
 
         return fobj
 
@@ -652,9 +723,10 @@ class CurlTransportEngine(TransportEngine):
             failonerror=failonerror,
             proxy=proxy,
             runtime_proxy=runtime_proxy,
+            priority=True,
         )
 
-        self.__req_q.appendleft(t)
+        self.__queue_request(t)
 
         return fobj
 
@@ -663,7 +735,11 @@ class CurlTransportEngine(TransportEngine):
         """Returns true if the engine still has outstanding
         work to perform, false otherwise."""
 
-        return bool(self.__req_q) or self.__active_handles > 0
+        return (
+            bool(self.__prio_q)
+            or bool(self.__req_q)
+            or self.__active_handles > 0
+        )
 
     def run(self):
         """Run the transport engine.  This polls the underlying
@@ -697,8 +773,19 @@ class CurlTransportEngine(TransportEngine):
             url, uuid = self.__orphans.pop()
             self.remove_request(url, uuid)
 
-        while self.__freehandles and self.__req_q:
-            t = self.__req_q.pop()
+        busy = None
+        if self.__origin_limits:
+            busy = Counter(
+                h.repourl for h in self.__chandles if h.repourl is not None
+            )
+        throttled = False
+        while self.__freehandles and (self.__prio_q or self.__req_q):
+            t = self.__next_request(busy)
+            if t is None:
+                throttled = True
+                break
+            if busy is not None:
+                busy[t.repourl] += 1
             eh = self.__freehandles.pop(-1)
             self.__setup_handle(eh, t)
             self.__mhandle.add_handle(eh)
@@ -708,7 +795,9 @@ class CurlTransportEngine(TransportEngine):
         self.__cleanup_requests()
 
         if self.__active_handles and (
-            not self.__freehandles or not self.__req_q
+            throttled
+            or not self.__freehandles
+            or not (self.__prio_q or self.__req_q)
         ):
             cur_clock = time.time()
             if cur_clock - self.__last_stall_check > 1:
@@ -718,6 +807,29 @@ class CurlTransportEngine(TransportEngine):
                 self.__last_stall_check = cur_clock
                 self.__check_for_stalls()
 
+    def __next_request(self, busy):
+        """Remove and return the next queued request, skipping those
+        for origins that already have as many requests in progress as
+        their limit allows; 'busy' is a Counter of the requests in
+        progress by repourl, or None if no limits are set.  Returns
+        None if no request may be started."""
+
+        for q in (self.__prio_q, self.__req_q):
+            if busy is None:
+                if q:
+                    return q.pop()
+                continue
+
+            # Requests are queued using appendleft(), so the oldest
+            # is at the right.
+            for i in range(len(q) - 1, -1, -1):
+                t = q[i]
+                limit = self.__origin_limits.get(t.repourl)
+                if limit is None or busy[t.repourl] < limit:
+                    del q[i]
+                    return t
+        return None
+
     def orphaned_request(self, url, uuid):
         """Add the URL to the list of orphaned requests.  Any URL in
         list will be removed from the transport next time run() is
@@ -750,10 +862,11 @@ class CurlTransportEngine(TransportEngine):
                 self.__freehandles.append(h)
                 return
 
-        for i, t in enumerate(self.__req_q):
-            if t.url == url and t.uuid == uuid:
-                del self.__req_q[i]
-                return
+        for q in (self.__prio_q, self.__req_q):
+            for i, t in enumerate(q):
+                if t.url == url and t.uuid == uuid:
+                    del q[i]
+                    return
 
         for ex in self.__failures:
             if ex.url == url and ex.uuid == uuid:
@@ -780,6 +893,7 @@ class CurlTransportEngine(TransportEngine):
         self.__active_handles = 0
         self.__freehandles = self.__chandles[:]
         self.__req_q = deque()
+        self.__prio_q = deque()
         self.__failures = []
         self.__success = []
         self.__orphans = set()
@@ -836,9 +950,10 @@ class CurlTransportEngine(TransportEngine):
             progtrack=progtrack,
             proxy=proxy,
             runtime_proxy=runtime_proxy,
+            priority=True,
         )
 
-        self.__req_q.appendleft(t)
+        self.__queue_request(t)
 
         return fobj
 
@@ -855,6 +970,17 @@ class CurlTransportEngine(TransportEngine):
 
         self.__file_bufsz = size
 
+    def set_origin_limit(self, repourl, limit):
+        """Limit the number of requests for the repository identified
+        by 'repourl' that are in progress at once to 'limit'.  If
+        'limit' is None, any limit is removed and the repository may
+        use all of the engine's handles."""
+
+        if limit is None:
+            self.__origin_limits.pop(repourl, None)
+        else:
+            self.__origin_limits[repourl] = max(1, limit)
+
     def set_header(self, hdrdict=None):
         """Supply a dictionary of name/value pairs in hdrdict.
         These will be included on all requests issued by the transport
@@ -905,8 +1031,26 @@ class CurlTransportEngine(TransportEngine):
         # Set limit on maximum number of redirects
         hdl.setopt(pycurl.MAXREDIRS, global_settings.PKG_CLIENT_MAX_REDIRECT)
 
-        # Use HTTP/1.1
-        hdl.setopt(pycurl.HTTP_VERSION, pycurl.CURL_HTTP_VERSION_1_1)
+        if self.__http2:
+            # Negotiate HTTP/2 for https requests, falling back to
+            # HTTP/1.1 if the server doesn't support it; plain http
+            # requests always use HTTP/1.1.  Wait for an existing
+            # connection that can be multiplexed rather than
+            # opening a new one.
+            hdl.setopt(pycurl.HTTP_VERSION, pycurl.CURL_HTTP_VERSION_2TLS)
+            hdl.setopt(pycurl.PIPEWAIT, 1)
+            if hasattr(pycurl, "STREAM_WEIGHT"):
+                hdl.setopt(
+                    pycurl.STREAM_WEIGHT,
+                    (
+                        http2_priority_weight
+                        if treq.priority
+                        else http2_default_weight
+                    ),
+                )
+        else:
+            # Use HTTP/1.1
+            hdl.setopt(pycurl.HTTP_VERSION, pycurl.CURL_HTTP_VERSION_1_1)
 
         # Store the proxy in the handle so it can be used to retrieve
         # transport statistics later.
@@ -1108,6 +1252,7 @@ class CurlTransportEngine(TransportEngine):
         self.__mhandle.close()
         self.__mhandle = None
         self.__req_q = None
+        self.__prio_q = None
         self.__failures = None
         self.__success = None
         self.__orphans = None
@@ -1188,6 +1333,7 @@ class TransportRequest(object):
         proxy=None,
         runtime_proxy=None,
         system=False,
+        priority=False,
     ):
         """Create a TransportRequest with the following parameters:
 
@@ -1270,6 +1416,10 @@ class TransportRequest(object):
         resources served by the system-repository, we use this to
         prevent $http_proxy environment variables from being used.
 
+        priority - whether the request should be started before any
+        queued requests without priority and, if multiplexed, given a
+        greater share of its connection.
+
         A TransportRequest must contain enough information to uniquely
         identify any pkg.client.publisher.TransportRepoURI - in
         particular, it must contain all fields used by
@@ -1298,6 +1448,7 @@ class TransportRequest(object):
         self.proxy = proxy
         self.runtime_proxy = runtime_proxy
         self.system = system
+        self.priority = priority
 
 
 # Vim hints
@@ -32,6 +32,7 @@ import itertools
 import os
 import shutil
 import sys
+import tarfile
 import tempfile
 
 from email.utils import formatdate
@@ -431,6 +432,7 @@ class HTTPRepo(TransportRepo):
         progtrack=None,
         header=None,
         compress=False,
+        priority=False,
     ):
         self._engine.add_url(
             url,
@@ -442,6 +444,7 @@ class HTTPRepo(TransportRepo):
             compressible=compress,
             runtime_proxy=self._repouri.runtime_proxy,
             proxy=self._repouri.proxy,
+            priority=priority,
         )
 
     def _fetch_url(
@@ -734,12 +737,83 @@ class HTTPRepo(TransportRepo):
             requesturl, header, compress=True, ccancel=ccancel
         )
 
+    def __get_tar_stream(self, requesturl, request_data, header, dest, names):
+        """Generator which POSTs 'request_data' to 'requesturl' and
+        saves each entry of the tar stream returned in the 'dest'
+        directory, yielding the TarInfo of each one once it has been
+        saved.  Only the entries named in 'names' are accepted.  If
+        the request fails, the generator stops; the caller is expected
+        to retrieve anything not yielded some other way."""
+
+        fobj = None
+        try:
+            fobj = self._post_url(requesturl, request_data, header)
+            with tarfile.open(mode="r|", fileobj=fobj) as tar:
+                for ti in tar:
+                    # The names requested are quoted FMRIs or
+                    # hashes, so they can't be used to write
+                    # outside of dest.
+                    if ti.name not in names or not ti.isfile():
+                        continue
+                    with open(os.path.join(dest, ti.name), "wb") as f:
+                        shutil.copyfileobj(tar.extractfile(ti), f)
+                    yield ti
+        except tx.ExcessiveTransientFailure:
+            self._engine.reset()
+        except (tx.TransportException, tarfile.TarError):
+            pass
+        finally:
+            if fobj:
+                fobj.close()
+
+    def __get_manifests_bulk(self, mfstlist, dest, progtrack=None, pub=None):
+        """Retrieve the manifests named in 'mfstlist' using a single
+        manifest/2 request, placing them in the 'dest' directory.
+        Returns the list of entries in 'mfstlist' for manifests that
+        were not retrieved; if the request failed, that is all of
+        them."""
+
+        # The intent of each request can't be expressed in a single
+        # request, but other header information is shared.
+        header = dict(mfstlist[0][1] or {})
+        header.pop("X-IPkg-Intent", None)
+
+        names = {}
+        for fmri, h in mfstlist:
+            names[fmri.get_url_path()] = fmri
+        request_data = urlencode(
+            [
+                (i, fmri.get_fmri(anarchy=True, include_scheme=False))
+                for i, (fmri, h) in enumerate(mfstlist)
+            ]
+        )
+        requesturl = self.__get_request_url("manifest/2/", pub=pub)
+
+        received = set()
+        for ti in self.__get_tar_stream(
+            requesturl, request_data, header or None, dest, names
+        ):
+            received.add(names[ti.name])
+            if progtrack:
+                progtrack.manifest_fetch_progress(completion=True)
+
+        return [(fmri, h) for fmri, h in mfstlist if fmri not in received]
+
     def get_manifests(self, mfstlist, dest, progtrack=None, pub=None):
         """Get manifests named in list.  The mfstlist argument contains
         tuples (fmri, header).  This is so that each manifest may have
         unique header information.  The destination directory is spec-
         ified in the dest argument."""
 
+        # If the repository supports it, retrieve all of the
+        # manifests in one request rather than one request for each.
+        if len(mfstlist) > 1 and self.supports_version("manifest", [2]) > -1:
+            mfstlist = self.__get_manifests_bulk(
+                mfstlist, dest, progtrack=progtrack, pub=pub
+            )
+            if not mfstlist:
+                return []
+
         baseurl = self.__get_request_url("manifest/0/", pub=pub)
         urlmapping = {}
         progclass = None
@@ -759,6 +833,7 @@ class HTTPRepo(TransportRepo):
                 compress=True,
                 progtrack=progtrack,
                 progclass=progclass,
+                priority=True,
             )
 
         # Compute urllist from keys in mapping
@@ -793,6 +868,29 @@ class HTTPRepo(TransportRepo):
 
         return self._annotate_exceptions(errors, urlmapping)
 
+    def __get_files_bulk(
+        self, filelist, dest, progtrack, header=None, pub=None
+    ):
+        """Retrieve the files named by the hashes in 'filelist' using a
+        single file/3 request, placing them in the 'dest' directory.
+        Returns the list of hashes for files that were not retrieved;
+        if the request failed, that is all of them.  The content of
+        the files is verified by the caller, as it is for files
+        retrieved individually."""
+
+        request_data = urlencode(list(enumerate(filelist)))
+        requesturl = self.__get_request_url("file/3/", pub=pub)
+
+        received = set()
+        for ti in self.__get_tar_stream(
+            requesturl, request_data, header, dest, set(filelist)
+        ):
+            received.add(ti.name)
+            if progtrack:
+                progtrack.download_add_progress(1, ti.size)
+
+        return [f for f in filelist if f not in received]
+
     def get_files(
         self, filelist, dest, progtrack, version, header=None, pub=None
     ):
@@ -803,6 +901,15 @@ class HTTPRepo(TransportRepo):
         it contains a ProgressTracker object for the
         downloads."""
 
+        # If the repository supports it, retrieve all of the files
+        # in one request rather than one request for each.
+        if len(filelist) > 1 and self.supports_version("file", [3]) > -1:
+            filelist = self.__get_files_bulk(
+                filelist, dest, progtrack, header=header, pub=pub
+            )
+            if not filelist:
+                return []
+
         baseurl = self.__get_request_url("file/{0}/".format(version), pub=pub)
         urllist = []
         progclass = None
@@ -1289,6 +1396,7 @@ class HTTPSRepo(HTTPRepo):
         progtrack=None,
         header=None,
         compress=False,
+        priority=False,
     ):
         self._engine.add_url(
             url,
@@ -1302,6 +1410,7 @@ class HTTPSRepo(HTTPRepo):
             compressible=compress,
             runtime_proxy=self._repouri.runtime_proxy,
             proxy=self._repouri.proxy,
+            priority=priority,
         )
 
     def _fetch_url(
@@ -1434,6 +1543,7 @@ class _FilesystemRepo(TransportRepo):
         progtrack=None,
         header=None,
         compress=False,
+        priority=False,
     ):
         self._engine.add_url(
             url,
@@ -1443,6 +1553,7 @@ class _FilesystemRepo(TransportRepo):
             repourl=self._url,
             header=header,
             compressible=False,
+            priority=priority,
         )
 
     def _fetch_url(
@@ -1793,6 +1904,7 @@ class _FilesystemRepo(TransportRepo):
                 header=h,
                 progtrack=progtrack,
                 progclass=progclass,
+                priority=True,
             )
 
         urllist = urlmapping.keys()
@@ -237,6 +237,13 @@ class RepoStats(object):
     This allows the transport to keep statistics about each
     host that it visits."""
 
+    # Bounds on the number of files requested from the repository in a
+    # single chunk, and the number of seconds that transferring a chunk
+    # should take; see record_chunk().
+    CHUNK_MIN = 10
+    CHUNK_MAX = 1024
+    CHUNK_SECONDS = 20
+
     def __init__(self, repouri):
         """Initialize a RepoStats object.  Pass a TransportRepoURI
         object in repouri to configure an object for a particular
@@ -270,6 +277,13 @@ class RepoStats(object):
         self.origin_factor = 1
         self.origin_decay = 1
 
+        # Adaptive transfer parameters; see record_chunk().  These
+        # aren't reset between operations.
+        self.__concurrency = None
+        self.__conc_step = -1
+        self.__chunk_size = None
+        self.__chunk_speed = 0.0
+
     def clear_consecutive_errors(self):
         """Set the count of consecutive errors to zero.  This is
         done once we know a transaction has been successfully
@@ -325,6 +339,57 @@ class RepoStats(object):
         self.__bytes_xfr += bytes
         self.__seconds_xfr += seconds
 
+    def record_chunk(self, nfiles, nbytes, seconds, errors, max_conn):
+        """Record that a chunk of 'nfiles' requests, of which 'errors'
+        failed with transient errors, transferred 'nbytes' bytes in
+        'seconds' seconds of elapsed time.  This is used to adapt the
+        number of concurrent requests (at most 'max_conn') and the
+        number of files per chunk used for this repository."""
+
+        if not self.__used:
+            self.__used = True
+
+        conc = min(self.__concurrency or max_conn, max_conn)
+        if errors:
+            # Back off quickly if the repository, or the network
+            # path to it, can't keep up with the current load.
+            self.__concurrency = max(1, conc // 2)
+            self.__conc_step = -1
+            self.__chunk_speed = 0.0
+            if self.__chunk_size:
+                self.__chunk_size = max(self.CHUNK_MIN, self.__chunk_size // 2)
+            return
+
+        if seconds <= 0 or nfiles < conc:
+            # Too little was transferred to tell anything about
+            # the repository's throughput.
+            return
+
+        # Size chunks so that each takes roughly CHUNK_SECONDS; slow
+        # repositories then get small chunks, so that a poor choice of
+        # repository is corrected quickly, while fast ones get large
+        # chunks which keep all of the connections busy.
+        chunk = int(nfiles / seconds * self.CHUNK_SECONDS)
+        if self.__chunk_size:
+            chunk = (chunk + self.__chunk_size) // 2
+        self.__chunk_size = min(
+            self.CHUNK_MAX, max(self.CHUNK_MIN, 2 * conc, chunk)
+        )
+
+        # Climb towards the concurrency with the best throughput: keep
+        # stepping in the same direction while throughput improves,
+        # reverse once it drops, and stay put while it is unchanged.
+        speed = nbytes / seconds
+        if self.__chunk_speed:
+            if speed < self.__chunk_speed * 0.9:
+                self.__conc_step = -self.__conc_step
+            elif speed < self.__chunk_speed * 1.1:
+                self.__concurrency = conc
+                return
+        self.__chunk_speed = speed
+        step = max(1, conc // 4) * self.__conc_step
+        self.__concurrency = min(max_conn, max(1, conc + step))
+
     def record_tx(self):
         """Record that an operation to the URI represented
         by this RepoStats object was initiated."""
@@ -357,6 +422,20 @@ class RepoStats(object):
 
         return self.__bytes_xfr
 
+    @property
+    def chunk_size(self):
+        """The number of files that should be requested from this
+        repository at a time, or None if that isn't known yet."""
+
+        return self.__chunk_size
+
+    @property
+    def concurrency(self):
+        """The number of requests that should be in progress at once
+        for this repository, or None if that isn't known yet."""
+
+        return self.__concurrency
+
     @property
     def connect_time(self):
         """The average connection time for this host."""
@@ -31,6 +31,7 @@ import errno
 import http.client
 import os
 import tempfile
+import time
 import zlib
 from collections import defaultdict
 from functools import cmp_to_key
@@ -602,7 +603,9 @@ class Transport(object):
         self.__bad_crls = set()
 
     def __setup(self):
-        self.__engine = engine.CurlTransportEngine(self)
+        self.__engine = engine.CurlTransportEngine(
+            self, http2=self.cfg.get_policy(imageconfig.TRANSPORT_HTTP2)
+        )
 
         # Configure engine's user agent
         self.__engine.set_user_agent(self.cfg.user_agent)
@@ -1733,6 +1736,9 @@ class Transport(object):
                     (fmri, d.build_refetch_header(h)) for fmri, h in mfstlist
                 ]
 
+            self.__engine.set_origin_limit(repostats.url, repostats.concurrency)
+            nbytes = repostats.bytes_xfr
+            starttime = time.time()
             # This returns a list of transient errors
             # that occurred during the transport operation.
             # An exception handler here isn't necessary
@@ -1748,6 +1754,13 @@ class Transport(object):
                 gave_up = True
                 errlist = ex.failures
                 success = ex.success
+            repostats.record_chunk(
+                len(mfstlist),
+                repostats.bytes_xfr - nbytes,
+                time.time() - starttime,
+                len(errlist),
+                self.__engine.max_requests,
+            )
 
             for e in errlist:
                 req = getattr(e, "request", None)
@@ -2007,6 +2020,9 @@ class Transport(object):
 
             gave_up = False
 
+            self.__engine.set_origin_limit(repostats.url, repostats.concurrency)
+            nbytes = repostats.bytes_xfr
+            starttime = time.time()
             # This returns a list of transient errors
             # that occurred during the transport operation.
             # An exception handler here isn't necessary
@@ -2022,6 +2038,13 @@ class Transport(object):
                 gave_up = True
                 errlist = ex.failures
                 success = ex.success
+            repostats.record_chunk(
+                len(filelist),
+                repostats.bytes_xfr - nbytes,
+                time.time() - starttime,
+                len(errlist),
+                self.__engine.max_requests,
+            )
 
             for e in errlist:
                 req = getattr(e, "request", None)
@@ -2602,7 +2625,9 @@ class Transport(object):
         """Determine the chunk size based upon how many of the known
         mirrors have been visited.  If not all mirrors have been
         visited, choose a small size so that if it ends up being
-        a poor choice, the client doesn't transfer too much data."""
+        a poor choice, the client doesn't transfer too much data.
+        Otherwise, the size is adapted to the observed throughput of
+        the repositories; see RepoStats.record_chunk()."""
 
         CHUNK_SMALL = 10
         CHUNK_LARGE = 100
@@ -2631,10 +2656,23 @@ class Transport(object):
         repolist = _convert_repouris(repolist)
         n = len(repolist)
         m = self.stats.get_num_visited(repolist)
+        if m < n and n > 1:
+            return CHUNK_SMALL
+
+        # Once the repositories have been visited, use the chunk size
+        # adapted to the observed performance of the fastest one, as
+        # it is the one most likely to be chosen.
+        best = None
+        for ruri in repolist:
+            rs = self.stats[ruri.key()]
+            if rs.chunk_size and (
+                best is None or rs.transfer_speed > best.transfer_speed
+            ):
+                best = rs
+        if best:
+            return best.chunk_size
         if n == 1:
             return CHUNK_HUGE
-        if m < n:
-            return CHUNK_SMALL
         return CHUNK_LARGE
 
     @LockedTransport()
@@ -2849,7 +2887,11 @@ class Transport(object):
         should be validated if needed.  The content of readonly caches
         will not be validated now; package operations will validate the
         content later at the time of installation or update and fail if
-        it is invalid."""
+        it is invalid.
+
+        The access and modification times of files found in writable
+        caches are updated so that Image.cleanup_cached_content() can
+        evict the least recently used content first."""
 
         hash_attr, hash_val, hash_func = digest.get_least_preferred_hash(action)
 
@@ -2874,12 +2916,21 @@ class Transport(object):
             try:
                 if verify:
                     self._verify_content(action, cache_path)
-                return cache_path
             except tx.InvalidContentException:
                 # If the content in the cache doesn't match the
                 # hash of the action, verify will have already
                 # purged the item from the cache.
-                pass
+                continue
+
+            if not cache.readonly:
+                # Record the use of this entry so that the
+                # least recently used content is evicted
+                # first when the cache is size-limited.
+                try:
+                    os.utime(cache_path)
+                except EnvironmentError:
+                    pass
+            return cache_path
         return None
 
     @staticmethod
@@ -0,0 +1,345 @@
+#!/usr/bin/python3
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright 2024 OmniOS Community Edition (OmniOSce) Association.
+#
+
+import collections
+import errno
+import os
+import stat
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pkg.digest as digest
+import pkg.json as json
+import pkg.misc as misc
+import pkg.portable as portable
+
+# The number of files per worker that may have their content hashes
+# computed ahead of the package currently being verified.
+LOOKAHEAD_PER_JOB = 32
+
+
+def _file_state(st):
+    """Returns the state of a file whose stat(2) result is 'st' that
+    must be unchanged for its content to be unchanged."""
+
+    return [st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns]
+
+
+class VerifyCache(object):
+    """Records the content hashes of installed files that were found to
+    be correct by a previous verification, together with the state of
+    the file at that time: (device, inode, size, mtime, ctime).  The
+    content of a file whose state is unchanged need not be hashed
+    again.  As the ctime of a file cannot be set by its owner, a file
+    whose content has been changed will not match its entry even if
+    its mtime has been restored."""
+
+    VERSION = 1
+
+    def __init__(self, path, full=False):
+        """'path' is the pathname of the on-disk cache file.
+
+        'full' indicates that all entries should be ignored so that
+        every file is hashed; the results are still recorded."""
+
+        self.__path = path
+        self.__full = full
+        self.__entries = {}
+        self.__seen = set()
+        self.__changed = False
+
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.__entries = data["entries"]
+        except EnvironmentError as e:
+            if e.errno not in (errno.ENOENT, errno.EACCES):
+                raise
+        except (ValueError, KeyError, TypeError, AttributeError):
+            # A damaged cache is simply discarded.
+            self.__changed = True
+
+    def verified(self, path, st, hash_val):
+        """Returns a boolean indicating whether the file at 'path',
+        whose lstat(2) result is 'st', is already known to have the
+        content hash 'hash_val'."""
+
+        if self.__full or st is None or not stat.S_ISREG(st.st_mode):
+            return False
+        self.__seen.add(path)
+        entry = self.__entries.get(path)
+        return (
+            entry is not None
+            and entry[-1] == hash_val
+            and entry[:-1] == _file_state(st)
+        )
+
+    def add(self, path, st, hash_val):
+        """Record that the file at 'path', whose lstat(2) result
+        before hashing was 'st', has the content hash 'hash_val'."""
+
+        if st is None or not stat.S_ISREG(st.st_mode):
+            return
+        self.__seen.add(path)
+        entry = _file_state(st) + [hash_val]
+        if self.__entries.get(path) != entry:
+            self.__entries[path] = entry
+            self.__changed = True
+
+    def discard(self, path):
+        """Forget what is known about the file at 'path'."""
+
+        if self.__entries.pop(path, None) is not None:
+            self.__changed = True
+
+    def save(self, prune=False):
+        """Write the cache to disk if it has changed.  If 'prune' is
+        True, entries for files that were not verified are dropped.
+        Failures are ignored as the cache is only an optimization."""
+
+        if prune:
+            for path in set(self.__entries) - self.__seen:
+                del self.__entries[path]
+                self.__changed = True
+        if not self.__changed:
+            return
+
+        dirname = os.path.dirname(self.__path)
+        try:
+            if not os.path.exists(dirname):
+                os.makedirs(dirname, misc.PKG_DIR_MODE)
+            fd, tmp = tempfile.mkstemp(dir=dirname)
+        except EnvironmentError as e:
+            if e.errno in (errno.EACCES, errno.EPERM, errno.EROFS):
+                return
+            raise
+
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(
+                    {"version": self.VERSION, "entries": self.__entries}, f
+                )
+            os.chmod(tmp, misc.PKG_FILE_MODE)
+            portable.rename(tmp, self.__path)
+        except EnvironmentError:
+            try:
+                portable.remove(tmp)
+            except EnvironmentError:
+                pass
+            return
+        self.__changed = False
+
+
+class DigestPool(object):
+    """Computes the content hashes of installed files on a pool of
+    worker threads on behalf of FileAction.verify().
+
+    Packages are queued in the order they will be verified and their
+    files are hashed ahead of the package currently being verified.
+    Results are still consumed by the verifying thread in manifest
+    order, so the messages generated for each package are identical
+    (and identically ordered) to those of a serial verification."""
+
+    def __init__(
+        self, img, fmris, jobs, excludes=None, verbose=False, verify_cache=None
+    ):
+        """'img' is the Image whose packages are being verified.
+
+        'fmris' is an iterable of the FMRIs of the packages that will
+        be verified, in the order they will be verified.
+
+        'jobs' is the number of worker threads to use.
+
+        'excludes' is a list of variant/facet exclude functions for the
+        image; only the file actions matching them are hashed.
+
+        'verbose' indicates whether files with a 'preserve' attribute
+        will have their content verified.
+
+        'verify_cache' is an optional VerifyCache; files it lists as
+        unchanged are not hashed."""
+
+        self.__img = img
+        self.__root = img.get_root()
+        self.__fmris = iter(fmris)
+        self.__excludes = excludes or []
+        self.__verbose = verbose
+        self.__verify_cache = verify_cache
+        self.__lookahead = jobs * LOOKAHEAD_PER_JOB
+        self.__executor = ThreadPoolExecutor(max_workers=jobs)
+
+        # FMRI -> (manifest, {path: (hash_func, future)}) for each
+        # package that has been submitted but not yet verified.
+        self.__queued = collections.OrderedDict()
+        self.__pending = 0
+        self.__current = {}
+
+    def __submit(self, pfmri):
+        """Queue the content hashing of the files delivered by the
+        package 'pfmri'."""
+
+        manf = self.__img.get_manifest(pfmri, ignore_excludes=True)
+        digests = {}
+        for act in manf.gen_actions_by_type("file", excludes=self.__excludes):
+            attrs = act.attrs
+            preserve = attrs.get("preserve")
+            if preserve == "abandon" or (
+                preserve is not None and not self.__verbose
+            ):
+                continue
+            if attrs.get("overlay") or (
+                attrs.get("mountpoint", "").lower() == "true"
+            ):
+                # Overlay actions are verified separately and
+                # mountpoints are never hashed.
+                continue
+
+            hash_attr, hash_val, hash_func = digest.get_preferred_hash(act)
+            path = act.get_installed_path(self.__root)
+            digests[path] = (
+                hash_func,
+                self.__executor.submit(
+                    self.__get_data_digest, path, hash_func, hash_val
+                ),
+            )
+        self.__queued[pfmri] = (manf, digests)
+        self.__pending += len(digests)
+
+    def __get_data_digest(self, path, hash_func, hash_val):
+        """Hash the file at 'path' on a worker thread.  Returns a tuple
+        of (hash value, content, stat) where 'stat' is the fstat(2)
+        result of the descriptor that was hashed, taken before it was
+        read.  None is returned if the file was not hashed because the
+        verify cache shows it is unchanged or because it is not a
+        regular file; a file of any other type, or a symbolic link to
+        one, could block the worker indefinitely and is left for the
+        verifying thread to report."""
+
+        try:
+            st = os.lstat(path)
+        except EnvironmentError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        if self.__verify_cache is not None and self.__verify_cache.verified(
+            path, st, hash_val
+        ):
+            return None
+
+        try:
+            fd = os.open(
+                path,
+                os.O_RDONLY
+                | getattr(os, "O_NOFOLLOW", 0)
+                | getattr(os, "O_NONBLOCK", 0),
+            )
+        except EnvironmentError:
+            return None
+        with os.fdopen(fd, "rb") as f:
+            st = os.fstat(fd)
+            if not stat.S_ISREG(st.st_mode):
+                return None
+            sha_hash, data = misc.get_data_digest(
+                f, length=st.st_size, hash_func=hash_func
+            )
+        return sha_hash, data, st
+
+    def __fill(self):
+        """Queue packages until enough files are being hashed ahead of
+        the package being verified to keep the workers busy."""
+
+        while not self.__queued or self.__pending < self.__lookahead:
+            pfmri = next(self.__fmris, None)
+            if pfmri is None:
+                break
+            self.__submit(pfmri)
+
+    @staticmethod
+    def __cancel(digests):
+        """Cancel the outstanding results in 'digests'."""
+
+        for hash_func, future in digests.values():
+            future.cancel()
+
+    def start_package(self, pfmri):
+        """Prepare to verify the package 'pfmri' and queue the files
+        of the packages that follow it.  Returns the manifest of the
+        package or None if it was not queued by this pool."""
+
+        self.__cancel(self.__current)
+        self.__current = {}
+
+        manf = None
+        self.__fill()
+        while self.__queued:
+            # Packages queued ahead of 'pfmri' were not verified.
+            f, (m, digests) = self.__queued.popitem(last=False)
+            self.__pending -= len(digests)
+            if f == pfmri:
+                manf = m
+                self.__current = digests
+                break
+            self.__cancel(digests)
+        self.__fill()
+        return manf
+
+    def get_data_digest(self, path, hash_func, st):
+        """Returns the content hash of the installed file at 'path'
+        as misc.get_data_digest() would, using the result computed by
+        the pool if there is one.  'st' is the lstat(2) result of the
+        file taken by the caller; the pool's result is only used if
+        the file was in the same state when it was hashed, so that
+        'st' can be recorded as the state of the file with the hash
+        returned."""
+
+        entry = self.__current.pop(path, None)
+        if entry is None or entry[0] != hash_func:
+            if entry is not None:
+                entry[1].cancel()
+            return misc.get_data_digest(path, hash_func=hash_func)
+        result = entry[1].result()
+        if (
+            result is None
+            or st is None
+            or _file_state(result[2]) != _file_state(st)
+        ):
+            # Not hashed by the worker, or the file has changed
+            # since it was; the caller has already found that the
+            # file is a regular file to be hashed.
+            return misc.get_data_digest(path, hash_func=hash_func)
+        return result[:2]
+
+    def close(self):
+        """Cancel any outstanding work and stop the worker threads."""
+
+        self.__cancel(self.__current)
+        self.__current = {}
+        while self.__queued:
+            self.__cancel(self.__queued.popitem(last=False)[1][1])
+        self.__pending = 0
+        self.__executor.shutdown(wait=True)
@@ -139,6 +139,14 @@ class Indexer(object):
         )
         self._data_fmri_offsets = self._data_dict["fmri_offsets"]
 
+        # The trigram index is optional for searches, so it's kept
+        # separate from the other index files and is only written when
+        # the main dictionary is.
+        self._data_token_trigrams = ss.IndexStoreTrigramDict(
+            ss.TOKEN_TRIGRAMS_FILE
+        )
+        self.__write_trigrams = False
+
         self._index_dir = index_dir
         self._tmp_dir = os.path.join(self._index_dir, "TMP")
 
@@ -422,6 +430,7 @@ class Indexer(object):
 
         cur_location = str(self.out_main_dict_pos)
         self._data_token_offset.write_entity(token, cur_location)
+        self._data_token_trigrams.add_token(token, self.out_main_dict_pos)
 
         for at, st_list in fv_fmri_pos_list_list:
             self._progtrack.job_add_progress(
@@ -613,6 +622,8 @@ class Indexer(object):
         self.out_main_dict_pos = self.out_main_dict_handle.tell()
 
         self._data_token_offset.open_out_file(out_dir, self.file_version_number)
+        self._data_token_trigrams.clear()
+        self.__write_trigrams = True
 
         new_toks_available = True
         new_toks_it = self._gen_new_toks_from_files()
@@ -713,6 +724,15 @@ class Indexer(object):
                 continue
             d.write_dict_file(out_dir, self.file_version_number)
 
+        # The trigrams of the tokens are gathered as the main dictionary
+        # is written, so they're only available if it was.
+        if self.__write_trigrams:
+            self._data_token_trigrams.write_dict_file(
+                out_dir, self.file_version_number
+            )
+            self._data_token_trigrams.clear()
+            self.__write_trigrams = False
+
     def _generic_update_index(
         self, inputs, input_type, tmp_index_dir=None, image=None
     ):
@@ -946,9 +966,12 @@ class Indexer(object):
 
         'index_root' is the path to the index to check against.
 
-        'cat' is the catalog to check for new fmris."""
+        'cat' is the catalog to check for new fmris, or a list of the
+        fmris in it."""
 
-        fmri_set = set((f.remove_publisher() for f in cat.fmris()))
+        if hasattr(cat, "fmris"):
+            cat = cat.fmris()
+        fmri_set = set((f.remove_publisher() for f in cat))
 
         data = ss.IndexStoreSet("full_fmri_list")
         try:
@@ -1000,6 +1023,13 @@ class Indexer(object):
                     os.path.join(dest_dir, d.get_file_name()),
                 )
         if not fast_update:
+            tri_name = self._data_token_trigrams.get_file_name()
+            if os.path.exists(os.path.join(source_dir, tri_name)):
+                shutil.move(
+                    os.path.join(source_dir, tri_name),
+                    os.path.join(dest_dir, tri_name),
+                )
+
             # Remove legacy index/pkg/ directory which is obsoleted
             # by the fmri_offsets.v1 file.
             try:
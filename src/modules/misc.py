@@ -1410,6 +1410,19 @@ def hex_to_binary(s):
     return unhexlify(s)
 
 
+def get_worker_count(jobs):
+    """Returns the number of worker threads to use for an operation
+    given its configured concurrency 'jobs'; zero means one worker per
+    online CPU."""
+
+    if not jobs:
+        try:
+            jobs = len(os.sched_getaffinity(0))
+        except (AttributeError, OSError):
+            jobs = os.cpu_count() or 1
+    return max(int(jobs), 1)
+
+
 def config_temp_root():
     """Examine the environment.  If the environment has set TMPDIR, TEMP,
     or TMP, return None.  This tells tempfile to use the environment
@@ -533,35 +533,23 @@ class PkgAction(pkg.actions.generic.Action):
         self.attrs = attrs
 
 
-def apply_transforms(
-    transforms, action, pkg_attrs, verbose, act_filename, act_lineno
-):
-    """Apply all transforms to action, returning modified action
-    or None if action is dropped"""
-    comments = []
-    newactions = []
-    if verbose:
-        comments.append("#  Action: {0}".format(action))
-    for types, attrdict, operation, filename, lineno, transform in transforms:
-        if action is None:
-            action = PkgAction(pkg_attrs)
-        # skip if types are specified and none match
-        if types and action.name not in types:
-            continue
-        # skip if some attrs don't exist
-        if set(attrdict.keys()) - set(action.attrs.keys()):
-            continue
+class TransformProgram(object):
+    """A compiled form of a list of transforms (as built by
+    add_transform) which allows the transforms that could apply to an
+    action to be found without examining every one of them.
 
-        # Check to make sure all matching attrs actually match.  The
-        # order is effectively arbitrary, since they come from a dict.
-        matches = [
-            attrdict[key].match(attrval)
-            for key in attrdict
-            for attrval in attrval_as_list(action.attrs, key)
-        ]
+    The transforms are grouped by the action types they match, the
+    names of the attributes they require are kept as a set, and the
+    order of the matches passed to each transform's operation is
+    determined once instead of for every action."""
 
-        if not all(matches):
-            continue
+    def __init__(self, transforms):
+        self.__rules = [self.__compile(t) for t in transforms]
+        self.__by_type = {}
+
+    @staticmethod
+    def __compile(t):
+        types, attrdict, operation, filename, lineno, transform = t
 
         s = transform[11 : transform.index("->")]
         # Map each pattern to its position in the original match string.
@@ -582,8 +570,75 @@ def apply_transforms(
                     matchorder[match.pattern] = pos
                     break
 
-        # Then sort the matches list by those positions.
-        matches.sort(key=lambda x: matchorder[x.re.pattern])
+        # The matches for each attribute are passed to the operation
+        # sorted by the position of their pattern, so order the
+        # attributes (stably) the same way.
+        keys = sorted(attrdict, key=lambda k: matchorder[attrdict[k].pattern])
+        matchers = tuple((k, attrdict[k].match) for k in keys)
+
+        return (
+            frozenset(types),
+            frozenset(attrdict),
+            matchers,
+            operation,
+            filename,
+            lineno,
+            transform,
+        )
+
+    def rules(self, name):
+        """Return the compiled transforms that could apply to actions of
+        type 'name', in the order they were specified."""
+
+        try:
+            return self.__by_type[name]
+        except KeyError:
+            rules = self.__by_type[name] = [
+                r for r in self.__rules if not r[0] or name in r[0]
+            ]
+            return rules
+
+
+def apply_transforms(
+    transforms, action, pkg_attrs, verbose, act_filename, act_lineno
+):
+    """Apply all transforms to action, returning modified action
+    or None if action is dropped.  'transforms' is either a list of
+    transforms or a TransformProgram built from one."""
+    if not isinstance(transforms, TransformProgram):
+        transforms = TransformProgram(transforms)
+    comments = []
+    newactions = []
+    if verbose:
+        comments.append("#  Action: {0}".format(action))
+    if action is None:
+        action = PkgAction(pkg_attrs)
+    # The type of an action isn't changed by transforms, so only those
+    # which match it need to be considered.
+    for (
+        types,
+        required,
+        matchers,
+        operation,
+        filename,
+        lineno,
+        transform,
+    ) in transforms.rules(action.name):
+        # skip if some attrs don't exist
+        if required and not action.attrs.keys() >= required:
+            continue
+
+        # Check to make sure all matching attrs actually match.  The
+        # matches are gathered in the order their patterns appear in the
+        # transform.
+        matches = [
+            match(attrval)
+            for key, match in matchers
+            for attrval in attrval_as_list(action.attrs, key)
+        ]
+
+        if not all(matches):
+            continue
 
         # time to apply transform operation
         try:
@@ -837,6 +892,10 @@ def process_mog(
     except RuntimeError as e:
         raise
 
+    # All of the transforms have been read, so compile them once for
+    # use with every action.
+    transforms = TransformProgram(transforms)
+
     pkg_attrs = {}
     for line, filename, lineno in lines:
         if line is None:
@@ -213,8 +213,10 @@ def load_passwd(dirpath):
     passwd_stamp = os.stat(passwd_file).st_mtime
     if passwd_stamp <= users_lastupdate.get(dirpath, -1):
         return
-    users[dirpath] = user = {}
-    uids[dirpath] = uid = {}
+    # The new tables are only published once complete so that they
+    # can be consulted concurrently while being reloaded.
+    user = {}
+    uid = {}
     f = open(passwd_file, "r", encoding="utf-8", errors="surrogateescape")
     for line in f.readlines():
         arr = line.rstrip().split(":")
@@ -236,6 +238,8 @@ def load_passwd(dirpath):
         # current pw_entry.
         uid.setdefault(pw_entry.pw_uid, pw_entry)
 
+    users[dirpath] = user
+    uids[dirpath] = uid
     users_lastupdate[dirpath] = passwd_stamp
     f.close()
 
@@ -246,8 +250,8 @@ def load_groups(dirpath):
     group_stamp = os.stat(group_file).st_mtime
     if group_stamp <= groups_lastupdate.get(dirpath, -1):
         return
-    groups[dirpath] = group = {}
-    gids[dirpath] = gid = {}
+    group = {}
+    gid = {}
     f = open(group_file, "r", encoding="utf-8", errors="surrogateescape")
     for line in f:
         arr = line.rstrip().split(":")
@@ -268,6 +272,8 @@ def load_groups(dirpath):
         # current pw_entry.
         gid.setdefault(gr_entry.gr_gid, gr_entry)
 
+    groups[dirpath] = group
+    gids[dirpath] = gid
     groups_lastupdate[dirpath] = group_stamp
     f.close()
 
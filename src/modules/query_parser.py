@@ -32,6 +32,7 @@ import threading
 import copy
 import itertools
 import errno
+from collections import OrderedDict
 
 import ply.lex as lex
 import ply.yacc as yacc
@@ -43,6 +44,9 @@ from pkg.choose import choose
 from pkg.misc import EmptyI, force_str
 
 FILE_OPEN_TIMEOUT_SECS = 1
+# The default number of parsed main dictionary lines kept in memory by a
+# PostingsCache.
+MAX_CACHED_POSTINGS = 1024
 MAX_TOKEN_COUNT = 100
 
 
@@ -1065,6 +1069,57 @@ class TopQuery(object):
         return None
 
 
+class PostingsCache(object):
+    """A bounded, thread-safe cache of parsed main dictionary lines for
+    a single search index.  Entries are keyed by the version of the
+    index and the byte offset of the line in the main dictionary, so
+    that lines read from an older version of the index are never
+    returned once it has been replaced.  The least recently used entry
+    is discarded when the cache is full."""
+
+    def __init__(self, max_entries=MAX_CACHED_POSTINGS):
+        """'max_entries' is the maximum number of parsed lines to
+        retain."""
+
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__max_entries = max_entries
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, version, offset):
+        """Returns the parsed line at 'offset' in the main dictionary of
+        index 'version', or None if it is not cached."""
+
+        key = (version, offset)
+        with self.__lock:
+            try:
+                self.__entries.move_to_end(key)
+            except KeyError:
+                return None
+            return self.__entries[key]
+
+    def add(self, version, offset, entry):
+        """Records 'entry' as the parsed line at 'offset' in the main
+        dictionary of index 'version'."""
+
+        if self.__max_entries <= 0:
+            return
+        key = (version, offset)
+        with self.__lock:
+            self.__entries[key] = entry
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+    def clear(self):
+        """Discards all cached entries."""
+
+        with self.__lock:
+            self.__entries.clear()
+
+
 class TermQuery(object):
     """Class representing the a single query term in the AST.  This is an
     abstract class and should not be used instead of the related client and
@@ -1113,6 +1168,8 @@ class TermQuery(object):
         self._data_manf = None
         self._data_token_offset = None
         self._data_main_dict = None
+        self._index_version = None
+        self._postings_cache = None
 
     def __init_gdd(self, path):
         gdd = self._global_data_dict
@@ -1221,7 +1278,14 @@ class TermQuery(object):
         if not self._term.endswith("*"):
             self._term += "*"
 
-    def set_info(self, index_dir, get_manifest_path, case_sensitive, **kwargs):
+    def set_info(
+        self,
+        index_dir,
+        get_manifest_path,
+        case_sensitive,
+        postings_cache=None,
+        **kwargs,
+    ):
         """Sets the information needed to search which is specific to
         the particular index used to back the search.
 
@@ -1232,10 +1296,15 @@ class TermQuery(object):
         for that fmri.
 
         'case_sensitive' is a boolean which determines whether search
-        is case sensitive or not."""
+        is case sensitive or not.
+
+        'postings_cache' is an optional PostingsCache object used to
+        retain the parsed main dictionary lines of the index between
+        searches."""
 
         self._dir_path = index_dir
         assert self._dir_path
+        self._postings_cache = postings_cache
 
         self._manifest_path_func = get_manifest_path
         self._case_sensitive = case_sensitive
@@ -1275,6 +1344,7 @@ class TermQuery(object):
                 )
             if ret is None:
                 raise search_errors.NoIndexException(self._dir_path)
+            self._index_version = ret
             should_reread = False
             # Check to see if any of the in-memory stores of the
             # dictionaries are out of date compared to the ones
@@ -1305,6 +1375,7 @@ class TermQuery(object):
                     try:
                         if ret is None:
                             raise search_errors.NoIndexException(self._dir_path)
+                        self._index_version = ret
                         # Reread the dictionaries and
                         # store the new information in
                         # the shared data structure.
@@ -1396,6 +1467,57 @@ class TermQuery(object):
             md_fh.seek(o)
             yield md_fh.readline()
 
+    def __offset_entry_read(self, offsets):
+        """Takes a group of byte offsets into the main dictionary and
+        yields the parsed lines starting at those byte offsets, using
+        the postings cache when one was provided."""
+
+        cache = self._postings_cache
+        if cache is None:
+            for line in self.__offset_line_read(offsets):
+                assert not line == "\n"
+                yield self._data_main_dict.parse_main_dict_line(line)
+            return
+
+        version = self._index_version
+        md_fh = self._data_main_dict.get_file_handle()
+        for o in sorted(offsets):
+            entry = cache.get(version, o)
+            if entry is None:
+                md_fh.seek(o)
+                line = md_fh.readline()
+                assert not line == "\n"
+                entry = self._data_main_dict.parse_main_dict_line(line)
+                cache.add(version, o, entry)
+            yield entry
+
+    def __trigram_offsets(self, term, case_sensitive):
+        """Returns the set of byte offsets into the main dictionary of
+        the tokens which may match the glob pattern 'term', as found
+        using the trigram index, or None if the trigram index can't be
+        used for the term."""
+
+        trigrams = ss.IndexStoreTrigramDict.glob_trigrams(term)
+        if not trigrams:
+            return None
+        data = ss.IndexStoreTrigramDict(ss.TOKEN_TRIGRAMS_FILE)
+        try:
+            try:
+                ret = ss.consistent_open(
+                    [data], self._dir_path, self._file_timeout_secs
+                )
+            except search_errors.InconsistentIndexException:
+                return None
+            # The trigram index is optional; if it's missing or was
+            # written for a different version of the main dictionary,
+            # search without it.
+            if ret is None or ret != self._index_version:
+                return None
+            data.read_dict_file()
+            return data.get_offsets(trigrams, case_sensitive)
+        finally:
+            data.close_file_handle()
+
     def _read_pkg_dirs(self, fmris):
         """Legacy function used to search indexes which have a pkg
         directory with fmri offset information instead of the
@@ -1451,16 +1573,31 @@ class TermQuery(object):
         # If offsets is equal to None, match all possible results.  A
         # match with no results is represented by an empty set.
         offsets = None
+        # If token_match isn't None, offsets may include tokens which
+        # don't match the term, so each token must be checked using it.
+        token_match = None
 
         if glob:
             # If the term has at least one non-wildcard character
             # in it, do the glob search.
             if TermQuery.has_non_wildcard_character.match(term):
-                keys = self._data_token_offset.get_keys()
-                matches = choose(keys, term, case_sensitive)
-                offsets = set(
-                    [self._data_token_offset.get_id(match) for match in matches]
-                )
+                offsets = self.__trigram_offsets(term, case_sensitive)
+                if offsets is not None:
+                    flag = 0
+                    if not case_sensitive:
+                        flag = re.I
+                    token_match = re.compile(
+                        fnmatch.translate(term), flag
+                    ).match
+                else:
+                    keys = self._data_token_offset.get_keys()
+                    matches = choose(keys, term, case_sensitive)
+                    offsets = set(
+                        [
+                            self._data_token_offset.get_id(match)
+                            for match in matches
+                        ]
+                    )
         elif self._data_token_offset.has_entity(term):
             offsets = set([self._data_token_offset.get_id(term)])
         else:
@@ -1520,19 +1657,22 @@ class TermQuery(object):
                 # If the file doesn't exist, then no actions
                 # with that key were indexed.
                 offsets = set()
-        line_iter = EmptyI
+        entry_iter = EmptyI
         # If offsets isn't None, then the set of results has been
         # restricted so iterate through those offsets.
         if offsets is not None:
-            line_iter = self.__offset_line_read(offsets)
+            entry_iter = self.__offset_entry_read(offsets)
         # If offsets is None and the term was only wildcard search
         # tokens, return results for every known token.
         elif glob and not TermQuery.has_non_wildcard_character.match(term):
-            line_iter = self._data_main_dict.get_file_handle()
+            entry_iter = (
+                self._data_main_dict.parse_main_dict_line(line)
+                for line in self._data_main_dict.get_file_handle()
+            )
 
-        for line in line_iter:
-            assert not line == "\n"
-            tok, at_lst = self._data_main_dict.parse_main_dict_line(line)
+        for tok, at_lst in entry_iter:
+            if token_match is not None and not token_match(tok):
+                continue
             # Check that the token was what was expected.
             assert (
                 (term == tok)
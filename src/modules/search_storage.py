@@ -28,6 +28,7 @@ import os
 import errno
 import time
 import hashlib
+from array import array
 from urllib.parse import quote, unquote
 
 import pkg.fmri as fmri
@@ -44,6 +45,7 @@ MAIN_FILE = "main_dict.ascii.v2"
 BYTE_OFFSET_FILE = "token_byte_offset.v1"
 FULL_FMRI_HASH_FILE = "full_fmri_list.hash"
 FMRI_OFFSETS_FILE = "fmri_offsets.v1"
+TOKEN_TRIGRAMS_FILE = "token_trigrams.v1"
 
 
 def consistent_open(data_list, directory, timeout=1):
@@ -853,5 +855,183 @@ class InvertedDict(IndexStoreBase):
         return set(offs)
 
 
+class IndexStoreTrigramDict(IndexStoreBase):
+    """Class used to store and look up the byte offsets into the main
+    dictionary of the tokens which contain each trigram (sequence of
+    three characters).  It allows glob and case insensitive searches to
+    narrow the set of tokens which must be checked against the search
+    term without examining every token in the index.
+
+    Only trigrams made entirely of ASCII characters are recorded, and
+    they're recorded in lower case so that they serve both case
+    sensitive and case insensitive searches.  Because a case insensitive
+    search may match non-ASCII characters using ASCII ones, the offsets
+    of tokens which contain any non-ASCII characters are also recorded
+    under a separate key.  The offsets returned are therefore a superset
+    of the tokens which match; callers must still check each token.
+
+    The file is sorted by key so that lookups can be done using a binary
+    search of the file instead of reading it into memory."""
+
+    # The key used for tokens containing non-ASCII characters; it can
+    # never be the quoted form of a trigram.
+    NON_ASCII_KEY = "*"
+
+    def __init__(self, file_name):
+        IndexStoreBase.__init__(self, file_name)
+        self._dict = {}
+        self._data_start = None
+
+    def clear(self):
+        self._dict.clear()
+
+    @staticmethod
+    def __trigrams(s):
+        """Returns the set of lower case trigrams made entirely of
+        ASCII characters contained in the string 's'."""
+
+        return set(
+            s[i : i + 3].lower()
+            for i in range(len(s) - 2)
+            if s[i : i + 3].isascii()
+        )
+
+    def add_token(self, token, offset):
+        """Records that the token 'token' is found at the byte offset
+        'offset' in the main dictionary.  Tokens must be added in order
+        of increasing offset."""
+
+        keys = [quote(t, safe="") for t in self.__trigrams(token)]
+        if not token.isascii():
+            keys.append(self.NON_ASCII_KEY)
+        for k in keys:
+            try:
+                self._dict[k].append(offset)
+            except KeyError:
+                self._dict[k] = array("Q", [offset])
+
+    @staticmethod
+    def __make_line(key, offsets):
+        """Returns the string which represents the given key and its
+        offsets, which have had delta compression performed."""
+
+        old_o = 0
+        bucket = []
+        for o in offsets:
+            bucket.append(str(o - old_o))
+            old_o = o
+        return key + " " + " ".join(bucket)
+
+    def write_dict_file(self, path, version_num):
+        """Write the mapping of trigrams to offsets out to the file."""
+
+        IndexStoreBase._protected_write_dict_file(
+            self,
+            path,
+            version_num,
+            (self.__make_line(k, self._dict[k]) for k in sorted(self._dict)),
+        )
+
+    def read_dict_file(self):
+        """The file is searched in place, so only the position of the
+        first entry is recorded."""
+
+        self._data_start = self._file_handle.tell()
+        IndexStoreBase.read_dict_file(self)
+
+    def __line_at(self, pos):
+        """Returns the first line which starts at or after the byte
+        position 'pos'.  The file only contains ASCII characters, so
+        any byte position can be used as a seek position."""
+
+        fh = self._file_handle
+        if pos > self._data_start:
+            fh.seek(pos - 1)
+            fh.readline()
+        else:
+            fh.seek(self._data_start)
+        return fh.readline()
+
+    def __find(self, key):
+        """Returns the list of offsets recorded for 'key', which must
+        already be quoted."""
+
+        self._file_handle.seek(0, os.SEEK_END)
+        lo = self._data_start
+        hi = self._file_handle.tell()
+        # Find the first line whose key isn't less than the key sought.
+        while lo < hi:
+            mid = (lo + hi) // 2
+            line = self.__line_at(mid)
+            if line and line.split(" ", 1)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        k, _, offs = self.__line_at(lo).rstrip("\n").partition(" ")
+        if k != key:
+            return []
+        return InvertedDict.de_delta(offs.split())
+
+    def get_offsets(self, trigrams, case_sensitive):
+        """Returns the set of byte offsets into the main dictionary of
+        the tokens which may contain every one of the trigrams in
+        'trigrams'.
+
+        'case_sensitive' determines whether tokens which contain
+        non-ASCII characters are included as possible matches."""
+
+        assert self._file_handle and self._have_read
+        res = None
+        for t in sorted(trigrams):
+            offs = set(self.__find(quote(t, safe="")))
+            res = offs if res is None else res & offs
+            if not res:
+                break
+        res = res or set()
+        if not case_sensitive:
+            res.update(self.__find(self.NON_ASCII_KEY))
+        return res
+
+    @classmethod
+    def glob_trigrams(cls, pat):
+        """Returns the set of trigrams that every token matching the
+        glob pattern 'pat' must contain (ignoring case), or an empty
+        set if the pattern doesn't have enough literal characters to
+        determine any."""
+
+        literals = []
+        cur = ""
+        i, n = 0, len(pat)
+        # This follows the rules used by fnmatch.translate.
+        while i < n:
+            c = pat[i]
+            i += 1
+            if c in "*?":
+                literals.append(cur)
+                cur = ""
+            elif c == "[":
+                j = i
+                if j < n and pat[j] == "!":
+                    j += 1
+                if j < n and pat[j] == "]":
+                    j += 1
+                j = pat.find("]", j)
+                if j < 0:
+                    # An unterminated set is a literal '['.
+                    cur += c
+                else:
+                    literals.append(cur)
+                    cur = ""
+                    i = j + 1
+            else:
+                cur += c
+        literals.append(cur)
+
+        res = set()
+        for l in literals:
+            res.update(cls.__trigrams(l))
+        return res
+
+
 # Vim hints
 # vim:ts=4:sw=4:et:fdm=marker
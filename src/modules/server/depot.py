@@ -27,6 +27,7 @@
 
 import cherrypy
 from cherrypy._cptools import HandlerTool
+from cherrypy.lib import cptools, httputil
 from cherrypy.lib.static import serve_file
 from email.utils import formatdate
 from cherrypy.process.plugins import SimplePlugin
@@ -42,6 +43,7 @@ else:
 import atexit
 import ast
 import errno
+import hashlib
 import http.client
 import inspect
 import io
@@ -58,6 +60,7 @@ import tempfile
 import threading
 import time
 
+from collections import OrderedDict
 from urllib.parse import quote, urlunsplit
 
 # Without the below statements, tarfile will trigger calls to getpwuid and
@@ -85,6 +88,10 @@ import pkg.version
 
 from pkg.server.query_parser import Query, ParseError, BooleanQueryException
 
+# File content is named by the hexadecimal digest of the file; anything
+# else could be used to name a path outside of the repository.
+_FILE_HASH_RE = re.compile(r"^[0-9a-f]+$")
+
 
 class Dummy(object):
     """Dummy object used for dispatch method mapping."""
@@ -98,6 +105,94 @@ class _Depot(object):
     pass
 
 
+class _ResponseCache(object):
+    """A bounded, thread-safe, in-memory cache of response bodies for
+    small, frequently requested files such as catalog attributes, update
+    logs and manifests.  Each entry records the body of the response,
+    its ETag, its Last-Modified date, its Content-Type and its
+    Content-Encoding, along with the catalog generation of the publisher
+    the file belongs to.  An entry is only returned while the
+    publisher's catalog generation is unchanged, so entries are
+    invalidated whenever the catalog is saved or the repository is
+    reloaded.  The least recently used entries are
+    discarded when the cache is full."""
+
+    # The maximum total size, in bytes, of the cached bodies.
+    MAX_SIZE = 32 * 1024 * 1024
+
+    # The maximum size, in bytes, of a single cached body; larger files
+    # are always sent from disk.
+    MAX_ENTRY_SIZE = 1024 * 1024
+
+    def __init__(self, max_size=MAX_SIZE, max_entry_size=MAX_ENTRY_SIZE):
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__max_entry_size = max_entry_size
+        self.__max_size = max_size
+        self.__size = 0
+
+    def __discard(self, key):
+        entry = self.__entries.pop(key, None)
+        if entry:
+            self.__size -= len(entry[1])
+
+    def get(self, key, generation):
+        """Returns a tuple of (body, etag, last_modified, content_type,
+        encoding) for the entry matching 'key' that was created at catalog
+        generation 'generation', or None."""
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != generation:
+                self.__discard(key)
+                return None
+            self.__entries.move_to_end(key)
+            return entry[1:]
+
+    def add(self, key, generation, fpath, content_type, encoding=None):
+        """Reads the file at 'fpath' and adds it to the cache using
+        'key' at catalog generation 'generation'.  'encoding' is the
+        content encoding of the file, if any.  Returns the new entry as
+        returned by get(), or None if the file could not be cached."""
+
+        try:
+            with open(fpath, "rb") as f:
+                st = os.fstat(f.fileno())
+                if st.st_size > self.__max_entry_size:
+                    return None
+                body = f.read(self.__max_entry_size + 1)
+        except EnvironmentError:
+            return None
+        if len(body) > self.__max_entry_size:
+            return None
+
+        entry = (
+            generation,
+            body,
+            '"{0}"'.format(hashlib.sha1(body).hexdigest()),
+            httputil.HTTPDate(st.st_mtime),
+            content_type,
+            encoding,
+        )
+        with self.__lock:
+            self.__discard(key)
+            self.__entries[key] = entry
+            self.__size += len(body)
+            while self.__size > self.__max_size:
+                oldest = next(iter(self.__entries))
+                self.__discard(oldest)
+        return entry[1:]
+
+    def clear(self):
+        """Discards all cached entries."""
+
+        with self.__lock:
+            self.__entries.clear()
+            self.__size = 0
+
+
 class DepotHTTP(_Depot):
     """The DepotHTTP object is intended to be used as a cherrypy
     application object and represents the set of operations that a
@@ -161,6 +256,7 @@ class DepotHTTP(_Depot):
         self.cfg = dconf
         self.repo = repo
         self.request_pub_func = request_pub_func
+        self.__response_cache = _ResponseCache()
 
         content_root = dconf.get_property("pkg", "content_root")
         pkg_root = dconf.get_property("pkg", "pkg_root")
@@ -269,20 +365,16 @@ class DepotHTTP(_Depot):
         self.__bgtask = BackgroundTaskPlugin(cherrypy.engine)
         self.__bgtask.subscribe()
 
+        # Setup background search index updates.
+        self.__indexer = IndexSchedulerPlugin(cherrypy.engine, repo)
+        self.__indexer.subscribe()
+
     def _queue_refresh_index(self):
-        """Queues a background task to update search indexes.  This
-        method is a protected helper function for depot consumers."""
+        """Requests that the search indexes be updated in the
+        background.  This method is a protected helper function for
+        depot consumers."""
 
-        try:
-            self.__bgtask.put(self.repo.refresh_index)
-        except queue.Full:
-            # If another operation is already in progress, just
-            # log a warning and drive on.
-            cherrypy.log(
-                "Skipping indexing; another operation is "
-                "already in progress.",
-                "INDEX",
-            )
+        self.__indexer.request()
 
     @staticmethod
     def default_error_page(**kwargs):
@@ -322,6 +414,196 @@ class DepotHTTP(_Depot):
             return req_pub
         return None
 
+    @staticmethod
+    def __get_response_socket(length):
+        """Returns a tuple of (socket, wfile) for the connection the
+        current response is being written to if the remainder of the
+        response body can be written directly to the socket; otherwise
+        returns None.  'length' is the expected length of the body."""
+
+        # The HTTP server doesn't provide access to the connection,
+        # but its worker threads record the one they are serving.
+        conn = getattr(threading.current_thread(), "conn", None)
+        sock = getattr(conn, "socket", None)
+        wfile = getattr(conn, "wfile", None)
+        if not isinstance(sock, socket.socket) or not wfile:
+            return None
+
+        # The body can only bypass the server if it is not being
+        # chunked or otherwise transformed.
+        headers = cherrypy.serving.response.headers
+        if headers.get("Content-Length") != str(length):
+            return None
+        if headers.get("Transfer-Encoding") or headers.get("Content-Encoding"):
+            return None
+        return sock, wfile
+
+    @classmethod
+    def __file_body(cls, fobj, offset, length):
+        """A generator which writes 'length' bytes of the file object
+        'fobj' starting at 'offset' to the client.  Where possible,
+        the file is sent using sendfile(2), so that its content is not
+        copied through the server process."""
+
+        with fobj:
+            # The first block is written by the server as usual so
+            # that the response headers are sent.
+            data = os.pread(fobj.fileno(), min(length, 65536), offset)
+            if not data:
+                return
+            yield data
+            offset += len(data)
+            length -= len(data)
+            if not length:
+                return
+
+            conn = cls.__get_response_socket(length + len(data))
+            if conn:
+                sock, wfile = conn
+                wfile.flush()
+                while length > 0:
+                    sent = sock.sendfile(fobj, offset, length)
+                    if not sent:
+                        # The file was truncated.
+                        break
+                    offset += sent
+                    length -= sent
+                return
+
+            fobj.seek(offset)
+            while length > 0:
+                data = fobj.read(min(length, 65536))
+                if not data:
+                    break
+                length -= len(data)
+                yield data
+
+    def __serve_file(self, fpath, content_type):
+        """Set the response headers for the file at 'fpath' and return
+        a body which sends its content to the client.
+
+        Unlike serve_file(), the file is sent using sendfile(2) where
+        possible.  Single byte ranges are supported so that clients
+        can resume interrupted transfers; requests for multiple ranges
+        are passed to serve_file()."""
+
+        request = cherrypy.serving.request
+        response = cherrypy.serving.response
+
+        try:
+            fobj = open(fpath, "rb")
+            st = os.fstat(fobj.fileno())
+        except EnvironmentError:
+            raise cherrypy.NotFound()
+
+        try:
+            response.headers["Last-Modified"] = httputil.HTTPDate(st.st_mtime)
+            # Returns 304 if the client already has the file.
+            cptools.validate_since()
+
+            response.headers["Content-Type"] = content_type
+            response.headers["Accept-Ranges"] = "bytes"
+            size = st.st_size
+            offset = 0
+            length = size
+            if request.protocol >= (1, 1):
+                ranges = httputil.get_ranges(request.headers.get("Range"), size)
+                if ranges == []:
+                    response.headers["Content-Range"] = "bytes */{0}".format(
+                        size
+                    )
+                    raise cherrypy.HTTPError(
+                        http.client.REQUESTED_RANGE_NOT_SATISFIABLE,
+                        "Requested range not satisfiable",
+                    )
+                if ranges and len(ranges) > 1:
+                    # serve_file() produces the multipart response
+                    # required for these.
+                    fobj.close()
+                    return serve_file(fpath, content_type)
+                if ranges:
+                    start, stop = ranges[0]
+                    stop = min(stop, size)
+                    response.status = http.client.PARTIAL_CONTENT
+                    response.headers["Content-Range"] = (
+                        "bytes {0}-{1}/{2}".format(start, stop - 1, size)
+                    )
+                    offset = start
+                    length = stop - start
+            response.headers["Content-Length"] = str(length)
+        except Exception:
+            fobj.close()
+            raise
+
+        if not length:
+            fobj.close()
+            return b""
+        return self.__file_body(fobj, offset, length)
+
+    def __get_cached_response(self, key, pub):
+        """Returns a tuple of (entry, generation) for the cached
+        response identified by 'key' for publisher 'pub'.  'entry' is
+        None if the response isn't cached, and 'generation' is the
+        catalog generation a new entry must be added with, or None if
+        the response can't be cached."""
+
+        # Responses for partial content are never cached.
+        if "Range" in cherrypy.serving.request.headers:
+            return None, None
+        try:
+            generation = self.repo.catalog_generation(pub=pub)
+        except srepo.RepositoryError:
+            return None, None
+        return self.__response_cache.get(key, generation), generation
+
+    @staticmethod
+    def __get_catalog_encodings():
+        """Returns the list of (encoding, suffix) tuples from
+        srepo.CATALOG_ENCODINGS of the pre-compressed copies of catalog
+        files which may be sent in response to the current request, in
+        order of preference."""
+
+        request = cherrypy.serving.request
+        # Byte ranges always refer to the uncompressed file.
+        if "Range" in request.headers:
+            return []
+        try:
+            accepted = dict(
+                (e.value.lower(), e.qvalue)
+                for e in request.headers.elements("Accept-Encoding")
+            )
+        except ValueError:
+            return []
+        default = accepted.get("*", 0)
+        return [
+            (enc, suffix)
+            for enc, suffix in srepo.CATALOG_ENCODINGS
+            if accepted.get(enc, default) > 0
+        ]
+
+    def __serve_cached(self, entry):
+        """Set the response headers for the cached response 'entry' and
+        return its body.  Conditional requests are answered using the
+        ETag and Last-Modified date of the entry, without accessing the
+        file it was read from."""
+
+        body, etag, last_modified, content_type, encoding = entry
+        response = cherrypy.serving.response
+        response.headers["Last-Modified"] = last_modified
+        response.headers["ETag"] = etag
+        # Both raise a redirect resulting in a 304 if the client
+        # already has the response.
+        cptools.validate_etags()
+        cptools.validate_since()
+
+        response.headers["Content-Type"] = content_type
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        # Requests for byte ranges are served from the file.
+        response.headers["Accept-Ranges"] = "bytes"
+        response.headers["Content-Length"] = str(len(body))
+        return body
+
     def __set_response_expires(self, op_name, expires, max_age=None):
         """Used to set expiration headers on a response dynamically
         based on the name of the operation.
@@ -383,6 +665,7 @@ class DepotHTTP(_Depot):
         """Catch SIGUSR1 and reload the depot information."""
         old_pubs = self.repo.publishers
         self.repo.reload()
+        self.__response_cache.clear()
         if type(self.cfg) == cfg.SMFConfig:
             # For all other cases, reloading depot configuration
             # isn't desirable (because of command-line overrides).
@@ -701,19 +984,57 @@ class DepotHTTP(_Depot):
                 http.client.FORBIDDEN, _("Directory listing not allowed.")
             )
 
-        try:
-            fpath = self.repo.catalog_1(name, pub=self._get_req_pub())
-        except srepo.RepositoryError as e:
-            # Treat any remaining repository error as a 404, but
-            # log the error and include the real failure
-            # information.
-            cherrypy.log("Request failed: {0}".format(str(e)))
-            raise cherrypy.HTTPError(http.client.NOT_FOUND, str(e))
+        content_type = "text/plain; charset=utf-8"
+        pub = self._get_req_pub()
+        encodings = self.__get_catalog_encodings()
+        # The representation of the file depends on the encodings the
+        # client accepts.
+        key = ("catalog", pub, name, tuple(enc for enc, suffix in encodings))
+        entry, generation = self.__get_cached_response(key, pub)
+        if entry:
+            self.repo.inc_catalog()
+        else:
+            try:
+                fpath = self.repo.catalog_1(name, pub=pub)
+            except srepo.RepositoryError as e:
+                # Treat any remaining repository error as a 404,
+                # but log the error and include the real failure
+                # information.
+                cherrypy.log("Request failed: {0}".format(str(e)))
+                raise cherrypy.HTTPError(http.client.NOT_FOUND, str(e))
 
-        self.__set_response_expires("catalog", 86400, 86400)
-        return serve_file(fpath, "text/plain; charset=utf-8")
+            # Send a pre-compressed copy of the file written when the
+            # catalog was saved if one is current.
+            encoding = None
+            for enc, suffix in encodings:
+                try:
+                    st = os.stat(fpath)
+                    cst = os.stat(fpath + suffix)
+                except EnvironmentError:
+                    continue
+                if cst.st_mtime_ns >= st.st_mtime_ns:
+                    encoding = enc
+                    fpath += suffix
+                    break
+
+            if generation is not None:
+                entry = self.__response_cache.add(
+                    key, generation, fpath, content_type, encoding=encoding
+                )
 
-    catalog_1._cp_config = {"response.stream": True}
+        self.__set_response_expires("catalog", 86400, 86400)
+        cherrypy.serving.response.headers["Vary"] = "Accept-Encoding"
+        if entry:
+            return self.__serve_cached(entry)
+        if encoding:
+            cherrypy.serving.response.headers["Content-Encoding"] = encoding
+        return serve_file(fpath, content_type)
+
+    # Pre-compressed catalog files are sent as stored.
+    catalog_1._cp_config = {
+        "response.stream": True,
+        "tools.encode.on": False,
+    }
 
     def manifest_0(self, *tokens):
         """The request is an encoded pkg FMRI.  If the version is
@@ -735,33 +1056,56 @@ class DepotHTTP(_Depot):
                 http.client.FORBIDDEN, _("Directory listing not allowed.")
             )
 
+        content_type = "text/plain; charset=utf-8"
+        pub = self._get_req_pub()
+        entry = generation = None
+        if len(comps) == 1 and not comps[0].startswith("pkg:"):
+            # The manifest can only be cached if the publisher it
+            # belongs to is known without parsing the FMRI.
+            key = ("manifest", pub, comps[0])
+            entry, generation = self.__get_cached_response(key, pub)
+
         if len(comps) > 1 and comps[0] == "pkg:" and comps[1] in pubs:
             # Only one slash here as another will be added below.
             comps[0] += "/"
 
-        # Parse request into FMRI component and decode.
-        try:
-            # If more than one token (request path component) was
-            # specified, assume that the extra components are part
-            # of the fmri and have been split out because of bad
-            # proxy behaviour.
-            pfmri = "/".join(comps)
-            pfmri = fmri.PkgFmri(pfmri, None)
-            fpath = self.repo.manifest(pfmri, pub=self._get_req_pub())
-        except (IndexError, fmri.FmriError) as e:
-            raise cherrypy.HTTPError(http.client.BAD_REQUEST, str(e))
-        except srepo.RepositoryError as e:
-            # Treat any remaining repository error as a 404, but
-            # log the error and include the real failure
-            # information.
-            cherrypy.log("Request failed: {0}".format(str(e)))
-            raise cherrypy.HTTPError(http.client.NOT_FOUND, str(e))
+        if entry:
+            self.repo.inc_manifest()
+        else:
+            # Parse request into FMRI component and decode.
+            try:
+                # If more than one token (request path component)
+                # was specified, assume that the extra components
+                # are part of the fmri and have been split out
+                # because of bad proxy behaviour.
+                pfmri = "/".join(comps)
+                pfmri = fmri.PkgFmri(pfmri, None)
+                fpath = self.repo.manifest(pfmri, pub=pub)
+            except (IndexError, fmri.FmriError) as e:
+                raise cherrypy.HTTPError(http.client.BAD_REQUEST, str(e))
+            except srepo.RepositoryError as e:
+                # Treat any remaining repository error as a 404,
+                # but log the error and include the real failure
+                # information.
+                cherrypy.log("Request failed: {0}".format(str(e)))
+                raise cherrypy.HTTPError(http.client.NOT_FOUND, str(e))
+            if generation is not None:
+                entry = self.__response_cache.add(
+                    key, generation, fpath, content_type
+                )
 
         # Send manifest
         self.__set_response_expires("manifest", 86400 * 365, 86400 * 365)
-        return serve_file(fpath, "text/plain; charset=utf-8")
+        if entry:
+            return self.__serve_cached(entry)
+        return self.__serve_file(fpath, content_type)
 
-    manifest_0._cp_config = {"response.stream": True}
+    # Manifests are sent as stored; the encode tool would otherwise
+    # remove the Content-Length needed to send them using sendfile(2).
+    manifest_0._cp_config = {
+        "response.stream": True,
+        "tools.encode.on": False,
+    }
 
     def manifest_1(self, *tokens):
         """Outputs the contents of the manifest or uploads the
@@ -784,8 +1128,63 @@ class DepotHTTP(_Depot):
         "request.process_request_body": False,
         "response.timeout": 3600,
         "response.stream": True,
+        "tools.encode.on": False,
     }
 
+    def manifest_2(self, *tokens, **params):
+        """Outputs the manifests of the packages named by the FMRIs in
+        the body of a POST request as a tar stream.  Each entry in the
+        stream is named by the URL path of its FMRI, as used for
+        manifest/0; the manifests of unknown packages are omitted."""
+
+        method = cherrypy.request.method
+        if method != "POST":
+            raise cherrypy.HTTPError(
+                http.client.METHOD_NOT_ALLOWED,
+                "{0} is not allowed".format(method),
+            )
+
+        try:
+            pfmris = [
+                fmri.PkgFmri(params[k], None) for k in sorted(params, key=int)
+            ]
+        except (ValueError, fmri.FmriError) as e:
+            raise cherrypy.HTTPError(http.client.BAD_REQUEST, str(e))
+        if not pfmris:
+            raise cherrypy.HTTPError(
+                http.client.BAD_REQUEST, _("No packages specified.")
+            )
+
+        pub = self._get_req_pub()
+        cherrypy.response.headers["Content-Type"] = "application/x-tar"
+
+        def output():
+            buf = io.BytesIO()
+            tar_stream = tarfile.open(mode="w|", fileobj=buf)
+            for pfmri in pfmris:
+                try:
+                    fpath = self.repo.manifest(pfmri, pub=pub)
+                    tar_stream.add(
+                        fpath, arcname=pfmri.get_url_path(), recursive=False
+                    )
+                except (srepo.RepositoryError, EnvironmentError) as e:
+                    # The client will request any manifests
+                    # that are missing individually.
+                    cherrypy.log("Request failed: {0}".format(str(e)))
+                    continue
+
+                if buf.tell():
+                    yield buf.getvalue()
+                    buf.seek(0)
+                    buf.truncate()
+
+            tar_stream.close()
+            yield buf.getvalue()
+
+        return output()
+
+    manifest_2._cp_config = {"response.stream": True}
+
     @staticmethod
     def _tar_stream_close(**kwargs):
         """This is a special function to finish a tar_stream-based
@@ -832,7 +1231,7 @@ class DepotHTTP(_Depot):
             raise cherrypy.HTTPError(http.client.NOT_FOUND, str(e))
 
         self.__set_response_expires("file", 86400 * 365, 86400 * 365)
-        return serve_file(fpath, "application/data")
+        return self.__serve_file(fpath, "application/data")
 
     file_0._cp_config = {"response.stream": True}
 
@@ -859,6 +1258,86 @@ class DepotHTTP(_Depot):
         "response.stream": True,
     }
 
+    def file_3(self, *tokens, **params):
+        """Outputs the contents of the files named by the SHA hashes in
+        the body of a POST request as a tar stream.  Each entry in the
+        stream is named by the hash of its file; files which can't be
+        found are omitted."""
+
+        method = cherrypy.request.method
+        if method != "POST":
+            raise cherrypy.HTTPError(
+                http.client.METHOD_NOT_ALLOWED,
+                "{0} is not allowed".format(method),
+            )
+
+        try:
+            hashes = [params[k] for k in sorted(params, key=int)]
+        except ValueError as e:
+            raise cherrypy.HTTPError(http.client.BAD_REQUEST, str(e))
+        if not hashes:
+            raise cherrypy.HTTPError(
+                http.client.BAD_REQUEST, _("No files specified.")
+            )
+        for fhash in hashes:
+            if not _FILE_HASH_RE.match(fhash):
+                raise cherrypy.HTTPError(
+                    http.client.BAD_REQUEST,
+                    _("Invalid file hash: {0}").format(fhash),
+                )
+
+        pub = self._get_req_pub()
+        cherrypy.response.headers["Content-Type"] = "application/x-tar"
+
+        def output():
+            # The stream is written directly rather than by using
+            # tarfile so that files don't need to be buffered
+            # in memory.
+            for fhash in hashes:
+                try:
+                    fpath = self.repo.file(fhash, pub=pub)
+                    f = open(fpath, "rb")
+                except (srepo.RepositoryError, EnvironmentError) as e:
+                    # The client will request any files that
+                    # are missing individually.
+                    cherrypy.log("Request failed: {0}".format(str(e)))
+                    continue
+
+                with f:
+                    st = os.fstat(f.fileno())
+                    ti = tarfile.TarInfo(fhash)
+                    ti.size = st.st_size
+                    ti.mtime = st.st_mtime
+                    yield ti.tobuf()
+
+                    remaining = ti.size
+                    while remaining > 0:
+                        data = f.read(min(remaining, 65536))
+                        if not data:
+                            # The file was truncated; pad the
+                            # entry so the stream remains
+                            # valid.  The client will find
+                            # that the content is invalid.
+                            data = b"\0" * remaining
+                        remaining -= len(data)
+                        yield data
+
+                pad = -ti.size % tarfile.BLOCKSIZE
+                if pad:
+                    yield b"\0" * pad
+
+            # End of archive marker.
+            yield b"\0" * (tarfile.BLOCKSIZE * 2)
+
+        return output()
+
+    # The timeout is set higher since the default of five minutes is
+    # not really enough to send a large set of files to a slow client.
+    file_3._cp_config = {
+        "response.stream": True,
+        "response.timeout": 3600,
+    }
+
     def file_2(self, *tokens):
         """Outputs the contents of the file, named by the SHA hash
         name in the request path, directly to the client."""
@@ -871,7 +1350,11 @@ class DepotHTTP(_Depot):
                 fhash = None
 
             try:
-                fpath = self.repo.file(fhash, pub=self._get_req_pub())
+                pub = self._get_req_pub()
+                fpath = self.repo.file(fhash, pub=pub)
+                # The compressed attributes are cached by the
+                # repository, so this is normally just a lookup.
+                csize, chashes = self.repo.file_compressed_attrs(fhash, pub=pub)
             except srepo.RepositoryFileNotFoundError as e:
                 raise cherrypy.HTTPError(http.client.NOT_FOUND, str(e))
             except srepo.RepositoryError as e:
@@ -881,9 +1364,6 @@ class DepotHTTP(_Depot):
                 cherrypy.log("Request failed: {0}".format(str(e)))
                 raise cherrypy.HTTPError(http.client.NOT_FOUND, str(e))
 
-            csize, chashes = misc.compute_compressed_attrs(
-                fhash, file_path=fpath
-            )
             response = cherrypy.response
             for i, attr in enumerate(chashes):
                 response.headers["X-Ipkg-Attr-{0}".format(i)] = (
@@ -1041,6 +1521,15 @@ class DepotHTTP(_Depot):
             # operation.
             raise cherrypy.HTTPError(http.client.BAD_REQUEST, str(e))
 
+        if add_to_catalog and pfmri:
+            # Make the new package searchable without making the
+            # publisher wait for the search indexes to be updated.
+            try:
+                pub = fmri.PkgFmri(pfmri).publisher
+            except fmri.FmriError:
+                pub = None
+            self.__indexer.request(pub=pub)
+
         response = cherrypy.response
         response.headers["Package-FMRI"] = pfmri
         response.headers["State"] = pstate
@@ -1118,9 +1607,7 @@ class DepotHTTP(_Depot):
                 )
             elif cmd == "refresh-indexes":
                 # Update search indexes.
-                self.__bgtask.put(
-                    self.repo.refresh_index, pub=self._get_req_pub()
-                )
+                self.__indexer.request(pub=self._get_req_pub())
             elif cmd == "refresh-packages":
                 # Add new packages.
                 self.__bgtask.put(
@@ -1348,26 +1835,19 @@ class DepotHTTP(_Depot):
         except IndexError:
             cmd = ""
 
-        # These commands cause the operation requested to be queued
-        # for later execution.  This does mean that if the operation
-        # fails, the client won't know about it, but this is necessary
-        # since these are long running operations (are likely to exceed
-        # connection timeout limits).
-        try:
-            if cmd == "refresh":
-                # Update search indexes.
-                self.__bgtask.put(
-                    self.repo.refresh_index, pub=self._get_req_pub()
-                )
-            else:
-                err = "Unknown index subcommand: {0}".format(cmd)
-                cherrypy.log(err)
-                raise cherrypy.HTTPError(http.client.NOT_FOUND, err)
-        except queue.Full:
-            raise cherrypy.HTTPError(
-                http.client.SERVICE_UNAVAILABLE,
-                "Another operation is already in progress; try again later.",
-            )
+        # Index updates are performed in the background.  This does
+        # mean that if the operation fails, the client won't know about
+        # it, but this is necessary since these are long running
+        # operations (are likely to exceed connection timeout limits).
+        # Requests made while an update is in progress are combined
+        # into a single update once it has completed.
+        if cmd == "refresh":
+            # Update search indexes.
+            self.__indexer.request(pub=self._get_req_pub())
+        else:
+            err = "Unknown index subcommand: {0}".format(cmd)
+            cherrypy.log(err)
+            raise cherrypy.HTTPError(http.client.NOT_FOUND, err)
 
     @cherrypy.tools.response_headers(
         headers=[("Content-Type", "text/plain; charset=utf-8")]
@@ -2368,6 +2848,98 @@ class BackgroundTaskPlugin(SimplePlugin):
             self.__thread = None
 
 
+class IndexSchedulerPlugin(SimplePlugin):
+    """This class updates the search indexes of a repository in the
+    background for the depot server.  Requests for an update made while
+    one is already pending or in progress are combined so that at most
+    one update is outstanding for each publisher, and the depot never
+    has to refuse a request to update the search indexes.
+    """
+
+    # Number of seconds to wait before retrying an update that could
+    # not be performed because the index was busy.
+    RETRY_DELAY = 5
+
+    def __init__(self, bus, repo):
+        SimplePlugin.__init__(self, bus)
+        self.__repo = repo
+        self.__cv = threading.Condition()
+        # The set of publisher prefixes to update; None means all of
+        # the repository's publishers.
+        self.__pending = set()
+        self.__running = False
+        self.__thread = None
+
+    def request(self, pub=None):
+        """Schedule an update of the search indexes for the publisher
+        'pub', or for all publishers if 'pub' is None."""
+
+        with self.__cv:
+            self.__pending.add(pub)
+            self.__cv.notify()
+
+    def run(self):
+        """Perform any search index updates that have been requested."""
+
+        while True:
+            with self.__cv:
+                while self.__running and not self.__pending:
+                    # A timeout ensures that shutdown doesn't
+                    # wait forever for a new request to appear.
+                    self.__cv.wait(0.5)
+                if not self.__running:
+                    return
+                if None in self.__pending:
+                    pubs = [None]
+                else:
+                    pubs = sorted(self.__pending)
+                self.__pending.clear()
+
+            for pub in pubs:
+                try:
+                    self.__repo.refresh_index(pub=pub)
+                except srepo.RepositoryLockedError:
+                    # Another update is in progress; try again
+                    # once it has had a chance to finish.
+                    with self.__cv:
+                        self.__pending.add(pub)
+                        self.__cv.wait(self.RETRY_DELAY)
+                except (
+                    srepo.RepositoryMirrorError,
+                    srepo.RepositoryUnsupportedOperationError,
+                ):
+                    # Nothing to do for this repository.
+                    pass
+                except:
+                    self.bus.log(
+                        "Failure encountered updating search "
+                        "indexes {0!r}.".format(self),
+                        traceback=True,
+                    )
+
+    def start(self):
+        """Start the index scheduler plugin."""
+        self.__running = True
+        if not self.__thread:
+            # Create and start a thread for the caller.
+            self.__thread = threading.Thread(target=self.run)
+            self.__thread.start()
+
+    # Priority must be higher than the Daemonizer plugin to avoid threads
+    # starting before fork().
+    start.priority = 66
+
+    def stop(self):
+        """Stop the index scheduler plugin."""
+        with self.__cv:
+            self.__running = False
+            self.__cv.notify()
+        if self.__thread:
+            # Wait for the thread to terminate.
+            self.__thread.join()
+            self.__thread = None
+
+
 class DepotConfig(object):
     """Returns an object representing a configuration interface for a
     a pkg(7) depot server.
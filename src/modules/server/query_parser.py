@@ -25,6 +25,8 @@
 #
 
 import sys
+import threading
+
 import pkg.query_parser as qp
 from pkg.query_parser import (
     BooleanQueryException,
@@ -110,5 +112,81 @@ class TermQuery(qp.TermQuery):
         return it
 
 
+class QueryEngine(object):
+    """A long-lived query engine for the search index of a repository
+    store.  Query parsers are reused between searches instead of being
+    built for each query, and the parsed postings of recently searched
+    tokens are kept in a bounded cache so that frequently searched terms
+    are not read from disk and parsed for every query."""
+
+    # The maximum number of idle query parsers retained for reuse.
+    MAX_PARSERS = 16
+
+    def __init__(self, index_dir, max_postings=qp.MAX_CACHED_POSTINGS):
+        """'index_dir' is the path to the base directory of the search
+        index.
+
+        'max_postings' is the maximum number of parsed main dictionary
+        lines to retain between searches."""
+
+        self.index_dir = index_dir
+        self.postings = qp.PostingsCache(max_postings)
+        self.__lock = threading.Lock()
+        self.__parsers = []
+
+    def __get_parser(self):
+        with self.__lock:
+            if self.__parsers:
+                return self.__parsers.pop()
+        l = QueryLexer()
+        l.build()
+        return QueryParser(l)
+
+    def __put_parser(self, qqp):
+        with self.__lock:
+            if len(self.__parsers) < self.MAX_PARSERS:
+                self.__parsers.append(qqp)
+
+    def parse(self, text):
+        """Parses the query string 'text' into an AST."""
+
+        qqp = self.__get_parser()
+        try:
+            return qqp.parse(text)
+        finally:
+            self.__put_parser(qqp)
+
+    def search(self, query, fmris, get_manifest_path):
+        """Performs the search described by the Query object 'query'
+        and returns an iterator over the results.
+
+        'fmris' is a function which produces an object which iterates
+        over all known fmris.
+
+        'get_manifest_path' is a function which when given a fully
+        specified fmri returns the path to the manifest file for that
+        fmri."""
+
+        ast = self.parse(query.text)
+        ast.set_info(
+            num_to_return=query.num_to_return,
+            start_point=query.start_point,
+            index_dir=self.index_dir,
+            get_manifest_path=get_manifest_path,
+            case_sensitive=query.case_sensitive,
+            postings_cache=self.postings,
+        )
+        if query.return_type == Query.RETURN_PACKAGES:
+            ast.propagate_pkg_return()
+        return ast.search(fmris)
+
+    def reset(self):
+        """Discards all cached index data so that it will be reloaded
+        the next time a search is performed."""
+
+        self.postings.clear()
+        TermQuery.clear_cache(self.index_dir)
+
+
 # Vim hints
 # vim:ts=4:sw=4:et:fdm=marker
@@ -25,7 +25,9 @@
 import codecs
 import datetime
 import errno
+import gzip
 import hashlib
+import itertools
 import logging
 import os
 import os.path
@@ -33,7 +35,10 @@ import shutil
 import stat
 import sys
 import tempfile
+import threading
 import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from io import BytesIO, StringIO
 from urllib.parse import unquote
 
@@ -48,6 +53,7 @@ import pkg.file_layout.file_manager as file_manager
 import pkg.file_layout.layout as layout
 import pkg.fmri as fmri
 import pkg.indexer as indexer
+import pkg.json as json
 import pkg.lockfile as lockfile
 import pkg.manifest
 import pkg.p5i as p5i
@@ -64,10 +70,33 @@ import pkg.version
 
 from pkg.pkggzip import PkgGzipFile
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 CURRENT_REPO_VERSION = 4
 
 REPO_QUARANTINE_DIR = "pkg5-quarantine"
 
+# The file in which the packages found to be intact by a verification are
+# recorded so that an interrupted verification can be resumed.
+VERIFY_CHECKPOINT = "verify.checkpoint"
+
+# The content encodings, in order of preference, and the file name suffixes
+# of the pre-compressed copies of catalog files written whenever a catalog
+# is saved.  A copy is only current if it is at least as new as the file
+# it was made from.
+CATALOG_ENCODINGS = [("gzip", ".gz")]
+if zstandard:
+    CATALOG_ENCODINGS.insert(0, ("zstd", ".zst"))
+
+# The compression levels used for those copies.  They are rewritten for
+# every catalog save, including each publication, so fast levels are used;
+# the highest levels take many times longer for a few percent less data.
+CATALOG_ZSTD_LEVEL = 3
+CATALOG_GZIP_LEVEL = 6
+
 REPO_VERIFY_BADHASH = 0
 REPO_VERIFY_BADMANIFEST = 1
 REPO_VERIFY_BADGZIP = 2
@@ -77,6 +106,7 @@ REPO_VERIFY_MFPERM = 5
 REPO_VERIFY_BADSIG = 6
 REPO_VERIFY_WARN_OPENPERMS = 7
 REPO_VERIFY_DEPENDERROR = 8
+REPO_VERIFY_WARN_RESUMED = 9
 REPO_VERIFY_UNKNOWN = 99
 
 REPO_FIX_ITEM = 0
@@ -398,6 +428,69 @@ class RepositorySigNoTrustAnchorDirError(RepositoryError):
         return _("Unable to find trust anchor directory {0}").format(self.data)
 
 
+# The number of manifests parsed by a worker process at a time during a
+# parallel rebuild.
+REBUILD_BATCH_SIZE = 256
+
+
+def _fmri_from_path(pkgpath, ver):
+    """Helper function that takes the full path to the package directory
+    and the name of the manifest file, and returns an FMRI constructed
+    from the information in those components."""
+
+    v = pkg.version.Version(unquote(ver), None)
+    f = fmri.PkgFmri(unquote(os.path.basename(pkgpath)))
+    f.version = v
+    return f
+
+
+def _get_rebuild_entries(manifest_root, default_pub, manifests):
+    """Parse the manifests in 'manifests', a list of tuples of the form
+    (pkgpath, fname) naming manifest files beneath 'manifest_root', and
+    return a list containing, for each one, a tuple of the form (name,
+    fmri, entries, error).  'name' is the pathname of the manifest,
+    'entries' is the dict of catalog entries for the package and 'error'
+    is None, unless the manifest is invalid, in which case 'fmri' and
+    'entries' are None and 'error' describes the problem.
+
+    This is used by rebuild operations, and may be run in a separate
+    process."""
+
+    results = []
+    for pkgpath, fname in manifests:
+        try:
+            f = _fmri_from_path(pkgpath, fname)
+            mpath = os.path.join(manifest_root, f.get_dir_path())
+            m = pkg.manifest.Manifest(f)
+            try:
+                m.set_content(pathname=mpath, signatures=True)
+            except EnvironmentError as e:
+                if e.errno == errno.ENOENT:
+                    raise RepositoryManifestNotFoundError(e.filename)
+                raise
+            if "pkg.fmri" in m:
+                f = fmri.PkgFmri(m["pkg.fmri"])
+            if default_pub and not f.publisher:
+                f.publisher = default_pub
+            entries = catalog.Catalog.get_manifest_entries(m)
+        except (
+            apx.InvalidPackageErrors,
+            actions.ActionError,
+            fmri.FmriError,
+            pkg.version.VersionError,
+        ) as e:
+            results.append((os.path.join(pkgpath, fname), None, None, str(e)))
+            continue
+        results.append((os.path.join(pkgpath, fname), f, entries, None))
+    return results
+
+
+# Source of the values of _RepoStore.catalog_generation; these are unique
+# across all repository stores so that a value is never reused after a
+# repository has been reloaded.
+_catalog_generations = itertools.count(1)
+
+
 class _RepoStore(object):
     """The _RepoStore object provides an interface for performing operations
     on a set of package data contained within a repository.  This class is
@@ -422,6 +515,7 @@ class _RepoStore(object):
 
         self.__catalog = None
         self.__catalog_root = None
+        self.catalog_generation = next(_catalog_generations)
         # FileManager supports multiple layouts, but realistically, it
         # is desirable to only support one per repository format
         # version.
@@ -460,6 +554,12 @@ class _RepoStore(object):
 
         self.__search_available = False
         self.__refresh_again = False
+        self.__query_engine = None
+
+        # Serializes updates of the search index by this process.  It
+        # is always acquired after the repository store lock by threads
+        # that hold both.
+        self.__index_lock = threading.Lock()
 
         self.__lock = pkg.nrlock.NRLock()
         if self.__tmp_root:
@@ -571,17 +671,7 @@ class _RepoStore(object):
         self.__catalog = None
         if self.catalog_root and os.path.exists(self.catalog_root):
             shutil.rmtree(self.catalog_root)
-
-    @staticmethod
-    def __fmri_from_path(pkgpath, ver):
-        """Helper method that takes the full path to the package
-        directory and the name of the manifest file, and returns an FMRI
-        constructed from the information in those components."""
-
-        v = pkg.version.Version(unquote(ver), None)
-        f = fmri.PkgFmri(unquote(os.path.basename(pkgpath)))
-        f.version = v
-        return f
+        self.__catalog_changed()
 
     def _get_manifest(self, pfmri, sig=False):
         """This function should be private; but is protected instead due
@@ -739,6 +829,17 @@ class _RepoStore(object):
             self.__lock.release()
             raise
 
+        if self.read_only or not self.catalog_root or self.mirror:
+            return
+
+        # Now that no other consumer can be saving the catalog,
+        # complete any catalog save that was interrupted.
+        try:
+            self.__recover_catalog()
+        except:
+            self.__unlock_rstore()
+            raise
+
     def __log(self, msg, context="", severity=logging.INFO):
         if self.log_obj:
             self.log_obj.log(msg=msg, context=context, severity=severity)
@@ -781,11 +882,72 @@ class _RepoStore(object):
         # Discard in-memory search data.
         self.reset_search()
 
+    def __gen_rebuild_entries(self, default_pub, jobs):
+        """Generate the tuples returned by _get_rebuild_entries() for
+        every manifest in the repository, in the order the manifests
+        are found.  If 'jobs' is greater than one, the manifests are
+        parsed by that many worker processes."""
+
+        def gen_manifests():
+            # XXX eschew os.walk in favor of another os.listdir
+            # here?
+            for pkgpath in os.walk(self.manifest_root):
+                if pkgpath[0] == self.manifest_root:
+                    continue
+
+                for fname in os.listdir(pkgpath[0]):
+                    yield pkgpath[0], fname
+
+        if jobs <= 1:
+            for pkgpath, fname in gen_manifests():
+                yield from _get_rebuild_entries(
+                    self.manifest_root, default_pub, [(pkgpath, fname)]
+                )
+            return
+
+        def gen_batches():
+            batch = []
+            for m in gen_manifests():
+                batch.append(m)
+                if len(batch) >= REBUILD_BATCH_SIZE:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        # Results are consumed in the order the batches were
+        # submitted so that the catalog is built exactly as it would
+        # be serially; the number of batches in flight is bounded to
+        # limit memory use.
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            pending = deque()
+            for batch in gen_batches():
+                pending.append(
+                    executor.submit(
+                        _get_rebuild_entries,
+                        self.manifest_root,
+                        default_pub,
+                        batch,
+                    )
+                )
+                if len(pending) >= jobs * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
     def __rebuild(
-        self, build_catalog=True, build_index=False, lm=None, incremental=False
+        self,
+        build_catalog=True,
+        build_index=False,
+        lm=None,
+        incremental=False,
+        jobs=1,
     ):
         """Private version; caller responsible for repository
-        locking."""
+        locking.
+
+        'jobs' is the number of worker processes used to parse the
+        package manifests when rebuilding the catalog."""
 
         if not (build_catalog or build_index) or not self.manifest_root:
             # Nothing to do.
@@ -808,47 +970,27 @@ class _RepoStore(object):
             # rebuild.
             self.catalog.log_updates = incremental
 
-            def add_package(f):
-                m = self._get_manifest(f, sig=True)
-                if "pkg.fmri" in m:
-                    f = fmri.PkgFmri(m["pkg.fmri"])
-                if default_pub and not f.publisher:
-                    f.publisher = default_pub
-                self.__add_package(f, manifest=m)
-                self.__log(str(f))
-
-            # XXX eschew os.walk in favor of another os.listdir
-            # here?
-            for pkgpath in os.walk(self.manifest_root):
-                if pkgpath[0] == self.manifest_root:
+            for name, f, entries, error in self.__gen_rebuild_entries(
+                default_pub, jobs
+            ):
+                if error is not None:
+                    # Don't add packages with corrupt manifests
+                    # to the catalog.
+                    self.__log(
+                        _("Skipping {name}; invalid manifest: {error}").format(
+                            name=name, error=error
+                        )
+                    )
                     continue
 
-                for fname in os.listdir(pkgpath[0]):
-                    try:
-                        f = self.__fmri_from_path(pkgpath[0], fname)
-                        add_package(f)
-                    except (
-                        apx.InvalidPackageErrors,
-                        actions.ActionError,
-                        fmri.FmriError,
-                        pkg.version.VersionError,
-                    ) as e:
-                        # Don't add packages with
-                        # corrupt manifests to the
-                        # catalog.
-                        name = os.path.join(pkgpath[0], fname)
-                        self.__log(
-                            _(
-                                "Skipping "
-                                "{name}; invalid "
-                                "manifest: {error}"
-                            ).format(name=name, error=e)
-                        )
-                    except apx.DuplicateCatalogEntry as e:
-                        # Raise dups if not in
-                        # incremental mode.
-                        if not incremental:
-                            raise
+                try:
+                    self.catalog.add_package(f, manifest_entries=entries)
+                except apx.DuplicateCatalogEntry as e:
+                    # Raise dups if not in incremental mode.
+                    if not incremental:
+                        raise
+                    continue
+                self.__log(str(f))
 
             # Private add_package doesn't automatically save catalog
             # so that operations can be batched (there is
@@ -859,31 +1001,34 @@ class _RepoStore(object):
             self.catalog.finalize()
             self.__save_catalog(lm=lm)
 
-        if not incremental:
-            # Only discard search data if this isn't an incremental
-            # rebuild.
-            self.__purge_search_index()
+        if not incremental or build_index:
+            with self.__index_lock:
+                if not incremental:
+                    # Only discard search data if this isn't an
+                    # incremental rebuild.
+                    self.__purge_search_index()
 
-        if build_index:
-            self.__refresh_index()
-        else:
+                if build_index:
+                    self.__refresh_index()
+        if not build_index:
             self.__check_search()
 
-    def __refresh_index(self):
-        """Private version; caller responsible for repository
-        locking."""
+    def __refresh_index(self, fmris=None):
+        """Private version; caller responsible for index locking, and
+        for repository locking unless 'fmris', a list of the FMRIs in
+        the catalog, is provided."""
 
         if not self.index_root:
             return
         if self.read_only and not self.writable_root:
             raise RepositoryReadOnlyError()
 
-        cat = self.catalog
+        cat = self.catalog if fmris is None else fmris
         self.__index_log("Checking for updated package data.")
         fmris_to_index = indexer.Indexer.check_for_updates(self.index_root, cat)
 
         if fmris_to_index:
-            return self.__run_update_index()
+            return self.__run_update_index(cat)
 
         # Since there is nothing to index, setup the index
         # and declare search available.  This is only logged
@@ -907,6 +1052,7 @@ class _RepoStore(object):
         # Discard current catalog information (it will be re-loaded
         # when needed).
         self.__catalog = None
+        self.__catalog_changed()
 
         # Determine location and version of catalog data.
         self.__init_catalog(allow_invalid=allow_invalid)
@@ -1077,10 +1223,240 @@ class _RepoStore(object):
             if pubs:
                 self.publisher = pubs[0]
 
+    def __get_catalog_commit(self):
+        """Returns the pathname of the file used to record the catalog
+        files that are being moved into place by a catalog save."""
+
+        return os.path.join(
+            os.path.dirname(self.catalog_root),
+            "commit." + os.path.basename(self.catalog_root),
+        )
+
+    @staticmethod
+    def __compress_catalog(cat_root, names=None):
+        """Write a pre-compressed copy of each of the catalog files
+        'names' in 'cat_root', for each of CATALOG_ENCODINGS, unless a
+        current copy already exists.  If 'names' isn't provided, all of
+        the files in 'cat_root' are processed, and any compressed copy
+        of a file that no longer exists is removed.  Only the files that
+        clients retrieve are compressed: catalog.attrs, the parts it
+        lists and the update logs.  Returns a list of the names of the
+        compressed copies written."""
+
+        prune = names is None
+        if prune:
+            names = os.listdir(cat_root)
+
+        written = []
+        try:
+            served = set(["catalog.attrs"])
+            try:
+                with open(os.path.join(cat_root, "catalog.attrs"), "rb") as f:
+                    served.update(json.load(f).get("parts", {}))
+            except EnvironmentError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+            except (ValueError, AttributeError):
+                # An invalid catalog can't be served.
+                pass
+
+            for name in names:
+                path = os.path.join(cat_root, name)
+                if name.endswith((".gz", ".zst")):
+                    base = name.rsplit(".", 1)[0]
+                    if prune and not (
+                        os.path.exists(os.path.join(cat_root, base))
+                        and (base in served or base.startswith("update."))
+                    ):
+                        portable.remove(path)
+                    continue
+                if not os.path.isfile(path) or not (
+                    name in served or name.startswith("update.")
+                ):
+                    continue
+
+                mtime = os.stat(path).st_mtime_ns
+                data = None
+                for enc, suffix in CATALOG_ENCODINGS:
+                    cpath = path + suffix
+                    try:
+                        if os.stat(cpath).st_mtime_ns >= mtime:
+                            continue
+                    except EnvironmentError as e:
+                        if e.errno != errno.ENOENT:
+                            raise
+
+                    if data is None:
+                        with open(path, "rb") as f:
+                            data = f.read()
+                    if enc == "zstd":
+                        cdata = zstandard.ZstdCompressor(
+                            level=CATALOG_ZSTD_LEVEL
+                        ).compress(data)
+                    else:
+                        cdata = gzip.compress(
+                            data, compresslevel=CATALOG_GZIP_LEVEL, mtime=0
+                        )
+
+                    fd, tmp = tempfile.mkstemp(dir=cat_root)
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(cdata)
+                    os.chmod(tmp, misc.PKG_FILE_MODE)
+                    portable.rename(tmp, cpath)
+                    written.append(name + suffix)
+        except EnvironmentError as e:
+            if e.errno == errno.EACCES or e.errno == errno.EPERM:
+                raise apx.PermissionsException(e.filename)
+            elif e.errno == errno.EROFS:
+                raise apx.ReadOnlyFileSystemException(e.filename)
+            raise
+        return written
+
+    def __commit_catalog(self, tmp_cat_root, names):
+        """Move the catalog files 'names' from 'tmp_cat_root' into the
+        catalog root, replacing any existing files of the same name.
+        The list of files is recorded first, so that if the operation
+        is interrupted, it can be completed by __recover_catalog()."""
+
+        commit = self.__get_catalog_commit()
+        try:
+            fd, fn = tempfile.mkstemp(dir=os.path.dirname(commit))
+            with os.fdopen(fd, "w") as f:
+                json.dump({"source": tmp_cat_root, "files": names}, f)
+            os.chmod(fn, misc.PKG_FILE_MODE)
+            portable.rename(fn, commit)
+        except EnvironmentError as e:
+            if e.errno == errno.EACCES or e.errno == errno.EPERM:
+                raise apx.PermissionsException(e.filename)
+            elif e.errno == errno.EROFS:
+                raise apx.ReadOnlyFileSystemException(e.filename)
+            raise
+        self.__recover_catalog()
+
+    def __recover_catalog(self):
+        """Move any catalog files recorded by an interrupted catalog
+        save into place, and discard the record of them."""
+
+        commit = self.__get_catalog_commit()
+        try:
+            with open(commit) as f:
+                data = json.load(f)
+            source = data["source"]
+            names = data["files"]
+        except EnvironmentError as e:
+            if e.errno == errno.ENOENT:
+                return
+            if e.errno == errno.EACCES:
+                raise apx.PermissionsException(e.filename)
+            raise
+        except (ValueError, KeyError, TypeError):
+            # Unusable; the files it refers to are discarded with
+            # the rest of the repository's temporary data.
+            names = []
+            source = None
+
+        try:
+            for name in names:
+                try:
+                    portable.rename(
+                        os.path.join(source, name),
+                        os.path.join(self.catalog_root, name),
+                    )
+                except EnvironmentError as e:
+                    # Files that are missing have already been
+                    # moved into place.
+                    if e.errno != errno.ENOENT:
+                        raise
+            try:
+                portable.remove(commit)
+            except EnvironmentError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+        except EnvironmentError as e:
+            if e.errno == errno.EACCES or e.errno == errno.EPERM:
+                raise apx.PermissionsException(e.filename)
+            elif e.errno == errno.EROFS:
+                raise apx.ReadOnlyFileSystemException(e.filename)
+            raise
+        if source:
+            shutil.rmtree(source, True)
+
+    def __save_catalog_incremental(self, lm=None):
+        """Private helper function that saves only the catalog parts
+        and update logs that have been modified, along with the
+        catalog attributes, and then moves them into place.  Returns
+        False if this isn't possible, in which case nothing has been
+        written."""
+
+        old_cat_root = self.catalog_root
+        cat = self.catalog
+        if (
+            not isinstance(cat, catalog.Catalog)
+            or not cat.exists
+            or cat.meta_root != old_cat_root
+        ):
+            return False
+
+        tmp_cat_root = self.__mkdtemp()
+        if not tmp_cat_root:
+            return False
+        if os.stat(tmp_cat_root).st_dev != os.stat(old_cat_root).st_dev:
+            # The files can't be renamed into place.
+            shutil.rmtree(tmp_cat_root, True)
+            return False
+
+        # Save the modified catalog data in the temporary location.
+        self.__set_catalog_root(tmp_cat_root)
+        try:
+            if lm:
+                cat.last_modified = lm
+            cat.save(fmt=self.__catalogue_format, modified_only=True)
+        finally:
+            self.__set_catalog_root(old_cat_root)
+
+        # The catalog attributes refer to the signatures of the other
+        # files, so are moved into place last.  The compressed copies
+        # of each file are moved into place after it.
+        self.__compress_catalog(tmp_cat_root, os.listdir(tmp_cat_root))
+        names = sorted(
+            n
+            for n in os.listdir(tmp_cat_root)
+            if not n.startswith("catalog.attrs")
+        )
+        names.extend(
+            sorted(
+                n
+                for n in os.listdir(tmp_cat_root)
+                if n.startswith("catalog.attrs")
+            )
+        )
+        self.__commit_catalog(tmp_cat_root, names)
+        return True
+
+    def __catalog_changed(self):
+        """Private helper function that records that the on-disk catalog
+        may have changed."""
+
+        self.catalog_generation = next(_catalog_generations)
+
     def __save_catalog(self, lm=None):
         """Private helper function that attempts to save the catalog in
         an atomic fashion."""
 
+        try:
+            self.__write_catalog(lm=lm)
+        finally:
+            self.__catalog_changed()
+
+    def __write_catalog(self, lm=None):
+        """Private helper function for __save_catalog that writes the
+        catalog and moves it into place."""
+
+        if self.__save_catalog_incremental(lm=lm):
+            # Set catalog version.
+            self.catalog_version = self.catalog.version
+            return
+
         # Ensure new catalog is created in a temporary location so that
         # it can be renamed into place *after* creation to prevent
         # unexpected failure causing future updates to fail.
@@ -1126,6 +1502,7 @@ class _RepoStore(object):
         if lm:
             self.catalog.last_modified = lm
         self.catalog.save(fmt=self.__catalogue_format)
+        self.__compress_catalog(tmp_cat_root)
 
         orig_cat_root = None
         if os.path.exists(old_cat_root):
@@ -1450,6 +1827,9 @@ class _RepoStore(object):
         if not self.index_root:
             # Nothing to do.
             return
+        engine = self.__query_engine
+        if engine is not None:
+            engine.reset()
         sqp.TermQuery.clear_cache(self.index_root)
 
     def close(self, trans_id, add_to_catalog=True):
@@ -1523,6 +1903,135 @@ class _RepoStore(object):
             return fp
         raise RepositoryFileNotFoundError(fhash)
 
+    def __cattrs_path(self, fhash):
+        """Returns the path to the cached compressed attributes record
+        for the file named 'fhash', or None if the repository store has
+        no location suitable for storing it."""
+
+        root = self.cattrs_root
+        if not root:
+            return None
+        flayout = self.__file_layout
+        if flayout is None:
+            flayout = layout.get_preferred_layout()
+        return os.path.join(root, flayout.lookup(fhash))
+
+    def __load_cattrs(self, fhash, fst, chash_attrs):
+        """Returns a tuple of (csize, chashes) for the file named 'fhash'
+        from the compressed attributes cache, or None if there is no
+        entry, or the entry does not match the payload described by the
+        stat result 'fst'."""
+
+        cpath = self.__cattrs_path(fhash)
+        if not cpath:
+            return None
+
+        try:
+            with open(cpath, "rb") as f:
+                entry = json.load(f)
+        except (EnvironmentError, ValueError):
+            # A missing, unreadable, or corrupt entry is simply
+            # treated as a cache miss.
+            return None
+
+        try:
+            if (
+                entry["size"] != fst.st_size
+                or entry["mtime"] != fst.st_mtime_ns
+            ):
+                # Payload has been replaced since the entry was
+                # recorded.
+                return None
+            chashes = entry["chashes"]
+            if any(attr not in chashes for attr in chash_attrs):
+                return None
+            return entry["csize"], dict(
+                (attr, chashes[attr]) for attr in chash_attrs
+            )
+        except (KeyError, TypeError):
+            return None
+
+    def __store_cattrs(self, fhash, fst, csize, chashes):
+        """Records the compressed attributes of the file named 'fhash' in
+        the compressed attributes cache.  Failure to do so is not fatal
+        since the attributes can always be computed again."""
+
+        cpath = self.__cattrs_path(fhash)
+        if not cpath or (self.read_only and not self.writable_root):
+            return
+
+        entry = {
+            "size": fst.st_size,
+            "mtime": fst.st_mtime_ns,
+            "csize": csize,
+            "chashes": chashes,
+        }
+
+        fn = None
+        try:
+            cdir = os.path.dirname(cpath)
+            misc.makedirs(cdir)
+            fd, fn = tempfile.mkstemp(dir=cdir)
+            os.fchmod(fd, misc.PKG_FILE_MODE)
+            with open(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            portable.rename(fn, cpath)
+            fn = None
+        except (EnvironmentError, apx.ApiException) as e:
+            self.__log(
+                "Unable to cache compressed attributes for "
+                "{0}: {1}".format(fhash, e)
+            )
+        finally:
+            if fn and os.path.exists(fn):
+                os.unlink(fn)
+
+    def __remove_cattrs(self, fhash):
+        """Discards any cached compressed attributes for the file named
+        'fhash'."""
+
+        cpath = self.__cattrs_path(fhash)
+        if not cpath:
+            return
+        try:
+            portable.remove(cpath)
+        except EnvironmentError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def file_compressed_attrs(self, fhash, chash_attrs=None):
+        """Returns a tuple of the form (csize, chashes) for the file
+        specified by the provided hash name, where 'csize' is the size
+        of the compressed payload and 'chashes' is a dictionary of the
+        hashes of the compressed payload keyed by attribute name.
+
+        The values are cached per-repository store so that they only
+        need to be computed once for each payload.
+
+        'chash_attrs' is an optional list of the chash attributes to
+        return; if not provided, digest.DEFAULT_CHASH_ATTRS is used."""
+
+        if chash_attrs is None:
+            chash_attrs = digest.DEFAULT_CHASH_ATTRS
+
+        fpath = self.file(fhash)
+        try:
+            fst = os.stat(fpath)
+        except EnvironmentError as e:
+            if e.errno == errno.ENOENT:
+                raise RepositoryFileNotFoundError(fhash)
+            raise apx._convert_error(e)
+
+        cattrs = self.__load_cattrs(fhash, fst, chash_attrs)
+        if cattrs is not None:
+            return cattrs
+
+        csize, chashes = misc.compute_compressed_attrs(
+            fhash, file_path=fpath, chash_attrs=chash_attrs
+        )
+        self.__store_cattrs(fhash, fst, csize, chashes)
+        return csize, chashes
+
     def get_publisher(self):
         """Return the Publisher object for this storage object or None
         if not available.
@@ -1627,44 +2136,63 @@ class _RepoStore(object):
         if not self.index_root:
             raise RepositoryUnsupportedOperationError()
 
-        # Acquire only the thread-lock.  The Indexer has its own
-        # process lock.  This allows indexing and publication to occur
-        # simultaneously.
-        self.__lock_rstore(process=False)
+        # The thread-lock is only held while the packages in the
+        # catalog are listed.  The index is then updated while holding
+        # only the index lock (the Indexer has its own process lock) so
+        # that packages can be published while indexing is in progress.
+        # Searches continue to use the existing index until the updated
+        # one has been moved into place.
+        self.__lock_rstore(blocking=True, process=False)
         try:
+            fmris = list(self.catalog.fmris())
+        finally:
+            self.__unlock_rstore()
+
+        try:
+            if not self.__index_lock.acquire(blocking=False):
+                # Another thread is already updating the index.
+                raise RepositoryLockedError()
+            rebuild = False
             try:
+                self.__refresh_index(fmris=fmris)
+            except se.InconsistentIndexException as e:
+                s = _(
+                    "Index corrupted or out of date. "
+                    "Removing old index directory ({0}) "
+                    " and rebuilding search "
+                    "indexes."
+                ).format(e.cause)
+                self.__log(s, "INDEX")
+                rebuild = True
+            except se.IndexingException as e:
+                self.__log(str(e), "INDEX")
+            finally:
+                self.__index_lock.release()
+
+            if rebuild:
+                self.__lock_rstore(blocking=True, process=False)
                 try:
-                    self.__refresh_index()
-                except se.InconsistentIndexException as e:
-                    s = _(
-                        "Index corrupted or out of date. "
-                        "Removing old index directory ({0}) "
-                        " and rebuilding search "
-                        "indexes."
-                    ).format(e.cause)
-                    self.__log(s, "INDEX")
-                    try:
-                        self.__rebuild(build_catalog=False, build_index=True)
-                    except se.IndexingException as e:
-                        self.__log(str(e), "INDEX")
+                    self.__rebuild(build_catalog=False, build_index=True)
                 except se.IndexingException as e:
                     self.__log(str(e), "INDEX")
-            except EnvironmentError as e:
-                if e.errno in (errno.EACCES, errno.EROFS):
-                    if self.writable_root:
-                        raise RepositoryError(
-                            _(
-                                "writable root not "
-                                "writable by current user "
-                                "id or group."
-                            )
-                        )
+                finally:
+                    self.__unlock_rstore()
+        except EnvironmentError as e:
+            if e.errno in (errno.EACCES, errno.EROFS):
+                if self.writable_root:
                     raise RepositoryError(
-                        _("unable to write to index directory.")
+                        _(
+                            "writable root not "
+                            "writable by current user "
+                            "id or group."
+                        )
                     )
-                raise
+                raise RepositoryError(_("unable to write to index directory."))
+            raise
         finally:
-            self.__unlock_rstore()
+            # Discard cached search data so that subsequent searches
+            # use the updated index.
+            self.reset_search()
 
     def remove_packages(self, packages, progtrack=None):
         """Removes the specified packages from the repository store.  No
@@ -1715,7 +2243,8 @@ class _RepoStore(object):
             # as soon as the catalog is updated.
             progtrack.job_start(progtrack.JOB_REPO_DELSEARCH)
             progtrack.job_add_progress(progtrack.JOB_REPO_DELSEARCH)
-            self.__purge_search_index()
+            with self.__index_lock:
+                self.__purge_search_index()
             progtrack.job_add_progress(progtrack.JOB_REPO_DELSEARCH)
             progtrack.job_done(progtrack.JOB_REPO_DELSEARCH)
 
@@ -1743,6 +2272,7 @@ class _RepoStore(object):
                 # package had to be removed from it.
                 c.finalize(pfmris=packages)
                 c.save()
+                self.__compress_catalog(self.catalog_root)
 
             progtrack.job_done(progtrack.JOB_REPO_UPDATE_CAT)
 
@@ -1856,6 +2386,7 @@ class _RepoStore(object):
                 fpath = self.cache_store.lookup(h)
                 if fpath is not None:
                     portable.remove(fpath)
+                self.__remove_cattrs(h)
                 progtrack.job_add_progress(progtrack.JOB_REPO_RM_FILES)
             progtrack.job_done(progtrack.JOB_REPO_RM_FILES)
 
@@ -1888,7 +2419,7 @@ class _RepoStore(object):
             c.batch_mode = False
             self.__unlock_rstore()
 
-    def rebuild(self, build_catalog=True, build_index=False):
+    def rebuild(self, build_catalog=True, build_index=False, jobs=1):
         """Rebuilds the repository catalog and search indexes using the
         package manifests currently in the repository.
 
@@ -1898,6 +2429,9 @@ class _RepoStore(object):
 
         'build_index' is an optional boolean value indicating whether
         search indexes should be built.
+
+        'jobs' is an optional number of worker processes to use to
+        parse package manifests when rebuilding package catalogs.
         """
 
         if self.mirror:
@@ -1909,14 +2443,18 @@ class _RepoStore(object):
 
         self.__lock_rstore()
         try:
-            self.__rebuild(build_catalog=build_catalog, build_index=build_index)
+            self.__rebuild(
+                build_catalog=build_catalog, build_index=build_index, jobs=jobs
+            )
         finally:
             self.__unlock_rstore()
 
-    def __run_update_index(self):
+    def __run_update_index(self, c):
         """Determines which fmris need to be indexed and passes them
         to the indexer.
 
+        'c' is the catalog, or a list of the FMRIs in it.
+
         Note: Only one instance of this method should be running.
         External locking is expected to ensure this behavior. Calling
         refresh index is the preferred method to use to reindex.
@@ -1927,7 +2465,6 @@ class _RepoStore(object):
         if not self.index_root or self.catalog_version < 1:
             raise RepositoryUnsupportedOperationError()
 
-        c = self.catalog
         fmris_to_index = indexer.Indexer.check_for_updates(self.index_root, c)
 
         if fmris_to_index:
@@ -1960,22 +2497,16 @@ class _RepoStore(object):
         if not self.search_available:
             raise RepositorySearchUnavailableError()
 
+        # The query engine is long-lived so that query parsers and
+        # the postings of frequently searched tokens are reused
+        # between requests; it is reset whenever the index changes.
+        engine = self.__query_engine
+        if engine is None or engine.index_dir != self.index_root:
+            engine = self.__query_engine = sqp.QueryEngine(self.index_root)
+
         def _search(q):
             assert self.index_root
-            l = sqp.QueryLexer()
-            l.build()
-            qqp = sqp.QueryParser(l)
-            query = qqp.parse(q.text)
-            query.set_info(
-                num_to_return=q.num_to_return,
-                start_point=q.start_point,
-                index_dir=self.index_root,
-                get_manifest_path=self.manifest,
-                case_sensitive=q.case_sensitive,
-            )
-            if q.return_type == sqp.Query.RETURN_PACKAGES:
-                query.propagate_pkg_return()
-            return query.search(self.catalog.fmris)
+            return engine.search(q, self.catalog.fmris, self.manifest)
 
         query_lst = []
         try:
@@ -2115,6 +2646,17 @@ class _RepoStore(object):
                 "permissions is shown."
             ).format(reason["pub"])
             del reason["pub"]
+        elif error == REPO_VERIFY_WARN_RESUMED:
+            # This message constitutes a warning rather than an
+            # error; the packages are not known to be faulty.
+            message = _("Verification resumed.")
+            reason["err"] = _(
+                "{count:d} package(s) for publisher '{pub}' found to be "
+                "intact by an earlier verification that was interrupted "
+                "were not verified again."
+            ).format(**reason)
+            del reason["pub"]
+            del reason["count"]
         else:
             raise Exception(
                 "Unknown repository verify error code: {0}".format(error)
@@ -2350,11 +2892,138 @@ class _RepoStore(object):
                     return False, pth
         return True, None
 
+    def __verify_payload(self, pfmri, hashes):
+        """Verify the payload files delivered by the given package,
+        returning a list of the errors found.  'hashes' is the set of
+        (fname, hash, hash function) tuples returned by
+        __get_hashes()."""
+
+        errors = []
+        for fname, h, alg in hashes:
+            try:
+                path = self.cache_store.lookup(fname, check_existence=False)
+            except apx.PermissionsException as e:
+                # if we can't even get the path
+                # within the repository, then
+                # we'll do the best we can to
+                # report the problem.
+                errors.append(
+                    (
+                        REPO_VERIFY_PERM,
+                        pfmri,
+                        {
+                            "hash": fname,
+                            "err": _("Permission denied.", "path", h),
+                        },
+                    )
+                )
+                continue
+
+            err = self.__verify_perm(path, pfmri, h)
+            if err:
+                # For backward compatibility,
+                # store the SHA1 file name for
+                # file retrieval.
+                err[2]["fname"] = fname
+                errors.append(err)
+                continue
+            err = self.__verify_hash(path, pfmri, h, alg=alg)
+            if err:
+                err[2]["fname"] = fname
+                errors.append(err)
+        return errors
+
+    def __get_verify_checkpoint(self):
+        """Return the path of the file used to record the packages
+        which have been verified, or None if there is nowhere to store
+        it."""
+
+        if not self.__tmp_root:
+            return None
+        return os.path.join(self.__tmp_root, VERIFY_CHECKPOINT)
+
+    def __load_verify_checkpoint(self):
+        """Return the set of (mtime, manifest path) tuples for the
+        packages found to be intact by an earlier verification that
+        did not complete."""
+
+        done = set()
+        cpath = self.__get_verify_checkpoint()
+        if not cpath:
+            return done
+
+        try:
+            with open(cpath, "r", encoding="utf-8") as f:
+                for line in f:
+                    # The last line is incomplete if the
+                    # verification was interrupted while
+                    # writing it.
+                    if not line.endswith("\n"):
+                        break
+                    try:
+                        mtime, mpath = line.rstrip("\n").split(" ", 1)
+                        done.add((int(mtime), mpath))
+                    except ValueError:
+                        continue
+        except EnvironmentError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        return done
+
+    def __open_verify_checkpoint(self, resume):
+        """Open the verification checkpoint file for writing, returning
+        None if the repository cannot be written to.  If 'resume' is
+        True, existing records are preserved."""
+
+        cpath = self.__get_verify_checkpoint()
+        if not cpath:
+            return None
+
+        try:
+            if not os.path.exists(self.__tmp_root):
+                os.makedirs(self.__tmp_root, misc.PKG_DIR_MODE)
+            f = open(cpath, "a" if resume else "w", encoding="utf-8")
+            os.chmod(cpath, misc.PKG_FILE_MODE)
+            return f
+        except EnvironmentError as e:
+            if e.errno in (errno.EACCES, errno.EPERM, errno.EROFS):
+                # The verification can't be resumed if
+                # interrupted, but otherwise proceeds as
+                # normal.
+                return None
+            raise
+
+    def __remove_verify_checkpoint(self):
+        """Remove the verification checkpoint file, if any."""
+
+        cpath = self.__get_verify_checkpoint()
+        if not cpath:
+            return
+        try:
+            portable.remove(cpath)
+        except EnvironmentError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
     def __gen_verify(
-        self, progtrack, pub, trust_anchors, sig_required_names, use_crls
+        self,
+        progtrack,
+        pub,
+        trust_anchors,
+        sig_required_names,
+        use_crls,
+        jobs=1,
+        resume=False,
     ):
         """A generator that produces verify errors, each a tuple
-        of the form (error_code, path, message, details)"""
+        of the form (error_code, path, message, details)
+
+        'jobs' is the number of threads used to verify package
+        payloads.
+
+        'resume' indicates whether packages recorded as intact by an
+        earlier, interrupted verification should be skipped; if any
+        are, a REPO_VERIFY_WARN_RESUMED warning is produced."""
         # We may not have a manifest_root directory if no
         # packages have ever been published for this publisher.
         if not os.path.exists(self.manifest_root):
@@ -2403,116 +3072,151 @@ class _RepoStore(object):
             )
         progtrack.repo_verify_end_pkg(None)
 
-        for name in mflist:
-            pdir = os.path.join(self.manifest_root, name)
-            err = self.__verify_perm(pdir, None, None)
-            if err:
+        # Packages found to be intact by an earlier, interrupted
+        # verification are not checked again.
+        done = set()
+        if resume:
+            done = self.__load_verify_checkpoint()
+        ckpt = self.__open_verify_checkpoint(resume)
+        skipped = 0
+
+        # Payload verification is by far the most expensive part of
+        # the operation, so if requested, it is performed by a pool of
+        # worker threads while the manifests of the following packages
+        # are examined.  Results are reported in the order the
+        # packages were found, with the number of packages in flight
+        # bounded to limit memory use.
+        executor = None
+        if jobs > 1:
+            executor = ThreadPoolExecutor(max_workers=jobs)
+        pending = deque()
+
+        def finish_pkg():
+            pfmri, errors, future, key = pending.popleft()
+            if future:
+                errors.extend(future.result())
+            progtrack.repo_verify_start_pkg(pfmri)
+            for err in errors:
                 yield self.__build_verify_error(*err)
-                continue
+            progtrack.repo_verify_end_pkg(pfmri)
+            if ckpt and key and not errors:
+                ckpt.write("{0} {1}\n".format(*key))
+                ckpt.flush()
 
-            # Stem must be decoded before use.
-            try:
-                pname = unquote(name)
-            except Exception:
-                # Assume error is result of an
-                # unexpected file in the directory. We
-                # don't know the FMRI here, so use None.
-                progtrack.repo_verify_start_pkg(None)
-                progtrack.repo_verify_add_progress(None)
-                yield self.__build_verify_error(
-                    REPO_VERIFY_UNKNOWN, pdir, {"err": str(e)}
-                )
-                progtrack.repo_verify_end_pkg(None)
-                continue
+        try:
+            for name in mflist:
+                pdir = os.path.join(self.manifest_root, name)
+                err = self.__verify_perm(pdir, None, None)
+                if err:
+                    while pending:
+                        yield from finish_pkg()
+                    yield self.__build_verify_error(*err)
+                    continue
 
-            for ver in os.listdir(pdir):
-                path = os.path.join(pdir, ver)
-                # Version must be decoded before
-                # use.
-                pver = unquote(ver)
+                # Stem must be decoded before use.
                 try:
-                    pfmri = fmri.PkgFmri(
-                        "@".join((pname, pver)), publisher=self.publisher
-                    )
-                    if not os.path.isfile(path):
-                        raise Exception("{0} is not a file".format(path))
+                    pname = unquote(name)
                 except Exception as e:
-                    # Assume the error is result of an
+                    # Assume error is result of an
                     # unexpected file in the directory. We
                     # don't know the FMRI here, so use None.
+                    while pending:
+                        yield from finish_pkg()
                     progtrack.repo_verify_start_pkg(None)
                     progtrack.repo_verify_add_progress(None)
                     yield self.__build_verify_error(
-                        REPO_VERIFY_UNKNOWN, path, {"err": str(e)}
+                        REPO_VERIFY_UNKNOWN, pdir, {"err": str(e)}
                     )
                     progtrack.repo_verify_end_pkg(None)
                     continue
 
-                progtrack.repo_verify_start_pkg(pfmri)
-                err = self.__verify_manifest(path, pfmri)
-                if err:
-                    # with a bad manifest, we can go no
-                    # further
-                    yield self.__build_verify_error(*err)
-                    progtrack.repo_verify_end_pkg(None)
-                    continue
+                for ver in os.listdir(pdir):
+                    path = os.path.join(pdir, ver)
+                    # Version must be decoded before
+                    # use.
+                    pver = unquote(ver)
+                    try:
+                        pfmri = fmri.PkgFmri(
+                            "@".join((pname, pver)), publisher=self.publisher
+                        )
+                        if not os.path.isfile(path):
+                            raise Exception("{0} is not a file".format(path))
+                    except Exception as e:
+                        # Assume the error is result of an
+                        # unexpected file in the directory. We
+                        # don't know the FMRI here, so use None.
+                        while pending:
+                            yield from finish_pkg()
+                        progtrack.repo_verify_start_pkg(None)
+                        progtrack.repo_verify_add_progress(None)
+                        yield self.__build_verify_error(
+                            REPO_VERIFY_UNKNOWN, path, {"err": str(e)}
+                        )
+                        progtrack.repo_verify_end_pkg(None)
+                        continue
 
-                hashes, errors = self.__get_hashes(path, pfmri)
-                for err in errors:
-                    yield self.__build_verify_error(*err)
+                    key = (
+                        os.stat(path).st_mtime_ns,
+                        os.path.join(name, ver),
+                    )
+                    if key in done:
+                        pending.append((pfmri, [], None, None))
+                        skipped += 1
+                    else:
+                        err = self.__verify_manifest(path, pfmri)
+                        if err:
+                            # with a bad manifest, we can go no
+                            # further
+                            while pending:
+                                yield from finish_pkg()
+                            progtrack.repo_verify_start_pkg(pfmri)
+                            yield self.__build_verify_error(*err)
+                            progtrack.repo_verify_end_pkg(None)
+                            continue
 
-                # verify manifest signatures
-                errs = self.__verify_signature(
-                    path,
-                    pfmri,
-                    pub,
-                    trust_anchors,
-                    sig_required_names,
-                    use_crls,
-                )
-                for err in errs:
-                    yield self.__build_verify_error(*err)
+                        hashes, errors = self.__get_hashes(path, pfmri)
 
-                # verify payload delivered by this pkg
-                errors = []
-                for fname, h, alg in hashes:
-                    try:
-                        path = self.cache_store.lookup(
-                            fname, check_existence=False
-                        )
-                    except apx.PermissionsException as e:
-                        # if we can't even get the path
-                        # within the repository, then
-                        # we'll do the best we can to
-                        # report the problem.
-                        errors.append(
-                            (
-                                REPO_VERIFY_PERM,
+                        # verify manifest signatures
+                        errors.extend(
+                            self.__verify_signature(
+                                path,
                                 pfmri,
-                                {
-                                    "hash": fname,
-                                    "err": _("Permission denied.", "path", h),
-                                },
+                                pub,
+                                trust_anchors,
+                                sig_required_names,
+                                use_crls,
                             )
                         )
-                        continue
 
-                    err = self.__verify_perm(path, pfmri, h)
-                    if err:
-                        # For backward compatibility,
-                        # store the SHA1 file name for
-                        # file retrieval.
-                        err[2]["fname"] = fname
-                        errors.append(err)
-                        continue
-                    err = self.__verify_hash(path, pfmri, h, alg=alg)
-                    if err:
-                        err[2]["fname"] = fname
-                        errors.append(err)
-                for err in errors:
-                    yield self.__build_verify_error(*err)
+                        # verify payload delivered by this pkg
+                        future = None
+                        if executor:
+                            future = executor.submit(
+                                self.__verify_payload, pfmri, hashes
+                            )
+                        else:
+                            errors.extend(self.__verify_payload(pfmri, hashes))
+                        pending.append((pfmri, errors, future, key))
+
+                    if len(pending) > jobs * 2:
+                        yield from finish_pkg()
 
-                progtrack.repo_verify_end_pkg(fmri)
+            while pending:
+                yield from finish_pkg()
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+            if ckpt:
+                ckpt.close()
+
+        # The verification completed, so there is nothing to resume.
+        self.__remove_verify_checkpoint()
+        if skipped:
+            yield self.__build_verify_error(
+                REPO_VERIFY_WARN_RESUMED,
+                None,
+                {"count": skipped, "pub": pub.prefix},
+            )
         progtrack.job_done(progtrack.JOB_REPO_VERIFY_REPO)
 
     def verify(
@@ -2522,6 +3226,8 @@ class _RepoStore(object):
         trust_anchor_dir=None,
         sig_required_names=None,
         use_crls=False,
+        jobs=1,
+        resume=False,
     ):
         """A generator which verifies the contents of the repository
         store, checking for several different types of errors.
@@ -2529,6 +3235,14 @@ class _RepoStore(object):
 
         'progtrack' is an optional ProgressTracker object.
 
+        'jobs' is the number of threads used to verify package
+        payloads.
+
+        'resume' indicates whether packages found to be intact by an
+        earlier verification that was interrupted should be skipped.
+        The packages verified are recorded as the verification
+        progresses, and the record is removed once it completes.
+
         'trust_anchor_dir' is set in the repository configuration and
         corresponds to the image property of the same name.
 
@@ -2570,7 +3284,13 @@ class _RepoStore(object):
         self.__lock_rstore()
         try:
             for err in self.__gen_verify(
-                progtrack, pub, trust_anchors, sig_required_names, use_crls
+                progtrack,
+                pub,
+                trust_anchors,
+                sig_required_names,
+                use_crls,
+                jobs=jobs,
+                resume=resume,
             ):
                 yield err
         except (Exception, EnvironmentError) as e:
@@ -2631,7 +3351,7 @@ class _RepoStore(object):
                 verify_callback(progtrack, (error, path, message, reason))
             # we don't attempt to fix this error, since it can
             # involve paths outside the repository.
-            if error == REPO_VERIFY_WARN_OPENPERMS:
+            if error in (REPO_VERIFY_WARN_OPENPERMS, REPO_VERIFY_WARN_RESUMED):
                 continue
             fmri = reason.get("pkg")
             broken_items.add((path, fmri))
@@ -2754,6 +3474,19 @@ class _RepoStore(object):
         entry = c.get_entry(pfmri)
         return entry is not None
 
+    @property
+    def cattrs_root(self):
+        """The directory used to cache the compressed attributes of
+        file payloads, laid out in the same fashion as the file root."""
+
+        if self.writable_root:
+            return os.path.join(self.writable_root, "cattrs")
+        if self.root:
+            return os.path.join(self.root, "cattrs")
+        if self.file_root:
+            return os.path.join(os.path.dirname(self.file_root), "cattrs")
+        return None
+
     catalog_root = property(lambda self: self.__catalog_root)
     file_layout = property(lambda self: self.__file_layout)
     file_root = property(lambda self: self.__file_root)
@@ -3351,6 +4084,18 @@ class Repository(object):
         rstore = self.get_pub_rstore(pub)
         return rstore.catalog_1(name)
 
+    def catalog_generation(self, pub=None):
+        """Returns a value which changes whenever the catalog data for
+        the specified publisher is saved or reloaded.  Values are never
+        reused, so the value can be used to determine whether data
+        derived from the catalog is still current.
+
+        'pub' is the prefix of the publisher to return the value for.
+        If not specified, the default publisher will be used.
+        """
+
+        return self.get_pub_rstore(pub).catalog_generation
+
     def close(self, trans_id, add_to_catalog=True):
         """Closes the transaction specified by 'trans_id'.
 
@@ -3390,6 +4135,31 @@ class Repository(object):
         # Not found in any repository store.
         raise RepositoryFileNotFoundError(fhash)
 
+    def file_compressed_attrs(self, fhash, pub=None, chash_attrs=None):
+        """Returns a tuple of the form (csize, chashes) describing the
+        compressed payload of the file specified by the provided hash
+        name.  See _RepoStore.file_compressed_attrs() for details.
+
+        'pub' is the prefix of the publisher to return file data for.
+        If not specified, every repository store is tried in turn.
+        """
+
+        if pub:
+            rstore = self.get_pub_rstore(pub)
+            return rstore.file_compressed_attrs(fhash, chash_attrs=chash_attrs)
+
+        for rstore in self.rstores:
+            try:
+                return rstore.file_compressed_attrs(
+                    fhash, chash_attrs=chash_attrs
+                )
+            except RepositoryFileNotFoundError:
+                # Ignore and try next repository store.
+                pass
+
+        # Not found in any repository store.
+        raise RepositoryFileNotFoundError(fhash)
+
     def get_catalog(self, pub=None):
         """Return the catalog object for the given publisher.
 
@@ -3800,7 +4570,7 @@ class Repository(object):
         rstore = self.get_trans_rstore(trans_id)
         return rstore.add_manifest(trans_id, data=data)
 
-    def rebuild(self, build_catalog=True, build_index=False, pub=None):
+    def rebuild(self, build_catalog=True, build_index=False, pub=None, jobs=1):
         """Rebuilds the repository catalog and search indexes using the
         package manifests currently in the repository.
 
@@ -3810,6 +4580,9 @@ class Repository(object):
 
         'build_index' is an optional boolean value indicating whether
         search indexes should be built.
+
+        'jobs' is an optional number of worker processes to use to
+        parse package manifests when rebuilding package catalogs.
         """
 
         for rstore in self.rstores:
@@ -3817,7 +4590,9 @@ class Repository(object):
                 continue
             if pub and rstore.publisher and rstore.publisher != pub:
                 continue
-            rstore.rebuild(build_catalog=build_catalog, build_index=build_index)
+            rstore.rebuild(
+                build_catalog=build_catalog, build_index=build_index, jobs=jobs
+            )
 
     def reload(self):
         """Reloads the repository state information."""
@@ -3894,12 +4669,20 @@ class Repository(object):
         force_dep_check=False,
         ignored_dep_files=[],
         progtrack=None,
+        jobs=1,
+        resume=False,
     ):
         """A generator that verifies that repository content matches
         expected state for all or specified publishers.
 
         'progtrack' is an optional ProgressTracker object.
 
+        'jobs' is the number of threads used to verify package
+        payloads.
+
+        'resume' indicates whether packages found to be intact by an
+        earlier verification that was interrupted should be skipped.
+
         'pubs' is an optional publisher list to limit the
         operation to.
 
@@ -3946,6 +4729,8 @@ class Repository(object):
                 trust_anchor_dir=trust_anchor_dir,
                 sig_required_names=sig_required_names,
                 use_crls=use_crls,
+                jobs=jobs,
+                resume=resume,
             ):
                 yield verify_tuple
 
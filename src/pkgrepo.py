@@ -178,8 +178,8 @@ Subcommands:
      pkgrepo contents [-m] [-t action_type ...] -s repo_uri_or_path
          [--key ssl_key ... --cert ssl_cert ...] [pkg_fmri_pattern ...]
 
-     pkgrepo rebuild [-p publisher ...] -s repo_uri_or_path [--key ssl_key ...
-         --cert ssl_cert ...] [--no-catalog] [--no-index]
+     pkgrepo rebuild [-j jobs] [-p publisher ...] -s repo_uri_or_path
+         [--key ssl_key ... --cert ssl_cert ...] [--no-catalog] [--no-index]
 
      pkgrepo refresh [-p publisher ...] -s repo_uri_or_path [--key ssl_key ...
          --cert ssl_cert ...] [--no-catalog] [--no-index]
@@ -191,8 +191,9 @@ Subcommands:
          section/property[+|-]=[value] ... or
          section/property[+|-]=([value]) ...
 
-     pkgrepo verify [-d] [-p publisher ...] [-i ignored_dep_file ...]
-         [--disable verification ...] -s repo_uri_or_path
+     pkgrepo verify [-d] [-j jobs] [-p publisher ...]
+         [-i ignored_dep_file ...] [--disable verification ...] [--resume]
+         -s repo_uri_or_path
 
      pkgrepo fix [-v] [-p publisher ...] -s repo_uri_or_path
 
@@ -1390,7 +1391,7 @@ were found in the repository."""
     return rval
 
 
-def __rebuild_local(subcommand, conf, pubs, build_catalog, build_index):
+def __rebuild_local(subcommand, conf, pubs, build_catalog, build_index, jobs):
     """In an attempt to allow operations on potentially corrupt
     repositories, 'local' repositories (filesystem-basd ones) are handled
     separately."""
@@ -1419,7 +1420,10 @@ def __rebuild_local(subcommand, conf, pubs, build_catalog, build_index):
     logger.info("Initiating repository rebuild.")
     for pfx in found:
         repo.rebuild(
-            build_catalog=build_catalog, build_index=build_index, pub=pfx
+            build_catalog=build_catalog,
+            build_index=build_index,
+            pub=pfx,
+            jobs=jobs,
         )
 
     return rval
@@ -1459,13 +1463,24 @@ def subcmd_rebuild(conf, args):
     build_index = True
     key = None
     cert = None
+    jobs = 1
 
     opts, pargs = getopt.getopt(
-        args, "p:s:", ["no-catalog", "no-index", "key=", "cert="]
+        args, "j:p:s:", ["no-catalog", "no-index", "key=", "cert="]
     )
     pubs = set()
     for opt, arg in opts:
-        if opt == "-p":
+        if opt == "-j":
+            try:
+                jobs = int(arg)
+                if jobs < 0:
+                    raise ValueError()
+            except ValueError:
+                usage(
+                    _("The -j option requires a non-negative integer."),
+                    cmd=subcommand,
+                )
+        elif opt == "-p":
             if not misc.valid_pub_prefix(arg):
                 error(
                     _("Invalid publisher prefix '{0}'").format(arg),
@@ -1499,7 +1514,12 @@ def subcmd_rebuild(conf, args):
 
     if conf["repo_uri"].scheme == "file":
         return __rebuild_local(
-            subcommand, conf, pubs, build_catalog, build_index
+            subcommand,
+            conf,
+            pubs,
+            build_catalog,
+            build_index,
+            misc.get_worker_count(jobs),
         )
 
     return __rebuild_remote(
@@ -1830,7 +1850,7 @@ def __fmt_verify(verify_tuple):
         reason_keys = ["pkg", "path", "err"]
     elif error == sr.REPO_VERIFY_DEPENDERROR:
         reason_keys = ["pkg", "depend", "type"]
-    elif error == sr.REPO_VERIFY_WARN_OPENPERMS:
+    elif error in (sr.REPO_VERIFY_WARN_OPENPERMS, sr.REPO_VERIFY_WARN_RESUMED):
         formatted_message = "{error_type:>16}: {message}\n".format(
             error_type=verify_warning_header, message=message
         )
@@ -1866,7 +1886,7 @@ def __fmt_verify(verify_tuple):
 
     formatted_message += "\n"
 
-    if error == sr.REPO_VERIFY_WARN_OPENPERMS:
+    if error in (sr.REPO_VERIFY_WARN_OPENPERMS, sr.REPO_VERIFY_WARN_RESUMED):
         return formatted_message, None
     elif "depend" in reason:
         return formatted_message, reason["depend"]
@@ -1895,14 +1915,26 @@ def subcmd_verify(conf, args):
     subcommand = "verify"
     __load_verify_msgs()
 
-    opts, pargs = getopt.getopt(args, "dp:s:i:", ["disable="])
+    opts, pargs = getopt.getopt(args, "dj:p:s:i:", ["disable=", "resume"])
     allowed_checks = set(sr.verify_default_checks)
     force_dep_check = False
     ignored_dep_files = []
+    jobs = 1
     pubs = set()
+    resume = False
     for opt, arg in opts:
         if opt == "-s":
             conf["repo_uri"] = parse_uri(arg)
+        elif opt == "-j":
+            try:
+                jobs = int(arg)
+                if jobs < 0:
+                    raise ValueError()
+            except ValueError:
+                usage(
+                    _("The -j option requires a non-negative integer."),
+                    cmd=subcommand,
+                )
         elif opt == "-p":
             if not misc.valid_pub_prefix(arg):
                 error(
@@ -1927,6 +1959,8 @@ def subcmd_verify(conf, args):
                 )
         elif opt == "-i":
             ignored_dep_files.append(arg)
+        elif opt == "--resume":
+            resume = True
 
     if pargs:
         usage(_("command does not take operands"), cmd=subcommand)
@@ -1993,6 +2027,8 @@ def subcmd_verify(conf, args):
         force_dep_check=force_dep_check,
         ignored_dep_files=ignored_dep_files,
         progtrack=progtrack,
+        jobs=misc.get_worker_count(jobs),
+        resume=resume,
     ):
         report_error(verify_tuple)
 
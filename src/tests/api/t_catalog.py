@@ -1180,6 +1180,136 @@ class TestCatalog(pkg5unittest.Pkg5TestCase):
                 fname.startswith("catalog.") or fname.startswith("update.")
             )
 
+    def test_11_part_index(self):
+        """Verify that package lookups using a catalog part's binary
+        index match those of the fully loaded part, and that an index
+        which no longer matches its part is ignored."""
+
+        cpath = self.create_test_dir("test-11")
+        self.c.meta_root = cpath
+        self.c.save()
+
+        base = os.path.join(cpath, "catalog.base.C")
+        self.assertTrue(os.path.isfile(base + ".idx"))
+
+        def lookups(part):
+            res = []
+            for f in self.c.fmris():
+                res.append(part.get_entry(f))
+                res.append(list(part.fmris_by_version(f.pkg_name)))
+                res.append(
+                    list(
+                        part.entries_by_version(f.pkg_name, pubs=[f.publisher])
+                    )
+                )
+            res.append(list(part.fmris_by_version("nosuchpkg")))
+            res.append(
+                part.get_entry(pub="extra", stem="nosuchpkg", ver="1.0,5.11-1")
+            )
+            return res
+
+        full = catalog.CatalogPart("catalog.base.C", meta_root=cpath)
+        full.load()
+        expected = lookups(full)
+
+        # Lookups shouldn't require the part to be loaded.
+        part = catalog.CatalogPart("catalog.base.C", meta_root=cpath)
+        self.assertEqual(lookups(part), expected)
+        self.assertFalse(part.loaded)
+
+        # Change the part behind the index's back; the index must be
+        # ignored, and only regenerated when the part is saved.
+        with open(base, "r") as f:
+            data = json.load(f)
+        del data["opensolaris.org"]["test"]
+        data.pop("_SIGNATURE", None)
+        with open(base, "w") as f:
+            json.dump(data, f)
+
+        part = catalog.CatalogPart("catalog.base.C", meta_root=cpath)
+        self.assertEqual(list(part.fmris_by_version("test")), [])
+        self.assertTrue(part.loaded)
+
+        part = catalog.CatalogPart("catalog.base.C", meta_root=cpath)
+        self.assertEqual(list(part.fmris_by_version("test")), [])
+        self.assertTrue(part.loaded)
+        part.save()
+
+        part = catalog.CatalogPart("catalog.base.C", meta_root=cpath)
+        self.assertEqual(list(part.fmris_by_version("test")), [])
+        self.assertEqual(lookups(part)[-2:], expected[-2:])
+        self.assertFalse(part.loaded)
+
+        # Loading the part doesn't write a missing index.
+        portable.remove(base + ".idx")
+        part = catalog.CatalogPart("catalog.base.C", meta_root=cpath)
+        part.load()
+        self.assertFalse(os.path.exists(base + ".idx"))
+        part.save()
+        self.assertTrue(os.path.isfile(base + ".idx"))
+
+        # The index is removed along with the part.
+        part.destroy()
+        self.assertFalse(os.path.exists(base + ".idx"))
+
+    def test_12_save_modified(self):
+        """Verify that only the catalog attributes and the modified
+        parts and update logs are written when saving modified data
+        only, and that the result is a valid catalog."""
+
+        cpath = self.create_test_dir("test-12")
+        c = catalog.Catalog(meta_root=cpath, log_updates=True)
+        f1 = fmri.PkgFmri(
+            "pkg://opensolaris.org/test@1.0,5.11-1:20000101T120000Z"
+        )
+        c.add_package(f1, manifest=self.__gen_manifest(f1))
+        c.save()
+        self.assertTrue(
+            os.path.isfile(os.path.join(cpath, "catalog.summary.C"))
+        )
+
+        # Adding a package without a manifest only modifies the base
+        # part (and an update log).
+        c = catalog.Catalog(meta_root=cpath, log_updates=True)
+        self.assertEqual(list(c.fmris()), [f1])
+        f2 = fmri.PkgFmri(
+            "pkg://opensolaris.org/test@2.0,5.11-1:20000101T120000Z"
+        )
+        c.add_package(f2)
+
+        npath = self.create_test_dir("test-12-new")
+        c.meta_root = npath
+        c.save(modified_only=True)
+        c.meta_root = cpath
+
+        written = os.listdir(npath)
+        self.assertTrue("catalog.attrs" in written)
+        self.assertTrue("catalog.base.C" in written)
+        self.assertTrue(any(n.startswith("update.") for n in written))
+        for name in written:
+            self.assertFalse(name.startswith("catalog.dependency."), name)
+            self.assertFalse(name.startswith("catalog.summary."), name)
+
+        # Move the new files into place; the catalog must be complete
+        # and its signatures must match.
+        for name in written:
+            portable.rename(
+                os.path.join(npath, name), os.path.join(cpath, name)
+            )
+        c = catalog.Catalog(meta_root=cpath, read_only=True)
+        c.validate(require_signatures=True)
+        self.assertEqual(list(c.fmris(ordered=True)), [f2, f1])
+        entry = c.get_entry(f1, info_needed=[c.DEPENDENCY, c.SUMMARY])
+        self.assertTrue(entry["actions"])
+
+        # Nothing is modified after a load, so only the catalog
+        # attributes are written.
+        c = catalog.Catalog(meta_root=cpath, log_updates=True)
+        list(c.fmris())
+        c.meta_root = npath
+        c.save(modified_only=True)
+        self.assertEqual(os.listdir(npath), ["catalog.attrs"])
+
     def test_legacy_description(self):
         """Test that gen_packages does not traceback when a package
         uses the legacy style of declaring package description metadata."""
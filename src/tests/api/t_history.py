@@ -441,6 +441,65 @@ class TestHistory(pkg5unittest.Pkg5TestCase):
             stat.S_IMODE(os.stat(entry).st_mode), misc.PKG_FILE_MODE
         )
 
+    def test_14_history_index(self):
+        """Verify that history entries are indexed when saved and that
+        entries loaded using the index match those loaded from their XML
+        files."""
+
+        h = self.__h
+        h.client_name = "pkg-test"
+        h.log_operation_start("indexed")
+        h.operation_start_state = self.__ip_before
+        h.operation_end_state = self.__ip_after
+        h.operation_errors.extend(self.__errors)
+        h.log_operation_end()
+
+        def load(entry, index=None):
+            he = history.History(
+                root_dir=h.root_dir, filename=entry, index=index
+            )
+            return (
+                he.client_name,
+                he.client_version,
+                he.client_args,
+                str(he),
+                he.pathname,
+            )
+
+        index = history.HistoryIndex(h.index_path)
+        try:
+            pathname = None
+            for entry in sorted(os.listdir(h.path)):
+                pathname = os.path.join(h.path, entry)
+                self.assertEqual(load(entry), load(entry, index=index))
+            # The last entry was stored in the index when saved.
+            self.assertTrue(index.get(pathname))
+        finally:
+            index.close()
+
+        # A changed XML file is loaded from the file instead of the
+        # index and is then re-indexed.
+        with open(pathname, "r") as f:
+            xml = f.read()
+        with open(pathname, "w") as f:
+            f.write(xml.replace('name="indexed"', 'name="changed"'))
+        index = history.HistoryIndex(h.index_path)
+        try:
+            self.assertEqual(index.get(pathname), None)
+            he = history.History(
+                root_dir=h.root_dir, filename=pathname, index=index
+            )
+            self.assertEqual(he.operation_name, "changed")
+            self.assertTrue(index.get(pathname))
+        finally:
+            index.close()
+
+        # Purging history also discards the index, so only the entry
+        # recording the purge remains.
+        h.purge()
+        with open(os.path.join(h.index_path, history.HISTORY_INDEX)) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -31,8 +31,11 @@ import pkg5unittest
 import unittest
 import pkg.indexer as indexer
 import pkg.search_errors as se
+import pkg.search_storage as ss
 
+import fnmatch
 import os
+import re
 import sys
 import tempfile
 import stat
@@ -122,6 +125,58 @@ class TestIndexer(pkg5unittest.Pkg5TestCase):
                 len(open(os.path.join(ind._tmp_dir, file)).readlines()) <= 1
             )
 
+    def test_token_trigrams(self):
+        """Verify that the trigram index finds every token which matches
+        a glob pattern."""
+
+        toks = sorted(
+            [
+                "libssl.so.1.0.0",
+                "LibSSL",
+                "openssl",
+                "usr/lib/libcrypto.so",
+                "caf\u00e9",
+                "ssh",
+                "sl",
+            ]
+        )
+        offsets = {}
+        data = ss.IndexStoreTrigramDict(ss.TOKEN_TRIGRAMS_FILE)
+        for i, tok in enumerate(toks):
+            offsets[i * 100] = tok
+            data.add_token(tok, i * 100)
+        data.write_dict_file(self.test_root, 3)
+
+        data = ss.IndexStoreTrigramDict(ss.TOKEN_TRIGRAMS_FILE)
+        self.assertEqual(data.open(self.test_root), 3)
+        data.read_dict_file()
+        try:
+            for pat in ("*libssl*", "*ssl*", "lib?sl*", "*CAF*", "*.so*"):
+                trigrams = data.glob_trigrams(pat)
+                self.assertTrue(trigrams)
+                for case_sensitive in (True, False):
+                    flag = 0 if case_sensitive else re.I
+                    match = re.compile(fnmatch.translate(pat), flag).match
+                    expected = set(t for t in toks if match(t))
+                    found = set(
+                        offsets[o]
+                        for o in data.get_offsets(trigrams, case_sensitive)
+                    )
+                    self.assertTrue(expected <= found)
+                    # Only tokens that contain the trigrams are found.
+                    self.assertTrue("ssh" not in found)
+        finally:
+            data.close_file_handle()
+
+        # Patterns without enough literal characters can't use the
+        # trigram index.
+        for pat in ("*", "a*b", "*a[bc]d*"):
+            self.assertEqual(ss.IndexStoreTrigramDict.glob_trigrams(pat), set())
+        # An unterminated set is matched literally.
+        self.assertEqual(
+            ss.IndexStoreTrigramDict.glob_trigrams("*ss[l"), set(["ss[", "s[l"])
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright 2024 OmniOS Community Edition (OmniOSce) Association.
+#
+
+from . import testutils
+
+if __name__ == "__main__":
+    testutils.setup_environment("../../../proto")
+import pkg5unittest
+
+import pycurl
+import unittest
+from unittest import mock
+
+import pkg.client.transport.engine as engine
+
+
+class _Handle(object):
+    """Records the options set on a curl easy handle."""
+
+    def __init__(self):
+        self.opts = {}
+
+    def setopt(self, opt, value):
+        self.opts[opt] = value
+
+    def close(self):
+        pass
+
+
+class _MultiHandle(_Handle):
+    """Records the options set on a curl multi-handle and the easy
+    handles added to it.  No transfer ever completes."""
+
+    last = None
+
+    def __init__(self):
+        _Handle.__init__(self)
+        self.handles = []
+        _MultiHandle.last = self
+
+    def add_handle(self, hdl):
+        self.handles.append(hdl)
+
+    def perform(self):
+        return pycurl.E_MULTI_OK, 0
+
+    def info_read(self):
+        return 0, [], []
+
+    def timeout(self):
+        return 0
+
+
+class TestCurlTransportEngine(pkg5unittest.Pkg5TestCase):
+    def __run(self, http2):
+        """Start a file and a manifest request, in that order, using an
+        engine allowed two connections, and return the engine, its
+        multi-handle and the easy handles used for the requests in the
+        order they were started."""
+
+        with (
+            mock.patch.object(pycurl, "Curl", _Handle),
+            mock.patch.object(pycurl, "CurlMulti", _MultiHandle),
+        ):
+            eng = engine.CurlTransportEngine(None, max_conn=2, http2=http2)
+        mhandle = _MultiHandle.last
+
+        repourl = "https://pkg.example.com/"
+        for name, priority in (("file/1/abc", False), ("manifest/1/foo", True)):
+            eng.add_url(
+                repourl + name,
+                writefunc=lambda data: None,
+                repourl=repourl,
+                priority=priority,
+            )
+        eng.run()
+        return eng, mhandle, mhandle.handles
+
+    def test_http1(self):
+        """Verify that HTTP/1.1 is used without multiplexing by
+        default, and that priority requests are started first."""
+
+        eng, mhandle, (mh, fh) = self.__run(False)
+        self.assertEqual(eng.max_requests, 2)
+        self.assertEqual(mhandle.opts[pycurl.M_PIPELINING], 0)
+        self.assertTrue(b"manifest" in mh.opts[pycurl.URL])
+        self.assertTrue(b"file" in fh.opts[pycurl.URL])
+        for h in (mh, fh):
+            self.assertEqual(
+                h.opts[pycurl.HTTP_VERSION], pycurl.CURL_HTTP_VERSION_1_1
+            )
+            self.assertTrue(getattr(pycurl, "PIPEWAIT", None) not in h.opts)
+
+    def test_http2(self):
+        """Verify that, if libcurl supports it, HTTP/2 is negotiated
+        and requests are multiplexed, with priority requests started
+        first and given a greater stream weight.  Otherwise, HTTP/1.1
+        is used as if HTTP/2 had not been requested."""
+
+        eng, mhandle, (mh, fh) = self.__run(True)
+        if not engine.http2_supported():
+            self.assertEqual(eng.max_requests, 2)
+            self.assertEqual(mhandle.opts[pycurl.M_PIPELINING], 0)
+            for h in (mh, fh):
+                self.assertEqual(
+                    h.opts[pycurl.HTTP_VERSION], pycurl.CURL_HTTP_VERSION_1_1
+                )
+            return
+
+        self.assertEqual(eng.max_requests, 2 * engine.http2_streams_per_conn)
+        self.assertEqual(
+            mhandle.opts[pycurl.M_PIPELINING], pycurl.PIPE_MULTIPLEX
+        )
+        self.assertEqual(mhandle.opts[pycurl.M_MAX_TOTAL_CONNECTIONS], 2)
+
+        self.assertTrue(b"manifest" in mh.opts[pycurl.URL])
+        self.assertTrue(b"file" in fh.opts[pycurl.URL])
+        for h in (mh, fh):
+            self.assertEqual(
+                h.opts[pycurl.HTTP_VERSION], pycurl.CURL_HTTP_VERSION_2TLS
+            )
+            self.assertEqual(h.opts[pycurl.PIPEWAIT], 1)
+        if hasattr(pycurl, "STREAM_WEIGHT"):
+            self.assertEqual(
+                mh.opts[pycurl.STREAM_WEIGHT], engine.http2_priority_weight
+            )
+            self.assertEqual(
+                fh.opts[pycurl.STREAM_WEIGHT], engine.http2_default_weight
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# Vim hints
+# vim:ts=4:sw=4:et:fdm=marker
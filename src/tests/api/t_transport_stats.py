@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+#
+# CDDL HEADER START
+#
+# The contents of this file are subject to the terms of the
+# Common Development and Distribution License (the "License").
+# You may not use this file except in compliance with the License.
+#
+# You can obtain a copy of the license at usr/src/OPENSOLARIS.LICENSE
+# or http://www.opensolaris.org/os/licensing.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+# When distributing Covered Code, include this CDDL HEADER in each
+# file and include the License file at usr/src/OPENSOLARIS.LICENSE.
+# If applicable, add the following below this CDDL HEADER, with the
+# fields enclosed by brackets "[]" replaced with your own identifying
+# information: Portions Copyright [yyyy] [name of copyright owner]
+#
+# CDDL HEADER END
+#
+
+#
+# Copyright 2024 OmniOS Community Edition (OmniOSce) Association.
+#
+
+from . import testutils
+
+if __name__ == "__main__":
+    testutils.setup_environment("../../../proto")
+import pkg5unittest
+
+import unittest
+
+import pkg.client.publisher as publisher
+import pkg.client.transport.stats as stats
+
+
+class TestRepoStats(pkg5unittest.Pkg5TestCase):
+    def __repostats(self):
+        return stats.RepoStats(
+            publisher.TransportRepoURI("https://pkg.example.com/")
+        )
+
+    def test_untuned(self):
+        """Verify that nothing is suggested before any chunks have
+        been recorded."""
+
+        rs = self.__repostats()
+        self.assertEqual(rs.concurrency, None)
+        self.assertEqual(rs.chunk_size, None)
+
+        # Chunks too small to say anything about throughput are
+        # ignored.
+        rs.record_chunk(5, 5000, 1, 0, 20)
+        self.assertEqual(rs.concurrency, None)
+        self.assertEqual(rs.chunk_size, None)
+
+    def test_concurrency(self):
+        """Verify that the concurrency converges on the number of
+        requests giving the best throughput."""
+
+        # Throughput increases with the number of requests up to six
+        # and decreases beyond twelve.
+        def speed(conc):
+            return 10**6 * min(conc, 6) - 2 * 10**5 * max(0, conc - 12)
+
+        rs = self.__repostats()
+        for i in range(10):
+            conc = rs.concurrency or 20
+            rs.record_chunk(200, speed(conc) * 5, 5, 0, 20)
+        self.assertTrue(6 <= rs.concurrency <= 12, rs.concurrency)
+        self.assertTrue(rs.concurrency < 20)
+
+        # Throughput which only increases with the number of requests
+        # keeps the concurrency at the maximum.
+        rs = self.__repostats()
+        for i in range(10):
+            conc = rs.concurrency or 20
+            rs.record_chunk(200, conc * 10**6, 5, 0, 20)
+        self.assertTrue(rs.concurrency >= 15, rs.concurrency)
+
+        # Errors halve the concurrency and the chunk size.
+        conc = rs.concurrency
+        chunk = rs.chunk_size
+        rs.record_chunk(200, 0, 5, 3, 20)
+        self.assertEqual(rs.concurrency, conc // 2)
+        self.assertEqual(rs.chunk_size, chunk // 2)
+
+        # The concurrency never exceeds the engine's maximum.
+        rs.record_chunk(200, 10**9, 1, 0, 4)
+        self.assertTrue(rs.concurrency <= 4)
+
+    def test_chunk_size(self):
+        """Verify that chunks are sized according to the rate at which
+        files are transferred."""
+
+        # A slow repository gets small chunks.
+        rs = self.__repostats()
+        for i in range(5):
+            rs.record_chunk(10, 10000, 100, 0, 1)
+        self.assertEqual(rs.chunk_size, rs.CHUNK_MIN)
+
+        # A fast one gets large chunks.
+        rs = self.__repostats()
+        for i in range(10):
+            rs.record_chunk(1000, 10**9, 1, 0, 20)
+        self.assertEqual(rs.chunk_size, rs.CHUNK_MAX)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+# Vim hints
+# vim:ts=4:sw=4:et:fdm=marker
@@ -31,17 +31,19 @@ if __name__ == "__main__":
 import pkg5unittest
 
 import datetime
+import gzip
 import http.client
 import os
 import shutil
 import sys
+import tarfile
 import tempfile
 import time
 import unittest
 
 from urllib.error import HTTPError, URLError
-from urllib.parse import quote, urljoin
-from urllib.request import urlopen
+from urllib.parse import quote, urlencode, urljoin
+from urllib.request import Request, urlopen
 
 import pkg.client.publisher as publisher
 import pkg.depotcontroller as dc
@@ -246,6 +248,275 @@ class TestPkgDepot(pkg5unittest.SingleDepotTestCase):
         repourl = urljoin(depot_url, "manifest/0/{0}".format(quote(plist[0])))
         urlopen(repourl)
 
+    def test_file_2_head_cattrs(self):
+        """Verify that the compressed attributes returned for file/2
+        HEAD requests are cached by the repository and match the
+        attributes computed from the payload."""
+
+        durl = self.dc.get_depot_url()
+        plist = self.pkgsend_bulk(durl, self.quux10)
+        repo = self.dc.get_repo()
+        rstore = repo.get_pub_rstore()
+        m = rstore._get_manifest(fmri.PkgFmri(plist[0]))
+        fhash = next(m.gen_actions_by_type("file")).hash
+
+        req = Request(urljoin(durl, "file/2/{0}".format(fhash)), method="HEAD")
+        hdrs = dict(urlopen(req).info().items())
+        self.assertTrue("X-Ipkg-Attr-0" in hdrs)
+
+        cpath = os.path.join(rstore.cattrs_root, fhash[0:2], fhash)
+        self.assertTrue(os.path.exists(cpath))
+
+        fpath = repo.file(fhash)
+        expected = misc.compute_compressed_attrs(fhash, file_path=fpath)
+        self.assertEqual(repo.file_compressed_attrs(fhash), expected)
+
+        # A second request must return the same headers.
+        hdrs2 = dict(urlopen(req).info().items())
+        for k in hdrs:
+            if k.startswith("X-Ipkg-Attr-"):
+                self.assertEqual(hdrs[k], hdrs2[k])
+
+    def test_manifest_bulk(self):
+        """Verify that manifest/2 returns the manifests of the requested
+        packages in a tar stream, omitting those that are unknown."""
+
+        durl = self.dc.get_depot_url()
+        plist = self.pkgsend_bulk(durl, (self.quux10, self.info10))
+        repo = self.dc.get_repo()
+        pfmris = [fmri.PkgFmri(p) for p in plist]
+
+        names = [p.get_fmri(anarchy=True, include_scheme=False) for p in pfmris]
+        names.append("nosuchpackage@1.0,5.11-0:20200101T000000Z")
+        data = urlencode(list(enumerate(names))).encode()
+        res = urlopen(urljoin(durl, "manifest/2/"), data=data)
+        self.assertEqual(res.info()["Content-Type"], "application/x-tar")
+
+        found = {}
+        with tarfile.open(mode="r|", fileobj=res) as tar:
+            for ti in tar:
+                found[ti.name] = tar.extractfile(ti).read()
+
+        self.assertEqual(len(found), len(pfmris))
+        for pfmri in pfmris:
+            with open(repo.manifest(pfmri), "rb") as f:
+                self.assertEqual(found[pfmri.get_url_path()], f.read())
+
+        # Only POST is supported, and packages must be specified.
+        for req in (
+            Request(urljoin(durl, "manifest/2/")),
+            Request(urljoin(durl, "manifest/2/"), data=b""),
+        ):
+            try:
+                urlopen(req)
+            except HTTPError as e:
+                self.assertTrue(
+                    e.code
+                    in (http.client.METHOD_NOT_ALLOWED, http.client.BAD_REQUEST)
+                )
+            else:
+                raise RuntimeError("Expected request to fail")
+
+    def test_file_bulk(self):
+        """Verify that file/3 returns the content of the requested files
+        in a tar stream, omitting those that are unknown."""
+
+        durl = self.dc.get_depot_url()
+        plist = self.pkgsend_bulk(durl, self.quux10)
+        repo = self.dc.get_repo()
+        m = repo.get_pub_rstore()._get_manifest(fmri.PkgFmri(plist[0]))
+        hashes = [a.hash for a in m.gen_actions_by_type("file")]
+        self.assertEqual(len(hashes), 2)
+
+        data = urlencode(list(enumerate(hashes + ["0" * 40]))).encode()
+        res = urlopen(urljoin(durl, "file/3/"), data=data)
+        self.assertEqual(res.info()["Content-Type"], "application/x-tar")
+
+        found = []
+        with tarfile.open(mode="r|", fileobj=res) as tar:
+            for ti in tar:
+                found.append(ti.name)
+                with open(repo.file(ti.name), "rb") as f:
+                    self.assertEqual(tar.extractfile(ti).read(), f.read())
+        self.assertEqual(found, hashes)
+
+        # Only hashes can be used to name files; paths are refused.
+        for bad in ("/etc/passwd", "../../../../etc/passwd", "../" + hashes[0]):
+            data = urlencode([(0, hashes[0]), (1, bad)]).encode()
+            try:
+                urlopen(urljoin(durl, "file/3/"), data=data)
+            except HTTPError as e:
+                self.assertEqual(e.code, http.client.BAD_REQUEST)
+            else:
+                raise RuntimeError("Expected request to fail")
+
+        # Only POST is supported.
+        try:
+            urlopen(urljoin(durl, "file/3/"))
+        except HTTPError as e:
+            self.assertEqual(e.code, http.client.METHOD_NOT_ALLOWED)
+        else:
+            raise RuntimeError("Expected request to fail")
+
+    def test_file_range(self):
+        """Verify that file and manifest content is returned in full
+        and that byte ranges of it can be requested."""
+
+        durl = self.dc.get_depot_url()
+        plist = self.pkgsend_bulk(durl, self.quux10)
+        repo = self.dc.get_repo()
+        pfmri = fmri.PkgFmri(plist[0])
+        m = repo.get_pub_rstore()._get_manifest(pfmri)
+        fhash = next(m.gen_actions_by_type("file")).hash
+
+        for op, path in (
+            ("file/0/{0}".format(fhash), repo.file(fhash)),
+            ("file/1/{0}".format(fhash), repo.file(fhash)),
+            (
+                "manifest/0/{0}".format(pfmri.get_url_path()),
+                repo.manifest(pfmri),
+            ),
+        ):
+            with open(path, "rb") as f:
+                expected = f.read()
+
+            res = urlopen(urljoin(durl, op))
+            self.assertEqual(res.read(), expected)
+            self.assertEqual(res.info()["Accept-Ranges"], "bytes")
+
+            req = Request(urljoin(durl, op), headers={"Range": "bytes=10-"})
+            res = urlopen(req)
+            self.assertEqual(res.status, 206)
+            self.assertEqual(res.read(), expected[10:])
+            self.assertEqual(
+                res.info()["Content-Range"],
+                "bytes 10-{0:d}/{1:d}".format(len(expected) - 1, len(expected)),
+            )
+
+            req = Request(urljoin(durl, op), headers={"Range": "bytes=5-14"})
+            self.assertEqual(urlopen(req).read(), expected[5:15])
+
+            req = Request(
+                urljoin(durl, op),
+                headers={"Range": "bytes={0:d}-".format(len(expected))},
+            )
+            try:
+                urlopen(req)
+            except HTTPError as e:
+                self.assertEqual(e.code, 416)
+            else:
+                raise RuntimeError("Expected range to be unsatisfiable")
+
+    def test_response_cache(self):
+        """Verify that catalog and manifest responses are validated
+        using their ETag and that cached catalog responses are replaced
+        when the catalog is updated."""
+
+        durl = self.dc.get_depot_url()
+        plist = self.pkgsend_bulk(durl, self.quux10)
+        pfmri = fmri.PkgFmri(plist[0])
+
+        for op in (
+            "catalog/1/catalog.attrs",
+            "manifest/0/{0}".format(pfmri.get_url_path()),
+        ):
+            res = urlopen(urljoin(durl, op))
+            expected = res.read()
+            etag = res.info()["ETag"]
+            lm = res.info()["Last-Modified"]
+            self.assertTrue(etag and lm)
+
+            # The second response is the same as the first.
+            res = urlopen(urljoin(durl, op))
+            self.assertEqual(res.read(), expected)
+            self.assertEqual(res.info()["ETag"], etag)
+
+            for hdrs in (
+                {"If-None-Match": etag},
+                {"If-Modified-Since": lm},
+            ):
+                req = Request(urljoin(durl, op), headers=hdrs)
+                try:
+                    urlopen(req)
+                except HTTPError as e:
+                    self.assertEqual(e.code, 304)
+                else:
+                    raise RuntimeError("Expected 304 response")
+
+        # Publishing a package saves the catalog, so the next response
+        # for the catalog attributes must reflect the new package.
+        op = urljoin(durl, "catalog/1/catalog.attrs")
+        res = urlopen(op)
+        old = res.read()
+        etag = res.info()["ETag"]
+        self.pkgsend_bulk(durl, self.info10)
+        res = urlopen(op)
+        new = res.read()
+        self.assertNotEqual(old, new)
+        self.assertNotEqual(res.info()["ETag"], etag)
+        repo = self.dc.get_repo()
+        with open(repo.catalog_1("catalog.attrs"), "rb") as f:
+            self.assertEqual(f.read(), new)
+
+    def test_catalog_encoding(self):
+        """Verify that pre-compressed copies of catalog files are written
+        when the catalog is saved and sent to clients that accept
+        them."""
+
+        durl = self.dc.get_depot_url()
+        self.pkgsend_bulk(durl, self.quux10)
+        repo = self.dc.get_repo()
+        cat = repo.get_catalog()
+        names = ["catalog.attrs"] + list(cat.parts) + list(cat.updates)
+
+        # Only the files clients retrieve are compressed; other files,
+        # such as the indexes of the catalog parts, are not.
+        cat_root = os.path.dirname(repo.catalog_1("catalog.attrs"))
+        for name in os.listdir(cat_root):
+            if name.endswith((".gz", ".zst")):
+                self.assertTrue(name.rsplit(".", 1)[0] in names, name)
+
+        for name in names:
+            fpath = repo.catalog_1(name)
+            with open(fpath, "rb") as f:
+                expected = f.read()
+            with open(fpath + ".gz", "rb") as f:
+                self.assertEqual(gzip.decompress(f.read()), expected)
+
+            op = urljoin(durl, "catalog/1/{0}".format(name))
+            res = urlopen(Request(op, headers={"Accept-Encoding": "gzip"}))
+            self.assertEqual(res.info()["Content-Encoding"], "gzip")
+            self.assertEqual(gzip.decompress(res.read()), expected)
+
+            for hdrs in (
+                {},
+                {"Accept-Encoding": "gzip;q=0"},
+                {"Accept-Encoding": "gzip", "Range": "bytes=0-"},
+            ):
+                res = urlopen(Request(op, headers=hdrs))
+                self.assertEqual(res.info()["Content-Encoding"], None)
+                self.assertEqual(res.read(), expected)
+
+    def test_index_refresh(self):
+        """Verify that repeated requests to update the search indexes
+        are accepted while an update is pending and that published
+        packages become searchable without an explicit request."""
+
+        durl = self.dc.get_depot_url()
+        self.pkgsend_bulk(durl, self.quux10)
+
+        for i in range(20):
+            res = urlopen(urljoin(durl, "index/0/refresh"))
+            self.assertEqual(res.getcode(), http.client.OK)
+
+        op = urljoin(durl, "search/0/cat")
+        for i in range(60):
+            res = urlopen(op)
+            if res.getcode() == http.client.OK:
+                break
+            time.sleep(1)
+        self.assertTrue(b"quux" in res.read())
+
     def test_info(self):
         """Testing information showed in /info/0."""
 
@@ -51,6 +51,8 @@ from urllib.parse import quote
 from urllib.request import urlopen, build_opener, ProxyHandler, Request
 
 import pkg.actions
+import pkg.client.image as image
+import pkg.client.progress as progress
 import pkg.digest as digest
 import pkg.fmri as fmri
 import pkg.manifest as manifest
@@ -589,6 +591,100 @@ class TestPkgInstallBasics(pkg5unittest.SingleDepotTestCase):
         self.pkg("verify")
         self.dc.stop()
 
+    def test_content_cache_size(self):
+        """Verify that content-cache-size limits the size of the content
+        cache by removing the least recently used content first."""
+
+        # This test needs to use the depot to be able to test the
+        # download cache.
+        self.dc.start()
+
+        self.pkgsend_bulk(self.durl, (self.foo10, self.bar10, self.baz10))
+        self.image_create(self.durl)
+        self.pkg("set-property flush-content-cache-on-success False")
+
+        api_inst = self.get_img_api_obj()
+        img_inst = api_inst.img
+
+        def cached_files():
+            files = {}
+            for path, readonly, pub, layout in img_inst.get_cachedirs():
+                for dirpath, dirnames, filenames in os.walk(path):
+                    for name in filenames:
+                        fpath = os.path.join(dirpath, name)
+                        files[fpath] = os.stat(fpath).st_size
+            return files
+
+        # Without a limit, all content is retained.
+        self.pkg("install bar@1.0")
+        old = cached_files()
+        self.assertEqual(len(old), 1)
+        self.pkg("install baz@1.0")
+        files = cached_files()
+        self.assertEqual(len(files), 2)
+        new = [f for f in files if f not in old]
+
+        # Make the content for bar appear to have been used long ago.
+        for f in old:
+            os.utime(f, (0, 0))
+
+        # Only the most recently used content should be kept once a
+        # limit is set and an operation completes.
+        self.pkg("set-property content-cache-size {0:d}".format(files[new[0]]))
+        self.pkg("uninstall bar")
+        self.assertEqual(list(cached_files()), new)
+
+        # 'pkg clean' still removes everything.
+        self.pkg("clean")
+        self.assertEqual(cached_files(), {})
+        self.dc.stop()
+
+    def test_parent_cache_dirs(self):
+        """Verify that the caches of a parent image are only read by the
+        "pkg remote" process operating on a linked child image."""
+
+        # This test needs to use the depot to be able to test the
+        # download cache.
+        self.dc.start()
+
+        self.pkgsend_bulk(self.durl, (self.foo10, self.bar10))
+        self.image_create(self.durl)
+        self.pkg("set-property flush-content-cache-on-success False")
+
+        api_inst = self.get_img_api_obj()
+        img_inst = api_inst.img
+
+        def cached_files():
+            files = []
+            for path, readonly, pub, layout in img_inst.get_cachedirs():
+                if readonly:
+                    continue
+                for dirpath, dirnames, filenames in os.walk(path):
+                    files.extend(filenames)
+            return files
+
+        # Populate the cache, then save it as the cache of a parent.
+        self.pkg("install bar@1.0")
+        self.assertEqual(len(cached_files()), 1)
+        pcache = os.path.join(self.test_root, "parent_cache")
+        for path, readonly, pub, layout in img_inst.get_cachedirs():
+            if not readonly and os.path.isdir(path):
+                shutil.copytree(path, pcache, dirs_exist_ok=True)
+        self.pkg("uninstall bar foo")
+        self.pkg("clean")
+        self.assertEqual(cached_files(), [])
+
+        # Other subcommands ignore the parent's caches, so the content
+        # is retrieved into the image's own cache.
+        env = {"PKG_PARENT_CACHEDIRS": pcache}
+        self.pkg("install bar@1.0", env_arg=env)
+        self.assertEqual(len(cached_files()), 1)
+        self.pkg("verify bar")
+
+        shutil.rmtree(pcache)
+        self.pkg("uninstall bar foo")
+        self.dc.stop()
+
     def test_basics_5_install(self):
         """Install bar@1.0, upgrade to bar@1.1,
         downgrade to bar@1.0.
@@ -1082,6 +1178,154 @@ class TestPkgInstallBasics(pkg5unittest.SingleDepotTestCase):
                     exit=1,
                 )
 
+    def test_fast_lookups_incremental(self):
+        """Verify that the action conflict database, which is updated
+        incrementally after each operation, matches the database that
+        is built from scratch."""
+
+        self.pkgsend_bulk(
+            self.rurl, (self.foo10, self.foo11, self.foo12, self.bar10)
+        )
+        self.image_create(self.rurl)
+
+        def get_db():
+            img = self.get_img_api_obj().img
+            actdict = img._load_actdict(progress.NullProgressTracker())
+            db = {}
+            tf = img._get_stripped_actions_file()
+            tf.close()
+            with open(tf.name, "rb") as sf:
+                for (name, key), (offset, cnt) in actdict.items():
+                    sf.seek(offset)
+                    db[(name, key)] = sorted(sf.readline() for i in range(cnt))
+            return db, img._load_conflicting_keys()
+
+        for cmd in (
+            "install foo@1.1",
+            "install bar@1.0",
+            "update foo@1.2",
+            "uninstall bar",
+        ):
+            self.pkg(cmd)
+            incr = get_db()
+            self.get_img_api_obj().img._remove_fast_lookups()
+            self.assertEqual(incr, get_db())
+
+    def test_fast_lookups_index(self):
+        """Verify that the binary action index agrees with the offsets
+        file and is used for lookups by planning."""
+
+        self.pkgsend_bulk(self.rurl, (self.foo11, self.bar10))
+        self.image_create(self.rurl)
+        self.pkg("install bar")
+
+        img = self.get_img_api_obj().img
+        sf = img._get_stripped_actions_file()
+        sf.close()
+        cache_dir = os.path.dirname(sf.name)
+        expected = {}
+        with open(os.path.join(cache_dir, "actions.offsets")) as of:
+            of.readline()
+            of.readline()
+            for line in of:
+                name, offset, cnt, key = line.rstrip().split(None, 3)
+                expected[(name, key)] = (int(offset), int(cnt))
+
+        index = img._load_actdict(progress.NullProgressTracker())
+        self.assertTrue(isinstance(index, image.ActionOffsetIndex))
+        self.assertEqual(dict(index.items()), expected)
+        for key, val in expected.items():
+            self.assertEqual(index.get(key), val)
+        self.assertEqual(index.get(("file", "no/such/path")), None)
+
+        # Without the index, the offsets file is used instead.
+        portable.remove(os.path.join(cache_dir, "actions.index"))
+        img = self.get_img_api_obj().img
+        self.assertEqual(
+            img._load_actdict(progress.NullProgressTracker()), expected
+        )
+
+    def test_install_concurrency(self):
+        """Verify that installing and updating file, hardlink and link
+        actions concurrently gives the same result as doing so
+        serially."""
+
+        lines = ["open conc@1.0,5.11-0"]
+        for d in range(4):
+            for f in range(8):
+                lines.append(
+                    "add file tmp/truck1 mode=0444 owner=root "
+                    "group=bin path=/a/{0}/b/f{1}".format(d, f)
+                )
+            # A chain of hardlinks, each targeting the previous one.
+            target = "/a/{0}/b/f0".format(d)
+            for h in range(4):
+                path = "/a/{0}/h{1}".format(d, h)
+                lines.append(
+                    "add hardlink path={0} target={1}".format(path, target)
+                )
+                target = path
+            lines.append("add link path=/a/{0}/l target=b/f1".format(d))
+        lines.append("close")
+        conc10 = "\n".join(lines)
+        conc11 = conc10.replace("conc@1.0", "conc@1.1").replace(
+            "tmp/truck1", "tmp/truck2"
+        )
+        self.pkgsend_bulk(self.rurl, (conc10, conc11))
+
+        def snapshot(root):
+            result = {}
+            for dirpath, dirnames, filenames in os.walk(root):
+                for fname in dirnames + filenames:
+                    path = os.path.join(dirpath, fname)
+                    st = os.lstat(path)
+                    info = [stat.S_IFMT(st.st_mode), stat.S_IMODE(st.st_mode)]
+                    if stat.S_ISLNK(st.st_mode):
+                        info.append(os.readlink(path))
+                    elif stat.S_ISREG(st.st_mode):
+                        info.append(st.st_nlink)
+                        with open(path, "rb") as f:
+                            info.append(f.read())
+                    result[os.path.relpath(path, root)] = info
+            return result
+
+        results = []
+        for jobs in (1, 8):
+            self.image_create(self.rurl)
+            self.pkg("set-property install-concurrency {0}".format(jobs))
+            self.pkg("install conc@1.0")
+            installed = snapshot(os.path.join(self.get_img_path(), "a"))
+            self.pkg("update conc@1.1")
+            updated = snapshot(os.path.join(self.get_img_path(), "a"))
+            self.pkg("verify conc")
+            results.append((installed, updated))
+            self.image_destroy()
+
+        self.assertEqual(results[0], results[1])
+        # The hardlinks must all share the first file's inode.
+        self.assertEqual(results[1][1][os.path.join("0", "h3")][2], 5)
+
+    def test_transport_http2(self):
+        """Verify that packages can still be retrieved and installed
+        when the transport is allowed to negotiate HTTP/2; repositories
+        accessed using http continue to use HTTP/1.1.
+
+        The test depot only serves http, so this doesn't exercise
+        multiplexing against an HTTP/2 server; the options the transport
+        engine sets for it are verified by t_transport_engine."""
+
+        self.pkgsend_bulk(self.durl, (self.foo10, self.foo11))
+        self.image_create(self.durl)
+        self.pkg("set-property transport-http2 True")
+        self.pkg("property -H transport-http2")
+        self.assertTrue("True" in self.output)
+
+        self.pkg("refresh --full")
+        self.pkg("install foo@1.0")
+        self.pkg("update foo@1.1")
+        self.pkg("verify foo")
+        self.pkg("contents -r -m foo@1.1")
+
     def test_bug_3770(self):
         """Try to install a package from a publisher with an
         unavailable repository."""
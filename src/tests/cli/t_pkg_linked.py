@@ -2222,6 +2222,51 @@ class TestPkgLinkedRecurse(TestPkgLinked):
             ],
         )
 
+    def test_recursive_install_parent_cache(self):
+        """Verify that child images reuse content retrieved by their
+        parent rather than retrieving it again."""
+
+        # Content is only cached when it is retrieved from a depot.
+        self.dcs[1].start()
+        durl = self.dcs[1].get_depot_url()
+
+        # create parent (0), push child (1, 2)
+        self._imgs_create(3)
+        self._pkg([0, 1, 2], "set-publisher -O {0} test".format(durl))
+        self._pkg(
+            [0, 1, 2], "set-property flush-content-cache-on-success False"
+        )
+        self._attach_child(0, [1, 2])
+
+        def cached_files(i):
+            self.i_api[i].reset()
+            files = []
+            for path, readonly, pub, layout in self.i_api[
+                i
+            ].img.get_cachedirs():
+                if readonly:
+                    continue
+                for dirpath, dirnames, filenames in os.walk(path):
+                    files.extend(filenames)
+            return files
+
+        # The children should find all of the content they need in the
+        # parent's caches, so nothing is retrieved into their own.
+        self._pkg([0], "install -r {0}".format(self.foo1_list[0]))
+        self.assertNotEqual(cached_files(0), [])
+        for i in (1, 2):
+            self.assertEqual(cached_files(i), [])
+        self._pkg([1, 2], "verify {0}".format(self.foo1_list[0]))
+
+        # The same is true of packages that are kept in sync with the
+        # parent.
+        self._pkg([0], "install -r {0}".format(self.s1_list[0]))
+        for i in (1, 2):
+            self.assertEqual(cached_files(i), [])
+        self._pkg([1, 2], "verify {0}".format(self.s1_list[0]))
+
+        self.dcs[1].stop()
+
     def test_recursive_uninstall(self):
         """Test recursive uninstall"""
 
@@ -231,6 +231,37 @@ class TestPkgRefreshMulti(pkg5unittest.ManyDepotTestCase):
         )
         self.checkAnswer(expected, self.output)
 
+    def test_incremental_refresh(self):
+        """Verify that the image catalogs are the same after they have
+        been updated using the changes from an incremental refresh as
+        after they have been rebuilt by a full one."""
+
+        self.image_create(self.durl1, prefix="test1")
+        self.pkg("set-publisher -O " + self.durl2 + " test2")
+        self.pkgsend_bulk(self.durl1, self.foo10 + self.food12)
+        self.pkgsend_bulk(self.durl2, self.foo10)
+        self.pkg("refresh --full")
+        self.pkg("install foo@1.0")
+
+        # Newer versions from both publishers affect the state of the
+        # installed package, but only the changed packages need to be
+        # updated in the image catalogs.
+        self.pkgsend_bulk(self.durl1, self.foo11)
+        self.pkgsend_bulk(self.durl2, self.foo12)
+        self.pkg("refresh")
+        self.pkg("list -afHv")
+        incremental = self.output
+        self.pkg("list -uH")
+        upgradable = self.output
+        self.assertTrue("foo@1.1" in incremental)
+        self.assertTrue("foo@1.2" in incremental)
+
+        self.pkg("refresh --full")
+        self.pkg("list -afHv")
+        self.assertEqualDiff(incremental, self.output)
+        self.pkg("list -uH")
+        self.assertEqualDiff(upgradable, self.output)
+
     def test_set_publisher_induces_full_refresh(self):
         self.pkgsend_bulk(self.durl3, self.foo11)
         self.pkgsend_bulk(self.durl3, self.foo10)
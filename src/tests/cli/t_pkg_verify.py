@@ -37,7 +37,10 @@ import tempfile
 import time
 import unittest
 
+import pkg.client.verifypool as verifypool
+import pkg.digest as digest
 import pkg.json as json
+import pkg.misc as misc
 
 
 class TestPkgVerify(pkg5unittest.SingleDepotTestCase):
@@ -539,6 +542,107 @@ sys::3:root,bin,adm
         self.output.index("etc/preserved")
         self.output.index("editable file has been changed")
 
+    def test_verify_concurrency(self):
+        """Verify that file content verification produces the same
+        output, in the same order, regardless of how many files are
+        verified concurrently."""
+
+        self.pkgsend_bulk(self.rurl, self.bar10)
+        self.image_create(self.rurl)
+        self.pkg("install foo bar")
+
+        for fname in ("etc/bronze1", "etc/bronze2", "usr/bin/bobcat"):
+            with open(os.path.join(self.get_img_path(), fname), "w") as f:
+                f.write("Bobcats are here")
+        os.unlink(os.path.join(self.get_img_path(), "etc", "bronze2"))
+
+        outputs = []
+        for jobs in (1, 4, 0):
+            self.pkg("set-property verify-concurrency {0}".format(jobs))
+            self.pkg_verify("-v foo bar", exit=1)
+            outputs.append(self.output)
+            self.assertTrue("etc/bronze1" in self.output)
+            self.assertTrue("Hash:" in self.output)
+            self.assertTrue(
+                "Missing: regular file does not exist" in self.output
+            )
+        self.assertEqualDiff(outputs[0], outputs[1])
+        self.assertEqualDiff(outputs[0], outputs[2])
+
+        # Repairs must work the same way as well.
+        self.pkg("fix foo bar")
+        self.pkg_verify("foo bar")
+
+    def test_verify_cache(self):
+        """Verify that files whose content was previously verified are
+        still checked for changes, and that --full is accepted."""
+
+        self.pkgsend_bulk(self.rurl, self.bar10)
+        self.image_create(self.rurl)
+        self.pkg("install foo bar")
+
+        cache = os.path.join(
+            self.img_path(), "var", "pkg", "cache", "verify.cache"
+        )
+        self.pkg_verify("foo bar")
+        self.assertTrue(os.path.exists(cache))
+        self.pkg_verify("foo bar")
+        self.pkg_verify("--full foo bar")
+
+        # Unchanged files are recorded as verified, so they are not
+        # hashed again.
+        img = self.get_img_api_obj().img
+        pfmri = [f for f in img.gen_installed_pkgs() if f.pkg_name == "bar"][0]
+        vcache = verifypool.VerifyCache(cache)
+        for act in img.get_manifest(pfmri).gen_actions_by_type("file"):
+            hash_attr, hash_val, hash_func = digest.get_preferred_hash(act)
+            path = act.get_installed_path(img.get_root())
+            self.assertTrue(vcache.verified(path, os.lstat(path), hash_val))
+
+        # A file changed after a pool worker hashed it must be hashed
+        # again so that its new state is not recorded with the old
+        # content hash.
+        pool = verifypool.DigestPool(img, [pfmri], 1)
+        manf = pool.start_package(pfmri)
+        act = [
+            a
+            for a in manf.gen_actions_by_type("file")
+            if a.attrs["path"] == "etc/bronze1"
+        ][0]
+        hash_attr, hash_val, hash_func = digest.get_preferred_hash(act)
+        fpath = act.get_installed_path(img.get_root())
+        with open(fpath, "w") as f:
+            f.write("Bobcats were here")
+        new_hash = misc.get_data_digest(fpath, hash_func=hash_func)[0]
+        self.assertNotEqual(new_hash, hash_val)
+        self.assertEqual(
+            pool.get_data_digest(fpath, hash_func, os.lstat(fpath))[0],
+            new_hash,
+        )
+        pool.close()
+        self.pkg_verify("bar", exit=1)
+        self.assertTrue("etc/bronze1" in self.output)
+        self.assertFalse(
+            verifypool.VerifyCache(cache).verified(
+                fpath, os.lstat(fpath), hash_val
+            )
+        )
+        self.pkg("fix bar")
+
+        # Changing a file's content but restoring its modification
+        # time must not hide the change.
+        fpath = os.path.join(self.get_img_path(), "etc", "bronze1")
+        st = os.stat(fpath)
+        with open(fpath, "w") as f:
+            f.write("Bobcats are here")
+        os.utime(fpath, ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.pkg_verify("bar", exit=1)
+        self.assertTrue("etc/bronze1" in self.output)
+
+        self.pkg("fix --full bar")
+        self.pkg_verify("foo bar")
+        self.pkg_verify("--full foo bar")
+
     def test_verify_changed_manifest(self):
         """Test that running package verify won't change the manifest of
         an installed package even if it has changed in the repository.
@@ -148,6 +148,18 @@ file NOHASH path=kernel/drv/common2 reboot-needed=true
         "delete-with-no-operand": "<transform file -> delete >",
         "backreference-no-object": "<transform file path=(local/)?usr/* -> default refs %<1>>",
         "backreference-empty-string": "<transform file path=usr/bin/foo(.*)-> emit file path=usr/sbin/foo%<1>>",
+        "brmulti": "<transform file mode=0(7)77 path=usr/(bin|sfw)/.* owner=(r)oot -> default refs %<3>%<1>%<2>>",
+        "samepattern": "<transform file owner=(.*) group=(.*) -> default og %<1>:%<2>>",
+        "mixedtypes": "<transform path=usr/bin/.* -> default step 1>\n"
+        "<transform file step=1 -> set step 2>\n"
+        "<transform step=2 -> set step 3>\n"
+        "<transform depend step=1 -> set step 4>",
+        "dropthenmore": "<transform file path=usr/bin/bar -> drop>\n"
+        "<transform file path=usr/.* -> emit set name=seen value=%(path)>\n"
+        "<transform path=usr/bin/bar -> default notdropped true>",
+        "emitother": "<transform file path=usr/bin/foo -> emit link path=usr/bin/foolink target=foo>\n"
+        "<transform link -> default emitted true>\n"
+        "<transform file -> default emitted false>",
     }
 
     basic_defines = {"i386_ONLY": "#", "BUILDID": 0.126}
@@ -736,6 +748,50 @@ file NOHASH path=kernel/drv/common2 reboot-needed=true
         )
         self.assertMatch("path=usr/sbin/foo")
 
+    def test_15(self):
+        """Test that transforms are applied to each action in the order
+        they were specified, whichever action types they are restricted
+        to, and that the matches for backreferences are in the order the
+        match criteria were specified."""
+
+        source_file = os.path.join(self.test_root, "source_file2")
+
+        # Backreferences to several match criteria are numbered in the
+        # order the criteria appear in the transform, not the order of
+        # the attributes in the action.
+        self.pkgmogrify([self.transforms["brmulti"], source_file])
+        self.assertMatch("refs=r7bin", count=2)
+        self.assertMatch("refs=r7sfw", count=1)
+
+        # Match criteria for different attributes may share a pattern.
+        self.pkgmogrify([self.transforms["samepattern"], source_file])
+        self.assertMatch("og=root:bin", count=3)
+
+        # Transforms restricted to an action type and transforms that
+        # apply to any type are interleaved in the order given; each
+        # sees the changes made by the ones before it.
+        self.pkgmogrify([self.transforms["mixedtypes"], source_file])
+        self.assertMatch("^file.*step=3", count=2)
+        self.assertMatch("^depend.*step=4", count=1)
+        self.assertNoMatch("step=[12]")
+
+        # No transforms are applied to an action once it is dropped,
+        # but they are still applied to the actions that follow.
+        self.pkgmogrify([self.transforms["dropthenmore"], source_file])
+        self.assertNoMatch("usr/bin/bar")
+        self.assertNoMatch("notdropped")
+        self.assertMatch("^set name=seen", count=4)
+        self.assertMatch("^set name=seen value=usr/sfw/bin/foo")
+
+        # An emitted action of a different type has the transforms for
+        # its own type applied to it, not those for the action that
+        # emitted it.
+        self.pkgmogrify([self.transforms["emitother"], source_file])
+        self.assertMatch("^link.*emitted=true", count=1)
+        self.assertNoMatch("^link.*emitted=false")
+        self.assertMatch("^file.*emitted=false", count=6)
+        self.assertNoMatch("^file.*emitted=true")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1344,6 +1344,38 @@ test1\t1\tonline\t2011-08-04T20:34:58Z
         # refresh in update log.
         self.assertEqualDiff(expected, returned)
 
+    def test_04_rebuild_parallel(self):
+        """Verify that rebuilding a repository's catalog using worker
+        processes produces the same catalog as a serial rebuild."""
+
+        repo_path = self.dc.get_repodir()
+        repo_uri = self.dc.get_repo_url()
+        plist = self.pkgsend_bulk(
+            repo_uri, (self.amber10, self.amber20, self.tree10, self.truck10)
+        )
+
+        def get_entries():
+            repo = self.get_repo(repo_path, read_only=True)
+            cat = repo.get_catalog("test")
+            info = [cat.DEPENDENCY, cat.SUMMARY]
+            return [
+                (str(f), cat.get_entry(f, info_needed=info))
+                for f in cat.fmris(ordered=True)
+            ]
+
+        self.pkgrepo("rebuild -s {0} --no-index".format(repo_path))
+        expected = get_entries()
+        self.assertEqual(plist, [f for f, entry in expected])
+
+        for jobs in ("2", "0"):
+            self.pkgrepo(
+                "rebuild -j {0} -s {1} --no-index".format(jobs, repo_path)
+            )
+            self.assertEqualDiff(expected, get_entries())
+
+        self.pkgrepo("rebuild -j foo -s {0}".format(repo_path), exit=2)
+        self.pkgrepo("rebuild -j -1 -s {0}".format(repo_path), exit=2)
+
     def test_05_refresh(self):
         """Verify pkgrepo refresh works as expected."""
 
@@ -1433,6 +1465,40 @@ test1\t1\tonline\t2011-08-04T20:34:58Z
 
         self.dc.stop()
 
+    def test_05_refresh_search_cache(self):
+        """Verify that repeated searches of a repository return the same
+        results and that search data cached between searches is
+        discarded when the search indexes are rebuilt."""
+
+        repo_path = self.dc.get_repodir()
+        self.pkgsend_bulk(repo_path, (self.tree10, self.truck10))
+        self.pkgrepo("refresh -s {0}".format(repo_path))
+        repo = self.get_repo(repo_path, read_only=True)
+
+        def search(text):
+            query = Query(text, False, Query.RETURN_PACKAGES, None, None)
+            return sorted(
+                str(e[2][0]) for e in [r for r in repo.search([query])][0]
+            )
+
+        # The second search of each token uses the postings cached by
+        # the first.
+        tree = search("tree")
+        truck = search("truck")
+        self.assertTrue(tree and truck)
+        self.assertTrue(all("truck" in r for r in truck))
+        for i in range(3):
+            self.assertEqualDiff(tree, search("tree"))
+            self.assertEqualDiff(truck, search("truck"))
+
+        # Rebuilding the index replaces the main dictionary; results
+        # must not be taken from postings of the old index.
+        self.pkgrepo("rebuild -s {0} --no-catalog".format(repo_path))
+        self.assertEqualDiff(tree, search("tree"))
+        self.assertEqualDiff(truck, search("truck"))
+        repo.reset_search()
+        self.assertEqualDiff(tree, search("tree"))
+
     def test_06_version(self):
         """Verify pkgrepo version works as expected."""
 
@@ -3354,6 +3420,66 @@ test2	zoo		1.0	5.11	0	20110804T203458Z	pkg://test2/zoo@1.0,5.11-0:20110804T20345
         self.assertTrue(truncate_file in self.output)
         self.assertTrue(self.output.count("ERROR: Corrupted gzip file") == 1)
 
+    def test_verify_parallel_resume(self):
+        """Test that verify reports the same errors when using several
+        jobs, and that an interrupted verification can be resumed."""
+
+        repo_path = self.dc.get_repodir()
+        fmris = self.pkgsend_bulk(
+            repo_path, (self.tree10, self.amber10, self.truck10)
+        )
+        self.pkgrepo("-s {0} verify -j 4".format(repo_path), exit=0)
+
+        # Both tree and truck deliver the broken file.
+        bad_hash_path = self.__inject_badhash("tmp/truck1")
+        for jobs in (1, 0, 4):
+            self.pkgrepo("-s {0} verify -j {1}".format(repo_path, jobs), exit=1)
+            self.assertEqual(self.output.count("ERROR: Invalid file hash"), 2)
+            self.assertTrue(bad_hash_path in self.output)
+        self.pkgrepo("-s {0} verify -j -1".format(repo_path), exit=2)
+
+        # Record tree as having been verified by an interrupted
+        # verification; it is skipped when the verification resumes.
+        ckpt = os.path.join(
+            repo_path, "publisher", "test", "tmp", "verify.checkpoint"
+        )
+        mpath = self.__get_mf_path(fmris[0])
+        mdir, ver = os.path.split(mpath)
+
+        def write_ckpt():
+            with open(ckpt, "w") as f:
+                f.write(
+                    "{0} {1}\n".format(
+                        os.stat(mpath).st_mtime_ns,
+                        os.path.join(os.path.basename(mdir), ver),
+                    )
+                )
+                # An incomplete record is ignored.
+                f.write("12345 truck")
+
+        # By default, the checkpoint is ignored and every package
+        # is verified.
+        write_ckpt()
+        self.pkgrepo("-s {0} verify".format(repo_path), exit=1)
+        self.assertEqual(self.output.count("ERROR: Invalid file hash"), 2)
+        self.assertTrue("Verification resumed" not in self.output)
+        self.assertTrue(not os.path.exists(ckpt))
+
+        # --resume skips tree, and says so.
+        write_ckpt()
+        self.pkgrepo("-s {0} verify --resume".format(repo_path), exit=1)
+        self.assertEqual(self.output.count("ERROR: Invalid file hash"), 1)
+        self.assertTrue(fmris[2] in self.output)
+        self.assertTrue("WARNING: Verification resumed" in self.output)
+        self.assertTrue("1 package(s) for publisher 'test'" in self.output)
+
+        # A completed verification removes the checkpoint, so
+        # resuming again verifies every package.
+        self.assertTrue(not os.path.exists(ckpt))
+        self.pkgrepo("-s {0} verify --resume".format(repo_path), exit=1)
+        self.assertEqual(self.output.count("ERROR: Invalid file hash"), 2)
+        self.assertTrue("Verification resumed" not in self.output)
+
     def __get_fhashes(self, repodir, pub):
         """Returns a list of file hashes for the publisher
         pub in a given repository."""
@@ -70,6 +70,33 @@ for repo_prefix in repo_prefixes:
             "/{root}{repo_prefix}status/0/index.html [PT,NE]\n".format(**locals()))
 %>
 
+<%!
+    import os
+
+    # The content encodings and file name suffixes of the pre-compressed
+    # copies of catalog files written by the repository whenever a catalog
+    # is saved, in order of preference.
+    catalog_encodings = [("zstd", "zst"), ("gzip", "gz")]
+
+    def catalog_rules(src, dest, catalog_dir):
+        """Returns rewrite rules that map catalog requests matching
+        'src' to a pre-compressed copy of the catalog file in
+        'catalog_dir' if the client accepts its encoding, followed by
+        the rule that maps them to the file itself.  The request is
+        passed through to 'dest', which must end with the catalog file
+        name."""
+
+        rules = ""
+        for enc, suffix in catalog_encodings:
+            rules += (
+                "RewriteCond %{{HTTP:Range}} ^$\n"
+                "RewriteCond %{{HTTP:Accept-Encoding}} \\b{enc}\\b\n"
+                "RewriteCond {catalog_dir}/$1.{suffix} -s\n"
+                "RewriteRule {src} {dest}.{suffix} [NE,PT]\n".format(
+                    **locals()))
+        rules += "RewriteRule {src} {dest} [NE,PT]\n".format(**locals())
+        return rules
+%>
 <%doc>
 #
 # Rules to redirect default publisher requests into the publisher-specific
@@ -110,10 +137,12 @@ for repo_prefix in repo_prefixes:
                    .format(**locals()))
                 # for catalog parts, we can easily access the file with one
                 # RewriteRule, so do that, then PT to the Alias directive.
-                context.write("RewriteRule "
-                    "^/{root}{repo_prefix}catalog/1/(.*$) "
-                    "/{root}{repo_prefix}{pub}/publisher/{pub}/catalog/$1 [NE,PT]\n"
-                   .format(**locals()))
+                # Pre-compressed copies of the file are preferred.
+                context.write(catalog_rules(
+                    "^/{root}{repo_prefix}catalog/1/(.*$)".format(**locals()),
+                    "/{root}{repo_prefix}{pub}/publisher/{pub}/catalog/$1"
+                    .format(**locals()),
+                    os.path.join(repo_path, "publisher", pub, "catalog")))
 %>
 
 # Write per-publisher rules for publisher, version, file and manifest responses
@@ -139,10 +168,11 @@ for repo_prefix in repo_prefixes:
         </%doc>
 <%
         root = context.get("sroot")
-        context.write(
-            "RewriteRule ^/{root}{repo_prefix}{pub}/catalog/1/(.*)$ "
-            "/{root}{repo_prefix}{pub}/publisher/{pub}/catalog/$1 [NE,PT]".format(
-            **locals()))
+        context.write(catalog_rules(
+            "^/{root}{repo_prefix}{pub}/catalog/1/(.*)$".format(**locals()),
+            "/{root}{repo_prefix}{pub}/publisher/{pub}/catalog/$1".format(
+            **locals()),
+            os.path.join(repo_path, "publisher", pub, "catalog")))
         %><%doc>
         # file responses are a little tricky - we need to index
         # the first two characters of the filename and use that
@@ -251,6 +281,18 @@ for repo_prefix in repo_prefixes:
 <LocationMatch ".*/catalog.attrs">
         Header set Cache-Control no-cache
 </LocationMatch>
+<LocationMatch ".*/catalog/[^/]+\.gz$">
+        SetEnv no-gzip 1
+        Header set Content-Encoding gzip
+        Header set Content-Type text/plain;charset=utf-8
+        Header append Vary Accept-Encoding
+</LocationMatch>
+<LocationMatch ".*/catalog/[^/]+\.zst$">
+        SetEnv no-gzip 1
+        Header set Content-Encoding zstd
+        Header set Content-Type text/plain;charset=utf-8
+        Header append Vary Accept-Encoding
+</LocationMatch>
 <LocationMatch ".*/publisher/\d/.*">
         Header set Cache-Control "must-revalidate, no-transform, max-age=31536000"
         Header set Content-Type application/vnd.pkg5.info